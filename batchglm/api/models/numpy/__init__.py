@@ -1 +1,2 @@
 from . import glm_nb
+from batchglm.train.numpy.base_glm import CallbackSink, JsonLinesSink, LoggingSink, TelemetrySink
@@ -1 +1,2 @@
-from batchglm.utils.linalg import stacked_lstsq, groupwise_solve_lm
+from batchglm.utils.linalg import stacked_lstsq, groupwise_solve_lm, cholesky_solve, cholesky_inverse, \
+    cholesky_inverse_from_factor, batched_solve_triangular, BatchedSolveResult
@@ -0,0 +1 @@
+from .suite import STAGES, grid, run_case, run, save, load, compare, main
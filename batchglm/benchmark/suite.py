@@ -0,0 +1,320 @@
+import itertools
+import json
+import logging
+import multiprocessing
+import numpy as np
+import os
+import platform
+import resource
+import scipy.sparse
+import time
+from typing import List, Union
+
+logger = logging.getLogger("batchglm")
+
+STAGES = ["input_data", "init_par", "train", "finalize"]
+
+
+def _reset_peak_rss():
+    """
+    Reset the peak resident set size of this process where supported (Linux), see _peak_rss().
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss() -> int:
+    """
+    Peak resident set size of this process in bytes since the last _reset_peak_rss().
+
+    Falls back to the peak over the lifetime of the process if the peak cannot be reset.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes otherwise.
+    return int(maxrss) if platform.system() == "Darwin" else int(maxrss) * 1024
+
+
+def grid(
+        n_obs: List[int] = (1000, 10000),
+        n_features: List[int] = (100, 1000),
+        n_conditions: List[int] = (2, 8),
+        n_batches: List[int] = (0, 4),
+        sparse: List[bool] = (False, True),
+        backends: List[str] = ("numpy", "tf1"),
+        training_strategies: dict = None
+) -> List[dict]:
+    """
+    Benchmark cases of all combinations of the given settings.
+
+    :param n_obs: Numbers of observations.
+    :param n_features: Numbers of features.
+    :param n_conditions: Numbers of conditions of the simulated design.
+    :param n_batches: Numbers of batches of the simulated design.
+    :param sparse: Whether count data are passed as scipy.sparse.csr_matrix.
+    :param backends: Backends, "numpy" and/or "tf1".
+    :param training_strategies: Training strategies by backend, all strategies of the backend except AUTO if None.
+    :return: List of cases, each a dictionary of the settings of run_case().
+    """
+    if training_strategies is None:
+        training_strategies = {
+            "numpy": ["DEFAULT", "GD"],
+            "tf1": ["DEFAULT", "IRLS_BATCHED"]
+        }
+    cases = []
+    for backend in backends:
+        for n_o, n_f, n_c, n_b, sp, strategy in itertools.product(
+                n_obs, n_features, n_conditions, n_batches, sparse, training_strategies[backend]
+        ):
+            cases.append({
+                "backend": backend,
+                "training_strategy": strategy,
+                "n_obs": int(n_o),
+                "n_features": int(n_f),
+                "n_conditions": int(n_c),
+                "n_batches": int(n_b),
+                "sparse": bool(sp)
+            })
+    return cases
+
+
+def _modules(backend: str):
+    if backend == "numpy":
+        from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+    elif backend == "tf1":
+        import batchglm.api as glm
+        if glm.models.tf1 is None:
+            raise ValueError("backend tf1 requires tensorflow 1")
+        from batchglm.api.models.tf1.glm_nb import Estimator, InputDataGLM, Simulator
+    else:
+        raise ValueError("backend %s not recognized" % backend)
+    return Estimator, InputDataGLM, Simulator
+
+
+def run_case(
+        backend: str,
+        training_strategy: str,
+        n_obs: int,
+        n_features: int,
+        n_conditions: int,
+        n_batches: int,
+        sparse: bool,
+        seed: int = 1
+) -> dict:
+    """
+    Simulate negative binomial data and fit them, recording each stage in STAGES.
+
+    The stages are the construction of the input data, the construction of the estimator, which evaluates init_par,
+    training with the given training strategy and finalize(). Peak RSS is reset before each stage where supported,
+    cases should otherwise be run in separate processes, see run().
+
+    :return: Settings of the case and by stage wall time ("seconds") and peak RSS in bytes ("peak_rss"),
+        as well as the number of iterations ("niter") and the final negative log-likelihood ("loss").
+    """
+    Estimator, InputDataGLM, Simulator = _modules(backend)
+    np.random.seed(seed)
+    sim = Simulator(num_observations=n_obs, num_features=n_features)
+    sim.generate_sample_description(num_batches=n_batches, num_conditions=n_conditions)
+    sim.generate()
+    x = np.asarray(sim.input_data.x)
+    if sparse:
+        x = scipy.sparse.csr_matrix(x)
+
+    result = {
+        "backend": backend,
+        "training_strategy": training_strategy,
+        "n_obs": n_obs,
+        "n_features": n_features,
+        "n_conditions": n_conditions,
+        "n_batches": n_batches,
+        "sparse": sparse,
+        "seconds": {},
+        "peak_rss": {}
+    }
+
+    def stage(name, fn):
+        _reset_peak_rss()
+        t0 = time.perf_counter()
+        out = fn()
+        result["seconds"][name] = time.perf_counter() - t0
+        result["peak_rss"][name] = _peak_rss()
+        return out
+
+    input_data = stage("input_data", lambda: InputDataGLM(
+        data=x,
+        design_loc=sim.input_data.design_loc,
+        design_scale=sim.input_data.design_scale,
+        design_loc_names=sim.input_data.design_loc_names,
+        design_scale_names=sim.input_data.design_scale_names,
+        constraints_loc=sim.input_data.constraints_loc,
+        constraints_scale=sim.input_data.constraints_scale,
+        size_factors=sim.input_data.size_factors,
+        as_dask=backend == "numpy"
+    ))
+    estimator = stage("init_par", lambda: Estimator(input_data=input_data, quick_scale=False))
+    estimator.initialize()
+    stage("train", lambda: estimator.train_sequence(training_strategy=training_strategy))
+    if backend == "tf1":
+        # The tf1 session is closed in finalize().
+        result["niter"] = int(estimator.global_step)
+    else:
+        result["niter"] = int(estimator.niter)
+    stage("finalize", lambda: estimator.finalize())
+    # Backends differ in the sign of estimator.loss, the negative log-likelihood is comparable across backends.
+    result["loss"] = - float(np.sum(estimator.log_likelihood))
+    return result
+
+
+def _run_case_star(case):
+    return run_case(**case)
+
+
+def run(
+        cases: List[dict],
+        isolate: bool = True
+) -> List[dict]:
+    """
+    Run benchmark cases.
+
+    :param cases: Cases, see grid().
+    :param isolate: Run each case in a new process so that peak memory, thread pools and tensorflow sessions of one
+        case do not affect the next one.
+    :return: Results by case, see run_case().
+    """
+    results = []
+    for i, case in enumerate(cases):
+        logger.info("benchmark case %i/%i: %s" % (i + 1, len(cases), str(case)))
+        try:
+            if isolate:
+                with multiprocessing.get_context("spawn").Pool(processes=1) as pool:
+                    result = pool.apply(_run_case_star, (case,))
+            else:
+                result = run_case(**case)
+        except Exception as e:
+            logger.warning("benchmark case %s failed: %s" % (str(case), str(e)))
+            result = dict(case)
+            result["error"] = str(e)
+        results.append(result)
+    return results
+
+
+def save(results: List[dict], path: str):
+    """
+    Write results as JSON.
+    """
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path: str) -> List[dict]:
+    """
+    Read results written by save().
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def _case_key(result: dict) -> tuple:
+    return tuple([result[k] for k in [
+        "backend", "training_strategy", "n_obs", "n_features", "n_conditions", "n_batches", "sparse"
+    ]])
+
+
+def compare(
+        results: List[dict],
+        baseline: List[dict],
+        rtol_seconds: float = 0.25,
+        rtol_peak_rss: float = 0.25,
+        rtol_loss: float = 1e-4,
+        min_seconds: float = 0.1
+) -> List[dict]:
+    """
+    Compare results to a baseline of the same cases.
+
+    A case regressed if a stage is slower or uses more peak memory than in the baseline by more than the relative
+    tolerance, if its final loss is larger by more than rtol_loss, if it needs more iterations or if it failed.
+    Stages that took less than min_seconds in the baseline are not compared by time as they are dominated by noise.
+    Cases that are not in the baseline are ignored.
+
+    :return: Regressions, each a dictionary with the settings of the case, the "metric", and the "baseline" and
+        "value" of this metric.
+    """
+    baseline = dict([(_case_key(x), x) for x in baseline])
+    regressions = []
+
+    def regression(result, metric, value_baseline, value):
+        x = dict([(k, result[k]) for k in ["backend", "training_strategy", "n_obs", "n_features",
+                                           "n_conditions", "n_batches", "sparse"]])
+        x.update({"metric": metric, "baseline": value_baseline, "value": value})
+        regressions.append(x)
+
+    for result in results:
+        ref = baseline.get(_case_key(result), None)
+        if ref is None or "error" in ref:
+            continue
+        if "error" in result:
+            regression(result, "error", None, result["error"])
+            continue
+        for s in STAGES:
+            if ref["seconds"][s] >= min_seconds and \
+                    result["seconds"][s] > (1. + rtol_seconds) * ref["seconds"][s]:
+                regression(result, "seconds." + s, ref["seconds"][s], result["seconds"][s])
+            if result["peak_rss"][s] > (1. + rtol_peak_rss) * ref["peak_rss"][s]:
+                regression(result, "peak_rss." + s, ref["peak_rss"][s], result["peak_rss"][s])
+        if result["niter"] > ref["niter"]:
+            regression(result, "niter", ref["niter"], result["niter"])
+        if result["loss"] > ref["loss"] + rtol_loss * np.abs(ref["loss"]):
+            regression(result, "loss", ref["loss"], result["loss"])
+    return regressions
+
+
+def main(args: Union[List[str], None] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m batchglm.benchmark",
+        description="Benchmark batchglm backends on simulated negative binomial data."
+    )
+    parser.add_argument("--out", default="benchmark.json", help="File that results are written to (JSON).")
+    parser.add_argument("--baseline", default=None, help="Results of a previous run to compare to.")
+    parser.add_argument("--backends", nargs="+", default=["numpy", "tf1"])
+    parser.add_argument("--n_obs", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--n_features", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument("--n_conditions", nargs="+", type=int, default=[2, 8])
+    parser.add_argument("--n_batches", nargs="+", type=int, default=[0, 4])
+    parser.add_argument("--rtol_seconds", type=float, default=0.25)
+    parser.add_argument("--rtol_peak_rss", type=float, default=0.25)
+    parser.add_argument("--no_isolate", action="store_true", help="Run all cases in this process.")
+    args = parser.parse_args(args)
+
+    cases = grid(
+        n_obs=args.n_obs,
+        n_features=args.n_features,
+        n_conditions=args.n_conditions,
+        n_batches=args.n_batches,
+        backends=args.backends
+    )
+    results = run(cases=cases, isolate=not args.no_isolate)
+    save(results=results, path=args.out)
+    if args.baseline is None:
+        return 0
+
+    regressions = compare(
+        results=results,
+        baseline=load(args.baseline),
+        rtol_seconds=args.rtol_seconds,
+        rtol_peak_rss=args.rtol_peak_rss
+    )
+    for x in regressions:
+        print("regression: %s" % json.dumps(x, sort_keys=True))
+    print("%i regressions in %i cases" % (len(regressions), len(results)))
+    return 1 if len(regressions) > 0 else 0
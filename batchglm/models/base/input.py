@@ -15,9 +15,87 @@ except ImportError:
     anndata = None
     Raw = None
 
+try:
+    from anndata._core.sparse_dataset import BaseCompressedSparseDataset as SparseDataset
+except ImportError:
+    try:
+        from anndata._core.sparse_dataset import SparseDataset
+    except ImportError:
+        SparseDataset = None
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
 logger = logging.getLogger(__name__)
 
 
+class _LazySparseArray:
+    """
+    Array interface around a scipy.sparse matrix or a sparse matrix stored on disk in a backed AnnData object.
+
+    The matrix is kept in its storage format and data type. Slices are only extracted when dask evaluates a chunk
+    and are returned as sparse.COO of the requested dtype.
+    """
+
+    def __init__(self, dataset, dtype):
+        self.dataset = dataset
+        self.shape = tuple(dataset.shape)
+        self.dtype = np.dtype(dtype)
+        self.ndim = 2
+
+    def __getitem__(self, key):
+        return sparse.COO.from_scipy_sparse(scipy.sparse.csr_matrix(self.dataset[key]).astype(self.dtype))
+
+
+def is_disk_backed(x) -> bool:
+    """
+    Whether x is an array that is stored on disk: np.memmap, zarr array, HDF5 dataset or sparse matrix of a backed
+    AnnData object.
+    """
+    return isinstance(x, np.memmap) or \
+        (zarr is not None and isinstance(x, zarr.Array)) or \
+        (h5py is not None and isinstance(x, h5py.Dataset)) or \
+        (SparseDataset is not None and isinstance(x, SparseDataset))
+
+
+def from_array_lazy(x, chunks, cast_dtype=None) -> dask.array.core.Array:
+    """
+    Wrap an array into a dask array without copying or reading it.
+
+    Chunks are extracted, or read from disk, when they are evaluated and are cast to cast_dtype at that point.
+
+    :param x: np.ndarray, scipy.sparse.csr_matrix or array that is stored on disk, see is_disk_backed().
+    :param chunks: Chunk sizes (observations, features).
+    :param cast_dtype: Data type of evaluated chunks, data type of x if None.
+    """
+    chunks = tuple([int(c) for c in chunks])
+    if isinstance(x, scipy.sparse.spmatrix) or (SparseDataset is not None and isinstance(x, SparseDataset)):
+        dtype = np.dtype(cast_dtype if cast_dtype is not None else x.dtype)
+        return dask.array.from_array(
+            _LazySparseArray(dataset=x, dtype=dtype),
+            chunks=chunks,
+            asarray=False,
+            lock=not isinstance(x, scipy.sparse.spmatrix),
+            meta=sparse.COO.from_numpy(np.zeros([0, 0], dtype=dtype))
+        )
+    x_dask = dask.array.from_array(
+        x,
+        chunks=chunks,
+        # HDF5 files cannot be read from multiple threads:
+        lock=h5py is not None and isinstance(x, h5py.Dataset)
+    )
+    if cast_dtype is not None and np.dtype(cast_dtype) != x_dask.dtype:
+        x_dask = x_dask.astype(cast_dtype)
+    return x_dask
+
+
 class InputDataBase:
     """
     Base class for all input data types.
@@ -26,6 +104,7 @@ class InputDataBase:
     observations: List[str]
     chunk_size_cells: int
     chunk_size_genes: int
+    x_lazy: bool
 
     def __init__(
             self,
@@ -35,7 +114,8 @@ class InputDataBase:
             chunk_size_cells: int = 100000,
             chunk_size_genes: int = 100,
             as_dask: bool = True,
-            cast_dtype=None
+            cast_dtype=None,
+            compact_counts: bool = False
     ):
         """
         Create a new InputData object.
@@ -45,47 +125,68 @@ class InputDataBase:
         Can be either:
             - np.ndarray: NumPy array containing the raw data
             - anndata.AnnData: AnnData object containing the count data and optional the design models
-                stored as data.obsm[design_loc] and data.obsm[design_scale]
+                stored as data.obsm[design_loc] and data.obsm[design_scale].
+                If the AnnData object is backed (backed='r'), the count data are only read chunk by chunk.
+            - np.memmap, zarr.Array, h5py.Dataset: arrays stored on disk, these are only read chunk by chunk.
         :param observation_names: (optional) names of the observations.
         :param feature_names: (optional) names of the features.
         :param cast_dtype: data type of all data; should be either float32 or float64
+        :param compact_counts: Keep the count data in their own data type, e.g. a compact integer type, and storage
+            format (dense or scipy.sparse.csr_matrix) without copying them. With as_dask, chunks are only cast to
+            cast_dtype when they are evaluated. Otherwise, the count data are not cast.
         :return: InputData object
         """
         self.observations = observation_names
         self.features = feature_names
         if isinstance(data, np.ndarray) or \
                 isinstance(data, scipy.sparse.csr_matrix) or \
-                isinstance(data, dask.array.core.Array):
+                isinstance(data, dask.array.core.Array) or \
+                is_disk_backed(data):
             self.x = data
-        elif isinstance(data, anndata.AnnData) or isinstance(data, Raw):
+        elif anndata is not None and (isinstance(data, anndata.AnnData) or isinstance(data, Raw)):
             self.x = data.X
         elif isinstance(data, InputDataBase):
             self.x = data.x
         else:
             raise ValueError("type of data %s not recognized" % type(data))
 
-        if as_dask:
+        if compact_counts and as_dask and isinstance(self.x, dask.array.core.Array):
+            self.x = self.x.compute()
+        # Whether the count data stay in their storage, on disk or in a compact data type, and are only read and
+        # cast chunk by chunk when the dask array is evaluated:
+        self.x_lazy = bool(as_dask and (is_disk_backed(self.x) or compact_counts))
+        if self.x_lazy:
+            self.x = from_array_lazy(x=self.x, chunks=(chunk_size_cells, chunk_size_genes), cast_dtype=cast_dtype)
+        elif is_disk_backed(self.x):
+            # Read into memory, np.memmap is already an np.ndarray.
+            if SparseDataset is not None and isinstance(self.x, SparseDataset):
+                self.x = scipy.sparse.csr_matrix(self.x.to_memory())
+            elif not isinstance(self.x, np.memmap):
+                self.x = np.asarray(self.x[...])
+            if cast_dtype is not None and not compact_counts:
+                self.x = self.x.astype(cast_dtype, copy=False)
+        elif as_dask:
             if isinstance(self.x, dask.array.core.Array):
                 self.x = self.x.compute()
             # Need to wrap dask around the COO matrix version of the sparse package if matrix is sparse.
             if isinstance(self.x, scipy.sparse.spmatrix):
                 self.x = dask.array.from_array(
                     sparse.COO.from_scipy_sparse(
-                        self.x.astype(cast_dtype if cast_dtype is not None else self.x.dtype)
+                        self.x.astype(cast_dtype if cast_dtype is not None else self.x.dtype, copy=False)
                     ),
                     chunks=(chunk_size_cells, chunk_size_genes),
                     asarray=False
                 )
             else:
                 self.x = dask.array.from_array(
-                    self.x.astype(cast_dtype if cast_dtype is not None else self.x.dtype),
+                    self.x.astype(cast_dtype if cast_dtype is not None else self.x.dtype, copy=False),
                     chunks=(chunk_size_cells, chunk_size_genes),
                 )
         else:
             if isinstance(self.x, dask.array.core.Array):
                 self.x = self.x.compute()
-            if cast_dtype is not None:
-                self.x = self.x.astype(cast_dtype)
+            if cast_dtype is not None and not compact_counts:
+                self.x = self.x.astype(cast_dtype, copy=False)
 
         self._feature_allzero = np.sum(self.x, axis=0) == 0
         self.chunk_size_cells = chunk_size_cells
@@ -38,7 +38,8 @@ class InputDataGLM(InputDataBase):
             chunk_size_cells: int = 1e6,
             chunk_size_genes: int = 100,
             as_dask: bool = True,
-            cast_dtype="float64"
+            cast_dtype="float64",
+            compact_counts: bool = False
     ):
         """
         Create a new InputData object.
@@ -47,7 +48,9 @@ class InputDataGLM(InputDataBase):
             Can be either:
                 - np.ndarray: NumPy array containing the raw data
                 - anndata.AnnData: AnnData object containing the count data and optional the design models
-                    stored as data.obsm[design_loc] and data.obsm[design_scale]
+                    stored as data.obsm[design_loc] and data.obsm[design_scale].
+                    If the AnnData object is backed (backed='r'), the count data are only read chunk by chunk.
+                - np.memmap, zarr.Array, h5py.Dataset: arrays stored on disk, these are only read chunk by chunk.
         :param design_loc: Some matrix format (observations x mean model parameters)
             The location design model. Optional if already specified in `data`
         :param design_loc_names: (optional)
@@ -78,6 +81,10 @@ class InputDataGLM(InputDataBase):
             Names of the features.
         :param cast_dtype:
             If this option is set, all provided data will be casted to this data type.
+            Data that already are of this type are not copied.
+        :param compact_counts:
+            Keep the count data in their own data type, e.g. a compact integer type, and storage format without
+            copying them. With as_dask, chunks of count data are only cast to cast_dtype when they are evaluated.
         :return: InputData object
         """
         InputDataBase.__init__(
@@ -88,9 +95,20 @@ class InputDataGLM(InputDataBase):
             chunk_size_cells=chunk_size_cells,
             chunk_size_genes=chunk_size_genes,
             cast_dtype=cast_dtype,
-            as_dask=as_dask
+            as_dask=as_dask,
+            compact_counts=compact_counts
         )
 
+        # Designs, constraints and size factors are kept in a floating point type, also for compact integer counts.
+        # Without cast_dtype, this is float64 for integer counts, numpy backend models cast designs to their compute
+        # data type for mixed precision training.
+        if cast_dtype is not None:
+            dtype = cast_dtype
+        elif np.issubdtype(self.x.dtype, np.floating):
+            dtype = self.x.dtype
+        else:
+            dtype = np.float64
+
         design_loc, design_loc_names = parse_design(
             design_matrix=design_loc,
             param_names=design_loc_names
@@ -102,16 +120,16 @@ class InputDataGLM(InputDataBase):
 
         if as_dask:
             self.design_loc = dask.array.from_array(
-                design_loc.astype(cast_dtype if cast_dtype is not None else self.x.dtype),
+                design_loc.astype(dtype, copy=False),
                 chunks=(chunk_size_cells, 1000),
             )
             self.design_scale = dask.array.from_array(
-                design_scale.astype(cast_dtype if cast_dtype is not None else self.x.dtype),
+                design_scale.astype(dtype, copy=False),
                 chunks=(chunk_size_cells, 1000),
             )
         else:
-            self.design_loc = design_loc.astype(cast_dtype if cast_dtype is not None else self.x.dtype)
-            self.design_scale = design_scale.astype(cast_dtype if cast_dtype is not None else self.x.dtype)
+            self.design_loc = design_loc.astype(dtype, copy=False)
+            self.design_scale = design_scale.astype(dtype, copy=False)
         self._design_loc_names = design_loc_names
         self._design_scale_names = design_scale_names
 
@@ -129,16 +147,16 @@ class InputDataGLM(InputDataBase):
         )
         if as_dask:
             self.constraints_loc = dask.array.from_array(
-                constraints_loc.astype(cast_dtype if cast_dtype is not None else self.x.dtype),
+                constraints_loc.astype(dtype, copy=False),
                 chunks=(1000, 1000),
             )
             self.constraints_scale = dask.array.from_array(
-                constraints_scale.astype(cast_dtype if cast_dtype is not None else self.x.dtype),
+                constraints_scale.astype(dtype, copy=False),
                 chunks=(1000, 1000),
             )
         else:
-            self.constraints_loc = constraints_loc.astype(cast_dtype if cast_dtype is not None else self.x.dtype)
-            self.constraints_scale = constraints_scale.astype(cast_dtype if cast_dtype is not None else self.x.dtype)
+            self.constraints_loc = constraints_loc.astype(dtype, copy=False)
+            self.constraints_scale = constraints_scale.astype(dtype, copy=False)
         self._loc_names = loc_names
         self._scale_names = scale_names
 
@@ -151,12 +169,11 @@ class InputDataGLM(InputDataBase):
                 raise ValueError("received size factors with dimension=%i" % len(size_factors.shape))
         if as_dask:
             self.size_factors = dask.array.from_array(
-                size_factors.astype(cast_dtype if cast_dtype is not None else self.x.dtype),
+                size_factors.astype(dtype, copy=False),
                 chunks=(chunk_size_cells, 1),
             ) if size_factors is not None else None
         else:
-            self.size_factors =  size_factors.astype(cast_dtype if cast_dtype is not None else self.x.dtype) \
-                if size_factors is not None else None
+            self.size_factors = size_factors.astype(dtype, copy=False) if size_factors is not None else None
 
     @property
     def design_loc_names(self):
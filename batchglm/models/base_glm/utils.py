@@ -134,7 +134,8 @@ def closedform_glm_scale(
         groupwise_means=None,
         link_fn=None,
         inv_link_fn=None,
-        compute_scales_fun=None
+        compute_scales_fun=None,
+        dtype=None
 ):
     r"""
     Calculates a closed-form solution for the scale parameters of GLMs.
@@ -143,10 +144,15 @@ def closedform_glm_scale(
     :param constraints: some design constraints
     :param size_factors: size factors for X
     :param groupwise_means: optional, in case if already computed this can be specified to spare double-calculation
+    :param dtype: floating point data type in which squares of x are computed, data type of x if None and x is
+        floating point data, float64 otherwise. Integer counts are cast before they are squared so that they do not
+        overflow.
     :return: tuple (groupwise_scales, logphi, rmsd)
     """
     if size_factors is not None:
         x = x / size_factors
+    if dtype is None:
+        dtype = x.dtype if np.issubdtype(x.dtype, np.floating) else np.float64
 
     # to circumvent nonlocal error
     provided_groupwise_means = groupwise_means
@@ -164,11 +170,11 @@ def closedform_glm_scale(
         # calculated variance via E(x)^2 or directly depending on whether `mu` was specified
         if isinstance(x, scipy.sparse.csr_matrix):
             expect_xsq = np.asarray(np.vstack([
-                np.asarray(np.mean(x[np.where(grouping == g)[0], :].power(2), axis=0))
+                np.asarray(np.mean(x[np.where(grouping == g)[0], :].astype(dtype).power(2), axis=0))
                 for g in np.unique(grouping)]
             ))
         else:
-            expect_xsq = np.vstack([np.mean(np.square(x[np.where(grouping == g)[0], :]), axis=0)
+            expect_xsq = np.vstack([np.mean(np.square(x[np.where(grouping == g)[0], :].astype(dtype)), axis=0)
                                     for g in np.unique(grouping)])
         expect_x_sq = np.square(gw_means)
         variance = expect_xsq - expect_x_sq
@@ -44,7 +44,8 @@ def closedform_nb_glm_logphi(
         size_factors=None,
         groupwise_means=None,
         link_fn=np.log,
-        invlink_fn=np.exp
+        invlink_fn=np.exp,
+        dtype=None
 ):
     r"""
     Calculates a closed-form solution for the log-scale parameters of negative-binomial GLMs.
@@ -55,6 +56,7 @@ def closedform_nb_glm_logphi(
     :param constraints: some design constraints
     :param size_factors: size factors for X
     :param groupwise_means: optional, in case if already computed this can be specified to spare double-calculation
+    :param dtype: floating point data type in which squares of x are computed, see closedform_glm_scale().
     :return: tuple (groupwise_scales, logphi, rmsd)
     """
 
@@ -71,7 +73,8 @@ def closedform_nb_glm_logphi(
         groupwise_means=groupwise_means,
         link_fn=link_fn,
         inv_link_fn=invlink_fn,
-        compute_scales_fun=compute_scales_fun
+        compute_scales_fun=compute_scales_fun,
+        dtype=dtype
     )
 
 
@@ -153,7 +156,8 @@ def init_par(
                     constraints=input_data.constraints_scale[[0], :][:, [0]],
                     size_factors=input_data.size_factors,
                     groupwise_means=None,
-                    link_fn=lambda r: np.log(r+np.nextafter(0, 1, dtype=r.dtype))
+                    link_fn=lambda r: np.log(r+np.nextafter(0, 1, dtype=r.dtype)),
+                    dtype=input_data.design_scale.dtype
                 )
                 init_b = np.zeros([input_data.num_scale_params, input_data.num_features])
                 init_b[0, :] = init_b_intercept
@@ -178,7 +182,8 @@ def init_par(
                     constraints=input_data.constraints_scale,
                     size_factors=input_data.size_factors,
                     groupwise_means=groupwise_means,
-                    link_fn=lambda r: np.log(r)
+                    link_fn=lambda r: np.log(r),
+                    dtype=input_data.design_scale.dtype
                 )
             elif init_b.lower() == "all_zero":
                 init_b = np.zeros([input_data.num_scale_params, input_data.x.shape[1]])
@@ -192,8 +197,8 @@ def init_par(
 
             init_loc = np.zeros([input_data.num_loc_params, input_data.num_features])
             for parm in my_loc_names:
-                init_idx = np.where(init_model.input_data.loc_names == parm)[0]
-                my_idx = np.where(input_data.loc_names == parm)[0]
+                init_idx = np.where(np.asarray(init_model.input_data.loc_names) == parm)[0]
+                my_idx = np.where(np.asarray(input_data.loc_names) == parm)[0]
                 init_loc[my_idx] = init_model.a_var[init_idx]
 
             init_a = init_loc
@@ -206,8 +211,8 @@ def init_par(
 
             init_scale = np.zeros([input_data.num_scale_params, input_data.num_features])
             for parm in my_scale_names:
-                init_idx = np.where(init_model.input_data.scale_names == parm)[0]
-                my_idx = np.where(input_data.scale_names == parm)[0]
+                init_idx = np.where(np.asarray(init_model.input_data.scale_names) == parm)[0]
+                my_idx = np.where(np.asarray(input_data.scale_names) == parm)[0]
                 init_scale[my_idx] = init_model.b_var[init_idx]
 
             init_b = init_scale
@@ -5,6 +5,13 @@ ACCURACY_MARGIN_RELATIVE_TO_LIMIT = float(os.environ.get('BATCHGLM_ACCURACY_MARG
 FIM_MODE = str(os.environ.get('FIM_MODE', "analytic"))
 HESSIAN_MODE = str(os.environ.get('HESSIAN_MODE', "analytic"))
 JACOBIAN_MODE = str(os.environ.get('JACOBIAN_MODE', "analytic"))
+# Assembly of FIM, hessian and jacobian reductions over observations in numpy backend ("auto", "groupwise", "gemm"
+# or "einsum"):
+FIM_ASSEMBLY = str(os.environ.get('FIM_ASSEMBLY', "auto"))
+FIM_ASSEMBLY_MAX_GROUPS = 500
+# Pack data of features that are not converged into a contiguous array once their number dropped below this fraction
+# of the currently packed features in numpy backend, 0 disables packing:
+ACTIVE_SET_REPACK_FRACTION = 0.5
 CHOLESKY_LSTSQS = False
 CHOLESKY_LSTSQS_BATCHED = False
 EVAL_ON_BATCHED = False
@@ -27,6 +34,18 @@ XTOL_BY_FEATURE_SCALE = 1e-6
 GTOL_BY_FEATURE_LOC = 1e-8
 GTOL_BY_FEATURE_SCALE = 1e-8
 
+# Maximum absolute step of Newton-Raphson updates of the numpy backend scale model in linker space:
+NR_B_MAX_STEP = 5.
+# Sufficient decrease constant of the backtracking line search of IRLS location updates in numpy backend:
+IRLS_ARMIJO_C = 1e-4
+# Maximum step length of SQUAREM extrapolations of parameters in numpy backend:
+SQUAREM_MAX_STEP_LENGTH = 16.
+
+# Number of the most recent training events and log-likelihood vectors that are kept by numpy backend estimators:
+TELEMETRY_BUFFER_SIZE = int(os.environ.get('BATCHGLM_TELEMETRY_BUFFER_SIZE', 1000))
+# Minimum number of seconds between two progress events of scale model updates in numpy backend estimators:
+TELEMETRY_PROGRESS_INTERVAL = float(os.environ.get('BATCHGLM_TELEMETRY_PROGRESS_INTERVAL', 1.))
+
 try:
     import tensorflow as tf
 
@@ -1,4 +1,5 @@
 from .processModel import ProcessModelGlm
 from .model import ModelIwls
 from .estimator import EstimatorGlm
-from .vars import ModelVarsGlm
\ No newline at end of file
+from .vars import ModelVarsGlm
+from .telemetry import Telemetry, TelemetrySink, CallbackSink, JsonLinesSink, LoggingSink
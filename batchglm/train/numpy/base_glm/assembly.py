@@ -0,0 +1,300 @@
+import abc
+import copy
+import dask.array
+import logging
+import numpy as np
+import scipy.sparse
+
+from .external import pkg_constants
+
+logger = logging.getLogger("batchglm")
+
+
+class Assembly(metaclass=abc.ABCMeta):
+    """
+    Assembly of the feature-wise reductions over observations that make up FIMs, hessians and jacobians.
+
+    All reductions have the form of weighted cross products of the rows of two design matrices (in the space of
+    inferred parameters) with observation and feature specific weights:
+
+        - xtwx(w) = sum_o w[o, f] * xh_a[o, b] * xh_b[o, c]: (features x inferred param a x inferred param b)
+        - xtw(w) = sum_o w[o, f] * xh_a[o, b]: (features x inferred param a)
+
+    Weights are arrays of shape (observations x features) and can be numpy or dask arrays.
+    """
+
+    xh_a: np.ndarray
+    xh_b: np.ndarray
+    dtype: np.dtype
+
+    def __init__(
+            self,
+            xh_a: np.ndarray,
+            xh_b: np.ndarray = None,
+            dtype=None
+    ):
+        """
+
+        :param xh_a: Design matrix in space of inferred parameters (observations x inferred param a)
+        :param xh_b: Design matrix in space of inferred parameters (observations x inferred param b).
+            Same as xh_a if None.
+        :param dtype: Data type in which reductions are accumulated, data type of the weights if None.
+        """
+        self.xh_a = xh_a
+        self.xh_b = xh_b if xh_b is not None else xh_a
+        self.dtype = np.dtype(dtype) if dtype is not None else None
+
+    def subset(self, s):
+        """
+        Assembly over the observations in s, e.g. a chunk of observations.
+
+        :param s: Slice or index array of observations.
+        """
+        assembly = copy.copy(self)
+        assembly.xh_a = self.xh_a[s]
+        assembly.xh_b = self.xh_b[s]
+        return assembly
+
+    @abc.abstractmethod
+    def xtwx(self, w) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def xtw(self, w) -> np.ndarray:
+        pass
+
+
+class AssemblyEinsum(Assembly):
+    """
+    Assembly via einsum over all observations.
+
+    This materializes a (features x observations x inferred param) intermediate.
+    """
+
+    def xtwx(self, w) -> np.ndarray:
+        return np.einsum(
+            'fob,oc->fbc',
+            np.einsum('ob,of->fob', self.xh_a, w),
+            self.xh_b,
+            dtype=self.dtype
+        )
+
+    def xtw(self, w) -> np.ndarray:
+        return np.einsum('ob,of->fb', self.xh_a, w, dtype=self.dtype)
+
+
+class AssemblyGemm(Assembly):
+    """
+    Assembly via one matrix multiplication of the weights with precomputed cross products of design rows.
+
+    The cross products xh_a[o, b] * xh_b[o, c] of each observation are computed once, packed to the upper triangle
+    if xh_a and xh_b are the same design. xtwx(w) is then w^T @ outer for all features at once, which needs
+    O(observations x inferred param^2) memory and runs as a BLAS-3 matrix multiplication.
+    """
+
+    outer: np.ndarray
+    unpack: np.ndarray
+
+    def __init__(
+            self,
+            xh_a: np.ndarray,
+            xh_b: np.ndarray = None,
+            dtype=None
+    ):
+        Assembly.__init__(self=self, xh_a=xh_a, xh_b=xh_b, dtype=dtype)
+        if isinstance(self.xh_a, dask.array.core.Array):
+            self.xh_a = self.xh_a.compute()
+        if isinstance(self.xh_b, dask.array.core.Array):
+            self.xh_b = self.xh_b.compute()
+        n_par_a = self.xh_a.shape[1]
+        n_par_b = self.xh_b.shape[1]
+        if xh_b is None:
+            idx_b, idx_c = np.triu_indices(n_par_a)
+        else:
+            idx_b, idx_c = [np.reshape(x, [-1]) for x in np.meshgrid(
+                np.arange(0, n_par_a), np.arange(0, n_par_b), indexing="ij"
+            )]
+        # Cross products of design rows: (observations x packed inferred param a x inferred param b)
+        self.outer = self.xh_a[:, idx_b] * self.xh_b[:, idx_c]
+        if self.dtype is not None:
+            self.outer = self.outer.astype(self.dtype, copy=False)
+        # Scatter of packed entries to both triangles: (packed x inferred param a * inferred param b)
+        self.unpack = np.zeros([len(idx_b), n_par_a * n_par_b], dtype=self.outer.dtype)
+        self.unpack[np.arange(0, len(idx_b)), idx_b * n_par_b + idx_c] = 1.
+        if xh_b is None:
+            self.unpack[np.arange(0, len(idx_b)), idx_c * n_par_b + idx_b] = 1.
+
+    def subset(self, s):
+        assembly = Assembly.subset(self=self, s=s)
+        assembly.outer = self.outer[s]
+        return assembly
+
+    def xtwx(self, w) -> np.ndarray:
+        # (features x packed) -> (features x inferred param a * inferred param b)
+        xtwx = np.matmul(np.matmul(w.T, self.outer), self.unpack)
+        return np.reshape(xtwx, [w.shape[1], self.xh_a.shape[1], self.xh_b.shape[1]])
+
+    def xtw(self, w) -> np.ndarray:
+        xh_a = self.xh_a.astype(self.dtype, copy=False) if self.dtype is not None else self.xh_a
+        return np.matmul(w.T, xh_a)
+
+
+def _segment_sum(w, groups, n_groups, dtype=None):
+    """
+    Sum rows of w by group.
+
+    :param w: (observations x features)
+    :param groups: (observations) group index of each observation.
+    :param n_groups: number of groups.
+    :param dtype: Data type of the sums, data type of w if None.
+    :return: (groups x features)
+    """
+    indicator = scipy.sparse.csr_matrix(
+        (np.ones([groups.shape[0]], dtype=dtype if dtype is not None else w.dtype),
+         (groups, np.arange(0, groups.shape[0]))),
+        shape=(n_groups, groups.shape[0])
+    )
+    return np.asarray(indicator @ w)
+
+
+class AssemblyGroupwise(Assembly):
+    """
+    Assembly via group-wise sufficient statistics for designs with few unique rows (e.g. categorical designs).
+
+    Observations with the same design row contribute identical cross products, so that weights are first summed
+    into (groups x features) and then contracted with the small matrix of unique design rows:
+    This replaces the reduction over all observations by a segment sum and a small matrix multiplication.
+    """
+
+    xh_a_unique: np.ndarray
+    xh_b_unique: np.ndarray
+    groups: np.ndarray
+
+    def __init__(
+            self,
+            xh_a: np.ndarray,
+            xh_b: np.ndarray = None,
+            dtype=None,
+            unique_rows: np.ndarray = None,
+            groups: np.ndarray = None
+    ):
+        """
+
+        :param unique_rows: (optional) unique rows of the horizontally concatenated design matrices
+            (groups x inferred param a + inferred param b) if already computed, see unique_design().
+        :param groups: (optional) group index of each observation (observations) if already computed.
+        """
+        Assembly.__init__(self=self, xh_a=xh_a, xh_b=xh_b, dtype=dtype)
+        if unique_rows is None or groups is None:
+            unique_rows, groups = unique_design(xh_a=self.xh_a, xh_b=xh_b)
+        self.groups = groups
+        self.xh_a_unique = unique_rows[:, :self.xh_a.shape[1]]
+        if xh_b is None:
+            self.xh_b_unique = self.xh_a_unique
+        else:
+            self.xh_b_unique = unique_rows[:, self.xh_a.shape[1]:]
+        # Cross products of unique design rows: (groups x inferred param a * inferred param b)
+        self.outer_unique = np.reshape(
+            np.einsum('gb,gc->gbc', self.xh_a_unique, self.xh_b_unique),
+            [self.xh_a_unique.shape[0], -1]
+        )
+
+    def subset(self, s):
+        assembly = Assembly.subset(self=self, s=s)
+        assembly.groups = self.groups[s]
+        return assembly
+
+    @property
+    def n_groups(self) -> int:
+        return self.xh_a_unique.shape[0]
+
+    def group_sum(self, w):
+        """
+        Sum weights by group.
+
+        :param w: (observations x features)
+        :return: (groups x features)
+        """
+        dtype = self.dtype if self.dtype is not None else w.dtype
+        if isinstance(w, dask.array.core.Array):
+            groups = dask.array.from_array(self.groups, chunks=(w.chunks[0],))
+            partial_sums = dask.array.map_blocks(
+                lambda w_block, groups_block: _segment_sum(w_block, groups_block[:, 0], self.n_groups, dtype),
+                w,
+                groups[:, None],
+                chunks=((self.n_groups,) * len(w.chunks[0]), w.chunks[1]),
+                dtype=dtype
+            )
+            return dask.array.sum(
+                dask.array.reshape(partial_sums, [len(w.chunks[0]), self.n_groups, w.shape[1]]),
+                axis=0
+            )
+        else:
+            return _segment_sum(np.asarray(w), self.groups, self.n_groups, dtype)
+
+    def xtwx(self, w) -> np.ndarray:
+        w_groups = self.group_sum(w)
+        return np.reshape(
+            np.matmul(w_groups.T, self.outer_unique),
+            [w_groups.shape[1], self.xh_a_unique.shape[1], self.xh_b_unique.shape[1]]
+        )
+
+    def xtw(self, w) -> np.ndarray:
+        return np.matmul(self.group_sum(w).T, self.xh_a_unique)
+
+
+def unique_design(
+        xh_a: np.ndarray,
+        xh_b: np.ndarray = None
+):
+    """
+    Unique rows of (horizontally concatenated) design matrices.
+
+    :return: Tuple of unique rows (groups x inferred param) and group index of each observation (observations).
+    """
+    xh = xh_a if xh_b is None else np.concatenate([xh_a, xh_b], axis=1)
+    if isinstance(xh, dask.array.core.Array):  # axis argument not supported by dask in .unique()
+        xh = xh.compute()
+    unique_rows, groups = np.unique(xh, axis=0, return_inverse=True)
+    return unique_rows, np.reshape(groups, [-1])
+
+
+def build_assembly(
+        xh_a: np.ndarray,
+        xh_b: np.ndarray = None,
+        mode: str = None,
+        dtype=None
+) -> Assembly:
+    """
+    Choose assembly engine for a pair of design matrices.
+
+    :param dtype: Data type in which reductions are accumulated, data type of the weights if None.
+
+    :param mode: Assembly mode, one of:
+
+        - "auto": "groupwise" if the design has few unique rows, "gemm" otherwise.
+        - "groupwise": AssemblyGroupwise
+        - "gemm": AssemblyGemm
+        - "einsum": AssemblyEinsum
+
+        Defaults to pkg_constants.FIM_ASSEMBLY.
+    """
+    if mode is None:
+        mode = pkg_constants.FIM_ASSEMBLY
+    mode = mode.lower()
+    if mode == "auto":
+        unique_rows, groups = unique_design(xh_a=xh_a, xh_b=xh_b)
+        if unique_rows.shape[0] <= pkg_constants.FIM_ASSEMBLY_MAX_GROUPS and \
+                2 * unique_rows.shape[0] <= xh_a.shape[0]:
+            logger.debug("using group-wise assembly with %i groups" % unique_rows.shape[0])
+            return AssemblyGroupwise(xh_a=xh_a, xh_b=xh_b, dtype=dtype, unique_rows=unique_rows, groups=groups)
+        else:
+            return AssemblyGemm(xh_a=xh_a, xh_b=xh_b, dtype=dtype)
+    elif mode == "groupwise":
+        return AssemblyGroupwise(xh_a=xh_a, xh_b=xh_b, dtype=dtype)
+    elif mode == "gemm":
+        return AssemblyGemm(xh_a=xh_a, xh_b=xh_b, dtype=dtype)
+    elif mode == "einsum":
+        return AssemblyEinsum(xh_a=xh_a, xh_b=xh_b, dtype=dtype)
+    else:
+        raise ValueError("assembly mode %s not recognized" % mode)
@@ -0,0 +1,94 @@
+import concurrent.futures
+import logging
+import numpy as np
+import os
+import tempfile
+
+logger = logging.getLogger("batchglm")
+
+# Format of the training state in checkpoints, stored as format_version. Checkpoints without format_version were
+# written before per-feature scale model scheduling, trust regions and acceleration were added to the state.
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+def _write_atomic(path: str, state: dict):
+    """
+    Write state as .npz file to path via a temporary file in the same directory, so that path always holds a
+    complete checkpoint.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, path_tmp = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **state)
+        os.replace(path_tmp, path)
+    except BaseException:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+        raise
+
+
+class Checkpointer:
+    """
+    Writes training checkpoints in a background thread.
+
+    The state is copied when save() is called, so that training can continue to update its arrays while the
+    checkpoint is written. At most one checkpoint is written at a time, save() waits for the previous write.
+    """
+
+    path: str
+
+    def __init__(
+            self,
+            path: str
+    ):
+        """
+
+        :param path: File that checkpoints are written to (.npz), it is replaced by each checkpoint.
+        """
+        self.path = path
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._future = None
+
+    def save(self, state: dict):
+        """
+        Write a checkpoint asynchronously.
+
+        :param state: Dictionary of arrays and scalars.
+        """
+        self.wait()
+        state = dict([(k, np.array(v, copy=True)) for k, v in state.items()])
+        self._future = self._executor.submit(_write_atomic, self.path, state)
+
+    def wait(self):
+        """
+        Wait for the checkpoint that is currently written, errors of the write are raised here.
+        """
+        if self._future is not None:
+            future = self._future
+            self._future = None
+            future.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+def load_checkpoint(path: str) -> dict:
+    """
+    Read a checkpoint written by Checkpointer.
+
+    :return: Dictionary of arrays, scalars are returned as 0-dimensional arrays.
+    :raise ValueError: if the checkpoint was written in a newer format than CHECKPOINT_FORMAT_VERSION.
+    """
+    with np.load(path, allow_pickle=False) as f:
+        checkpoint = dict([(k, f[k]) for k in f.files])
+    format_version = int(checkpoint["format_version"]) if "format_version" in checkpoint.keys() else 0
+    if format_version > CHECKPOINT_FORMAT_VERSION:
+        raise ValueError(
+            "checkpoint %s has format version %i, only versions up to %i are supported"
+            % (path, format_version, CHECKPOINT_FORMAT_VERSION)
+        )
+    return checkpoint
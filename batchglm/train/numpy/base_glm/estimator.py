@@ -1,17 +1,27 @@
 import abc
+import collections
+import concurrent.futures
+import dask
 import dask.array
 import logging
-import multiprocessing
 import numpy as np
+import os
 import scipy
 import scipy.sparse
 import scipy.optimize
 import sparse
-import sys
 import time
 from typing import Tuple
 
-from .external import _EstimatorGLM, pkg_constants
+from .external import _EstimatorGLM, is_disk_backed, pkg_constants, cholesky_solve, cholesky_inverse, \
+    cholesky_inverse_from_factor, BatchedSolveResult
+from .shards import shard_data, split_features, train_shard
+from .checkpoint import CHECKPOINT_FORMAT_VERSION, Checkpointer, load_checkpoint
+from .incremental import IncrementalIwls, SufficientStatistics
+from .lazy import LazyIwls
+from .shared_pool import ScaleModelPool
+from .streaming import StreamingIwls
+from .telemetry import Telemetry
 from .training_strategies import TrainingStrategies
 
 logger = logging.getLogger("batchglm")
@@ -37,7 +47,33 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
         )
         self.dtype = dtype
         self.values = []
-        self.lls = []
+        # Training events and log-likelihoods by feature of the most recent iterations:
+        self.telemetry = Telemetry(buffer_size=pkg_constants.TELEMETRY_BUFFER_SIZE)
+        self.lls = collections.deque(maxlen=pkg_constants.TELEMETRY_BUFFER_SIZE)
+        self.iwls_solve_result = None
+        # Step fractions and losses of the features of the last line searched IRLS step, see iwls_step().
+        self.iwls_step_fraction = None
+        self.iwls_ll = None
+        # Trust region radii of location model updates by feature, see _iwls_trust_region().
+        self.trust_region_radius_a = None
+        # Parameters at the ends of the previous two location and scale model update cycles by feature and number
+        # of these cycle ends that are recorded, see _accelerate().
+        self._acceleration_params = None
+        self._acceleration_n = None
+        self.fisher_inv_result = None
+        self._b_pool = None
+        self._b_pool_warned = False
+        # Number of features and of finished features of the current scale model update, and time of the last
+        # progress event, see _scale_progress().
+        self._scale_progress_state = None
+        self._streaming = None
+        self.fully_converged = None
+        # Cholesky factors of the last IRLS step and the parameters they were computed at, see fisher_inv_j().
+        self._iwls_factor = None
+        # Outputs of finalize() are evaluated on first access and cached for one parameter version.
+        self._finalized = False
+        self._final_cache = {}
+        self._final_cache_version = None
 
         self.TrainingStrategies = TrainingStrategies
 
@@ -53,163 +89,564 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
             lr_b: float = 1e-2,
             max_iter_b: int = 1000,
             nproc: int = 3,
+            streaming: bool = False,
+            chunk_size_cells: int = None,
+            polish_steps: int = 0,
+            checkpoint_path: str = None,
+            checkpoint_every: int = 10,
+            resume_from: str = None,
+            incremental_stats=None,
+            incremental_steps: int = 5,
+            lazy: bool = False,
+            scheduler="threads",
+            max_halvings_a: int = 5,
+            trust_region_a: bool = False,
+            acceleration: str = None,
             **kwargs
     ):
         """
         Train GLM.
 
+        Progress is reported as events of self.telemetry: "train_start", one "iteration" event per iteration with
+        timings of its parts, the number of updated features, of singular IRLS systems and of reverted steps,
+        and "train_end".
+
         Convergence decision:
-        Location and scale model updates are done in separate iterations and are done with different algorithms.
-        Scale model updates are much less frequent (only every update_b_freq-th iteration) as they are much slower.
-        During a stretch of update_b_freq number of location model updates between two scale model updates, convergence
-        of the location model is tracked with self.model.converged. This is re-set after a scale model update, as this
-        convergence only holds conditioned on a particular scale model value.
+        Location and scale model updates of a feature are done in separate iterations and are done with different
+        algorithms. Scale model updates are scheduled by feature: A feature enters the scale model update of the next
+        iteration once its location model converged or once update_b_freq location model updates were run since its
+        last scale model update. All other features that are not converged receive a location model update in
+        this iteration, so that each iteration runs one location model update and one scale model update, each on
+        the features that are ready for it.
+        Between two scale model updates of a feature, convergence of its location model is tracked with
+        self.model.converged. This is re-set after a scale model update, as this convergence only holds conditioned
+        on a particular scale model value.
         Full convergence of a feature wise model is evaluated after each scale model update: If the loss function based
         convergence criterium holds across the cumulative updates of the sequence of location updates and last scale
         model update, the feature is considered converged. For this, the loss value at the last scale model update is
         save in ll_last_b_update. Full convergence is saved in fully_converged.
 
         :param max_steps:
-        :param method_b:
-        :param update_b_freq: One over minimum frequency of scale model updates per location model update.
-            A scale model update will be run at least every update_b_freq number of location model update iterations.
+        :param method_b: Optimizer for the scale model:
+
+            - "brent": scipy.optimize.brent line search run separately for each feature.
+            - "brent_vectorized": Brent line search run on all features at the same time.
+            - "nr": damped Newton-Raphson updates run on all features at the same time.
+            - "gd": gradient descent.
+        :param update_b_freq: Maximum number of location model updates of a feature between two scale model updates
+            of this feature. Features enter the scale model update earlier if their location model converged.
         :param ftol_b:
         :param lr_b:
         :param max_iter_b:
         :param nproc:
+        :param streaming: Whether to stream over chunks of observations instead of materializing
+            (observations x features) arrays, see streaming.py. Peak memory is then bounded by the chunk size.
+            Only the "nr" scale model update supports streaming.
+        :param chunk_size_cells: Number of observations per chunk if streaming,
+            defaults to the chunk size of the input data.
+        :param polish_steps: Maximum number of iterations that are run after training with observation-level
+            quantities in the data type of the parameters if the model uses a lower precision compute data type,
+            see ModelIwls.set_compute_dtype(). The model then stays in full precision.
+        :param checkpoint_path: File (.npz) that the training state is written to every checkpoint_every iterations
+            and at the end of training. Checkpoints are written atomically in a background thread.
+        :param checkpoint_every: Number of iterations between two checkpoints.
+        :param resume_from: Checkpoint file written by a previous call of train() with the same data and settings.
+            Training continues from the state in this checkpoint, including the iteration counter.
+        :param incremental_stats: SufficientStatistics, or file written by SufficientStatistics.save(), of a previous
+            fit on the first observations of the data, see sufficient_statistics(). Only the observations that were
+            appended since are then read during the first incremental_steps iterations, the log-likelihood of the
+            previous observations is approximated by its second order expansion around the previous fit. Training
+            then continues on all observations until convergence. The estimator should be warm-started from the
+            previous fit, e.g. via init_model of the estimator. Requires method_b="nr".
+        :param incremental_steps: Maximum number of iterations with cached statistics of the previous observations.
+        :param lazy: Whether to evaluate each IRLS system, scale model score and log-likelihood as one dask graph on
+            scheduler, see lazy.py. Count data and linear predictors that are reused at the same parameters are
+            persisted on the scheduler. Only the "nr" scale model update supports lazy evaluation.
+        :param scheduler: dask scheduler of lazy evaluation: "threads", "processes", "synchronous", "distributed"
+            for a local dask.distributed cluster that is started for this training run, or a dask.distributed.Client.
+        :param max_halvings_a: Maximum number of step-halvings of the backtracking line search of location model
+            updates, see iwls_step(). Features without sufficient decrease of the loss after max_halvings_a halvings
+            keep their parameters.
+        :param trust_region_a: Whether to control location model updates with a trust region by feature instead of
+            the line search, see iwls_step(). Radii start at pkg_constants.TRUST_REGION_RADIUS_INIT.
+        :param acceleration: Extrapolation of the parameters of each feature after each of its scale model updates,
+            treating a sequence of location model updates followed by a scale model update as fixed-point map:
+
+            - None: no extrapolation
+            - "squarem": SQUAREM extrapolation from the ends of the last three cycles of a feature, see _accelerate().
+                The extrapolation is only kept if it decreases the loss.
         :param kwargs:
         :return:
         """
+        if chunk_size_cells is None:
+            chunk_size_cells = self.input_data.chunk_size_cells
+        if streaming and lazy:
+            raise ValueError("streaming and lazy evaluation cannot be combined")
+        if streaming:
+            if self._train_scale and method_b.lower() != "nr":
+                raise ValueError("method_b %s does not support streaming, use \"nr\"" % method_b)
+            self._streaming = StreamingIwls(model=self.model, chunk_size_cells=chunk_size_cells)
+        elif lazy:
+            if self._train_scale and method_b.lower() != "nr":
+                raise ValueError("method_b %s does not support lazy evaluation, use \"nr\"" % method_b)
+            self._streaming = LazyIwls(model=self.model, chunk_size_cells=chunk_size_cells, scheduler=scheduler)
+        else:
+            self._streaming = None
+        # Evaluation on all observations, which is replaced by an incremental evaluation during the first iterations
+        # of an incremental refit.
+        streaming_all = self._streaming
+        if incremental_stats is not None:
+            if self._train_scale and method_b.lower() != "nr":
+                raise ValueError("method_b %s does not support incremental refits, use \"nr\"" % method_b)
+            if isinstance(incremental_stats, str):
+                incremental_stats = SufficientStatistics.load(incremental_stats)
+            self._streaming = IncrementalIwls(
+                model=self.model,
+                stats=incremental_stats,
+                chunk_size_cells=chunk_size_cells
+            )
         # Iterate until conditions are fulfilled.
         train_step = 0
-        if self._train_scale:
-            if not self._train_loc:
-                update_b_freq = 1
-        else:
+        if not self._train_loc:
+            # All features are ready for a scale model update in each iteration.
+            update_b_freq = 0
+        elif not self._train_scale:
             update_b_freq = np.inf
-        epochs_until_b_update = update_b_freq
+        # Number of location model updates by feature since its last scale model update:
+        loc_steps = np.zeros([self.model.model_vars.n_features], dtype=np.int64)
+        if acceleration is not None and acceleration.lower() not in ["squarem"]:
+            raise ValueError("acceleration %s not recognized" % acceleration)
         fully_converged = np.tile(False, self.model.model_vars.n_features)
+        self._acceleration_params = np.zeros(
+            (2,) + self.model.model_vars.params.shape,
+            dtype=self.model.model_vars.params.dtype
+        )
+        self._acceleration_n = np.zeros([self.model.model_vars.n_features], dtype=np.int64)
+        self.trust_region_radius_a = np.zeros(
+            [self.model.model_vars.n_features],
+            dtype=self.model.model_vars.params.dtype
+        ) + \
+            pkg_constants.TRUST_REGION_RADIUS_INIT
 
-        ll_current = - self.model.ll_byfeature.compute()
-        ll_last_b_update = ll_current.copy()
-        #logging.getLogger("batchglm").info(
-        sys.stdout.write("iter   %i: ll=%f\n" % (0, np.sum(ll_current)))
-        while np.any(np.logical_not(fully_converged)) and \
-                train_step < max_steps:
-            t0 = time.time()
-            # Line search step for scale model:
-            # Run this update every update_b_freq iterations.
-            if epochs_until_b_update == 0:
-                # Compute update.
-                idx_update = np.where(np.logical_not(fully_converged))[0]
-                if self._train_scale:
-                    b_step = self.b_step(
-                        idx_update=idx_update,
-                        method=method_b,
-                        ftol=ftol_b,
-                        lr=lr_b,
-                        max_iter=max_iter_b,
-                        nproc=nproc
-                    )
-                    # Perform trial update.
-                    self.model.b_var = self.model.b_var + b_step
-                    # Reverse update by feature if update leads to worse loss:
-                    ll_proposal = - self.model.ll_byfeature_j(j=idx_update).compute()
-                    idx_bad_step = idx_update[np.where(ll_proposal > ll_current[idx_update])[0]]
-                    if isinstance(self.model.b_var, dask.array.core.Array):
-                        b_var_new = self.model.b_var.compute()
-                    else:
-                        b_var_new = self.model.b_var.copy()
-                    b_var_new[:, idx_bad_step] = b_var_new[:, idx_bad_step] - b_step[:, idx_bad_step]
-                    self.model.b_var = b_var_new
-                else:
-                    ll_proposal = ll_current[idx_update]
-                    idx_bad_step = np.array([], dtype=np.int32)
-                # Update likelihood vector with updated genes based on already evaluated proposal likelihood.
+        if resume_from is not None:
+            checkpoint = load_checkpoint(resume_from)
+            self.model.a_var = checkpoint["params"][:self.model.model_vars.npar_a]
+            self.model.b_var = checkpoint["params"][self.model.model_vars.npar_a:]
+            self.model.converged = checkpoint["converged"]
+            fully_converged = checkpoint["fully_converged"]
+            ll_current = checkpoint["ll_current"]
+            ll_last_b_update = checkpoint["ll_last_b_update"]
+            # Checkpoints of earlier formats do not contain the state of scale model scheduling, trust regions and
+            # acceleration, which then starts from its initial value.
+            loc_steps = checkpoint.get("loc_steps", loc_steps)
+            self.trust_region_radius_a = checkpoint.get("trust_region_radius_a", self.trust_region_radius_a)
+            self._acceleration_params = checkpoint.get("acceleration_params", self._acceleration_params)
+            self._acceleration_n = checkpoint.get("acceleration_n", self._acceleration_n)
+            train_step = int(checkpoint["train_step"])
+            self.lls.clear()
+            self.lls.extend(checkpoint["lls"])
+        else:
+            ll_current = - self._ll_byfeature_j(j=np.arange(0, self.model.model_vars.n_features))
+            ll_last_b_update = ll_current.copy()
+        if not self._train_loc and not self._train_scale:
+            # Nothing to train, e.g. exact closed-form location model and quick_scale.
+            fully_converged = np.tile(True, self.model.model_vars.n_features)
+            self.model.converged = fully_converged.copy()
+        self.telemetry.emit(
+            "train_start",
+            step=train_step,
+            ll=np.sum(ll_current),
+            n_features=self.model.model_vars.n_features,
+            resumed_from=resume_from,
+            timings=self.telemetry.pop_timings()
+        )
+        t_start = time.time()
+
+        checkpointer = Checkpointer(path=checkpoint_path) if checkpoint_path is not None else None
+
+        def save_checkpoint():
+            checkpointer.save({
+                "format_version": CHECKPOINT_FORMAT_VERSION,
+                "params": self.model.model_vars.params,
+                "converged": self.model.converged,
+                "fully_converged": fully_converged,
+                "ll_current": ll_current,
+                "ll_last_b_update": ll_last_b_update,
+                "loc_steps": loc_steps,
+                "trust_region_radius_a": self.trust_region_radius_a,
+                "acceleration_params": self._acceleration_params,
+                "acceleration_n": self._acceleration_n,
+                "train_step": train_step,
+                "lls": np.reshape(np.asarray(self.lls), [len(self.lls), self.model.model_vars.n_features])
+            })
+
+        train_step_start = train_step
+        try:
+            while np.any(np.logical_not(fully_converged)) and \
+                    train_step < max_steps:
+                t0 = time.time()
+                n_singular = 0
+                n_reverted = 0
+                n_accelerated = 0
                 ll_new = ll_current.copy()
-                ll_new[idx_update] = ll_proposal
-                ll_new[idx_bad_step] = ll_current[idx_bad_step]
-                # Reset b model update counter.
-                epochs_until_b_update = update_b_freq
-            else:
+                # Features that are ready for a scale model update, all other features that are not converged
+                # receive a location model update:
+                ready = np.logical_and(
+                    np.logical_not(fully_converged),
+                    np.logical_or(self.model.converged, loc_steps >= update_b_freq)
+                )
+                idx_scale = np.where(ready)[0]
+                idx_loc = np.where(np.logical_not(np.logical_or(fully_converged, ready)))[0]
+
                 # IWLS step for location model:
-                # Compute update.
-                idx_update = self.model.idx_not_converged
-                if self._train_loc:
-                    a_step = self.iwls_step(idx_update=idx_update)
-                    # Perform trial update.
-                    self.model.a_var = self.model.a_var + a_step
-                    # Reverse update by feature if update leads to worse loss:
-                    ll_proposal = - self.model.ll_byfeature_j(j=idx_update).compute()
-                    idx_bad_step = idx_update[np.where(ll_proposal > ll_current[idx_update])[0]]
-                    if isinstance(self.model.b_var, dask.array.core.Array):
-                        a_var_new = self.model.a_var.compute()
-                    else:
-                        a_var_new = self.model.a_var.copy()
-                    a_var_new[:, idx_bad_step] = a_var_new[:, idx_bad_step] - a_step[:, idx_bad_step]
-                    self.model.a_var = a_var_new
-                else:
-                    ll_proposal = ll_current[idx_update]
-                    idx_bad_step = np.array([], dtype=np.int32)
-                # Update likelihood vector with updated genes based on already evaluated proposal likelihood.
-                ll_new = ll_current.copy()
-                ll_new[idx_update] = ll_proposal
-                ll_new[idx_bad_step] = ll_current[idx_bad_step]
-                # Update epoch counter of a updates until next b update:
-                epochs_until_b_update -= 1
+                if self._train_loc and len(idx_loc) > 0:
+                    # Compute and perform update, the step of each feature is backtracked until the loss decreases or
+                    # is only kept if it decreases the loss within the trust region of this feature.
+                    with self.telemetry.timer("loc_step"):
+                        self.iwls_step(
+                            idx_update=idx_loc,
+                            ll_current=ll_current,
+                            max_halvings=max_halvings_a,
+                            trust_region=trust_region_a
+                        )
+                    n_singular = self.iwls_solve_result.n_cholesky_failed
+                    n_reverted += int(np.sum(self.iwls_step_fraction == 0.))
+                    # Update likelihood vector with updated genes based on already evaluated line search losses.
+                    ll_new[idx_loc] = self.iwls_ll
 
-            # Evaluate and update convergence:
-            ll_previous = ll_current
-            ll_current = ll_new
-            if epochs_until_b_update == update_b_freq:  # b step update was executed.
-                # Update terminal convergence in fully_converged and intermediate convergence in self.model.converged.
-                converged_f = np.logical_or(
-                    ll_last_b_update < ll_current,  # loss gets worse
-                    np.abs(ll_last_b_update - ll_current) / np.maximum(  # relative decrease in loss is too small
-                        np.nextafter(0, np.inf, dtype=ll_previous.dtype),  # catch division by zero
-                        np.abs(ll_last_b_update)
-                    ) < pkg_constants.LLTOL_BY_FEATURE,
+                    # Update intermediate convergence in self.model.converged.
+                    with self.telemetry.timer("convergence"):
+                        ll_previous = ll_current[idx_loc]
+                        converged_f = np.logical_or(
+                            ll_previous < ll_new[idx_loc],  # loss gets worse
+                            np.abs(ll_previous - ll_new[idx_loc]) / np.maximum(  # relative decrease is too small
+                                np.nextafter(0, np.inf, dtype=ll_previous.dtype),  # catch division by zero
+                                np.abs(ll_previous)
+                            ) < pkg_constants.LLTOL_BY_FEATURE,
+                        )
+                        converged = self.model.converged.copy()
+                        converged[idx_loc] = np.logical_or(converged[idx_loc], converged_f)
+                        self.model.converged = converged
+                        loc_steps[idx_loc] += 1
+
+                # Line search step for scale model:
+                if len(idx_scale) > 0:
+                    # Compute update.
+                    if self._train_scale:
+                        with self.telemetry.timer("scale_step"):
+                            b_step = self.b_step(
+                                idx_update=idx_scale,
+                                method=method_b,
+                                ftol=ftol_b,
+                                lr=lr_b,
+                                max_iter=max_iter_b,
+                                nproc=nproc
+                            )
+                        # Perform trial update.
+                        self.model.b_var_j_setter(
+                            value=self.model.model_vars.b_var[:, idx_scale] + b_step[:, idx_scale],
+                            j=idx_scale
+                        )
+                        # Reverse update by feature if update leads to worse loss:
+                        ll_proposal = - self._ll_byfeature_j(j=idx_scale)
+                        idx_bad_step = idx_scale[np.where(ll_proposal > ll_current[idx_scale])[0]]
+                        if len(idx_bad_step) > 0:
+                            self.model.b_var_j_setter(
+                                value=self.model.model_vars.b_var[:, idx_bad_step] - b_step[:, idx_bad_step],
+                                j=idx_bad_step
+                            )
+                        n_reverted += len(idx_bad_step)
+                        # Update likelihood vector with updated genes based on already evaluated proposal likelihood.
+                        ll_new[idx_scale] = ll_proposal
+                        ll_new[idx_bad_step] = ll_current[idx_bad_step]
+
+                    # Extrapolate parameters of the features that completed a cycle of location and scale model updates:
+                    if acceleration is not None:
+                        with self.telemetry.timer("acceleration"):
+                            ll_new[idx_scale], n_accelerated = self._accelerate(
+                                idx=idx_scale,
+                                ll_current=ll_new[idx_scale]
+                            )
+
+                    # Update terminal convergence in fully_converged and intermediate convergence in
+                    # self.model.converged of the features that received a scale model update.
+                    with self.telemetry.timer("convergence"):
+                        converged_f = np.logical_or(
+                            ll_last_b_update[idx_scale] < ll_new[idx_scale],  # loss gets worse
+                            np.abs(ll_last_b_update[idx_scale] - ll_new[idx_scale]) / np.maximum(  # relative decrease
+                                np.nextafter(0, np.inf, dtype=ll_new.dtype),  # catch division by zero
+                                np.abs(ll_last_b_update[idx_scale])
+                            ) < pkg_constants.LLTOL_BY_FEATURE,
+                        )
+                        fully_converged[idx_scale] = converged_f
+                        converged = self.model.converged.copy()
+                        converged[idx_scale] = converged_f
+                        self.model.converged = converged
+                        ll_last_b_update[idx_scale] = ll_new[idx_scale]
+                        loc_steps[idx_scale] = 0
+                        # Pack data of features that are still trained once enough features converged:
+                        idx_active = np.where(np.logical_not(fully_converged))[0]
+                        # Streaming and lazy evaluation read the data on their own, packing would load the data of
+                        # all active features.
+                        if self._streaming is None and \
+                                len(idx_active) < pkg_constants.ACTIVE_SET_REPACK_FRACTION * self.model.n_active:
+                            self.model.compact(idx=idx_active)
+                ll_current = ll_new
+
+                timings = self.telemetry.pop_timings()
+                timings["total"] = time.time() - t0
+
+                # Conclude and report iteration.
+                train_step += 1
+                self.telemetry.emit(
+                    "iteration",
+                    step=train_step,
+                    ll=np.sum(ll_current),
+                    converged=np.mean(fully_converged),
+                    converged_loc=np.mean(self.model.converged),
+                    scale_update=bool(len(idx_scale) > 0),
+                    n_active=len(idx_loc),
+                    n_scale=len(idx_scale),
+                    n_singular=n_singular,
+                    n_reverted=n_reverted,
+                    n_accelerated=n_accelerated,
+                    timings=timings
                 )
-                self.model.converged = np.logical_or(fully_converged, converged_f)
-                ll_last_b_update = ll_current.copy()
-                fully_converged = self.model.converged.copy()
+                self.lls.append(ll_current)
+                if checkpointer is not None and train_step % checkpoint_every == 0:
+                    save_checkpoint()
+                if self._streaming is not streaming_all and \
+                        (train_step - train_step_start >= incremental_steps or np.all(fully_converged)):
+                    # Continue on all observations. Convergence is re-evaluated on all observations, features that
+                    # barely moved since the previous fit converge after one location and one scale model update.
+                    self._streaming = streaming_all
+                    ll_current = - self._ll_byfeature_j(j=np.arange(0, self.model.model_vars.n_features))
+                    ll_last_b_update = ll_current.copy()
+                    fully_converged = np.tile(False, self.model.model_vars.n_features)
+                    self.model.converged = fully_converged.copy()
+                    loc_steps[:] = 0
+                    self._acceleration_n[:] = 0
+                    self.telemetry.emit(
+                        "incremental_end",
+                        step=train_step,
+                        ll=np.sum(ll_current),
+                        timings=self.telemetry.pop_timings()
+                    )
+            self.fully_converged = fully_converged
+            self._niter = train_step
+            self.telemetry.emit(
+                "train_end",
+                step=train_step,
+                ll=np.sum(ll_current),
+                converged=np.mean(fully_converged),
+                seconds=time.time() - t_start
+            )
+            if checkpointer is not None:
+                save_checkpoint()
+        finally:
+            if isinstance(streaming_all, LazyIwls):
+                # Persisted data are released after training, finalize() evaluates on the model.
+                streaming_all.close()
+                self._streaming = None
             else:
-                # Update intermediate convergence in self.model.converged.
-                converged_f = np.logical_or(
-                    ll_previous < ll_current,  # loss gets worse
-                    np.abs(ll_previous - ll_current) / np.maximum(  # relative decrease in loss is too small
-                        np.nextafter(0, np.inf, dtype=ll_previous.dtype),  # catch division by zero
-                        np.abs(ll_previous)
-                    ) < pkg_constants.LLTOL_BY_FEATURE,
-                )
-                self.model.converged = np.logical_or(self.model.converged, converged_f)
-                if np.all(self.model.converged):
-                    # All location models are converged. This means that the next update will be b model
-                    # update and all remaining intermediate a model updates can be skipped:
-                    epochs_until_b_update = 0
-
-            # Conclude and report iteration.
-            train_step += 1
-            #logging.getLogger("batchglm").info(
-            sys.stdout.write(
-                "iter %s: ll=%f, converged: %.2f%% (loc: %.2f%%, scale update: %s), in %.2fsec\n" %
-                (
-                    (" " if train_step < 10 else "") + (" " if train_step < 100 else "") + str(train_step),
-                    np.sum(ll_current),
-                    np.mean(fully_converged)*100,
-                    np.mean(self.model.converged) * 100,
-                    str(epochs_until_b_update == update_b_freq),
-                    time.time()-t0
-                )
+                self._streaming = streaming_all
+            # Worker processes of scale model updates and packed data are only kept for one training run.
+            self._close_b_pool()
+            self.model.compact(idx=None)
+            if checkpointer is not None:
+                checkpointer.close()
+
+        if polish_steps > 0 and self.model.compute_dtype is not None:
+            # Polish mixed precision estimates with iterations in full precision, the model is kept in full
+            # precision afterwards so that finalize() also evaluates in full precision.
+            self.model.set_compute_dtype(None)
+            niter = self._niter
+            self.train(
+                max_steps=polish_steps,
+                method_b=method_b,
+                update_b_freq=update_b_freq,
+                ftol_b=ftol_b,
+                lr_b=lr_b,
+                max_iter_b=max_iter_b,
+                nproc=nproc,
+                streaming=streaming,
+                chunk_size_cells=chunk_size_cells,
+                polish_steps=0,
+                lazy=lazy,
+                scheduler=scheduler,
+                max_halvings_a=max_halvings_a,
+                trust_region_a=trust_region_a,
+                acceleration=acceleration,
+                **kwargs
             )
-            #sys.stdout.write(
-            #    '\riter %i: ll=%f, %.2f%% converged' %
-            #    (train_step, np.sum(ll_current), np.round(np.mean(delayed_converged)*100, 2))
-            #)
-            #sys.stdout.flush()
-            self.lls.append(ll_current)
-        #sys.stdout.write('\r')
-        #sys.stdout.flush()
+            self._niter += niter
+
+    def sufficient_statistics(
+            self,
+            chunk_size_cells: int = None
+    ) -> SufficientStatistics:
+        """
+        Per-feature sufficient statistics of all observations at the current parameters.
+
+        These can be cached after training, e.g. via SufficientStatistics.save(), and be passed to train() of an
+        estimator of the same features on data with appended observations for an incremental refit.
+
+        :param chunk_size_cells: Number of observations that are read at a time,
+            defaults to the chunk size of the input data.
+        """
+        if chunk_size_cells is None:
+            chunk_size_cells = self.input_data.chunk_size_cells
+        return SufficientStatistics.from_model(model=self.model, chunk_size_cells=chunk_size_cells)
+
+    def _ll_byfeature_j(
+            self,
+            j: np.ndarray
+    ) -> np.ndarray:
+        """
+        Log-likelihood of the features j, streamed over chunks of observations in streaming mode
+        and evaluated as one dask graph in lazy mode.
+
+        :return: (features)
+        """
+        with self.telemetry.timer("ll"):
+            if self._streaming is not None:
+                return self._streaming.ll_byfeature(idx=j)
+            else:
+                return self.model.ll_byfeature_j(j=j).compute()
+
+    def train_sharded(
+            self,
+            n_jobs: int = None,
+            n_shards: int = None,
+            backend: str = "processes",
+            max_steps: int = 100,
+            steps_per_round: int = 20,
+            **kwargs
+    ):
+        """
+        Train GLM with features split into shards that are trained in parallel.
+
+        The GLMs of all features are independent. Each shard of features is trained with its own estimator, warm
+        started from the current parameters, for at most steps_per_round iterations. The parameters, losses and
+        convergence of the shard are then written back into this estimator. Features of a shard that are not converged
+        after a round are queued again: If fewer shards are queued than there are workers, these features are split
+        into multiple shards so that slow features are spread across idle workers.
+
+        :param n_jobs: Number of workers, defaults to the number of CPUs.
+        :param n_shards: Number of shards in the first round, defaults to 4 * n_jobs.
+        :param backend: Worker pool, one of:
+
+            - "processes": concurrent.futures.ProcessPoolExecutor
+            - "threads": concurrent.futures.ThreadPoolExecutor
+        :param max_steps: Maximum number of iterations by feature.
+        :param steps_per_round: Maximum number of iterations of a shard before it is rebalanced.
+        :param kwargs: Arguments to train() that are used for each shard. Scale model updates of a shard always
+            run in a single process (nproc=1) as parallelisation is across shards.
+        """
+        if n_jobs is None:
+            n_jobs = os.cpu_count()
+        if n_shards is None:
+            n_shards = 4 * n_jobs
+        if backend.lower() == "processes":
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs)
+        elif backend.lower() == "threads":
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+        else:
+            raise ValueError("backend %s not recognized" % backend)
+        kwargs["nproc"] = 1
+
+        def _compute(x):
+            return x.compute() if isinstance(x, dask.array.core.Array) else x
+
+        input_data = self.input_data
+        input_data_kwargs = {
+            "design_loc": _compute(input_data.design_loc),
+            "design_loc_names": input_data.design_loc_names,
+            "design_scale": _compute(input_data.design_scale),
+            "design_scale_names": input_data.design_scale_names,
+            "constraints_loc": _compute(input_data.constraints_loc),
+            "constraints_scale": _compute(input_data.constraints_scale),
+            "size_factors": _compute(input_data.size_factors),
+            "chunk_size_cells": input_data.chunk_size_cells,
+            "chunk_size_genes": input_data.chunk_size_genes
+        }
+        a_var = _compute(self.model.model_vars.a_var).copy()
+        b_var = _compute(self.model.model_vars.b_var).copy()
+        n_features = self.model.model_vars.n_features
+        fully_converged = np.tile(False, n_features)
+        steps_done = np.zeros([n_features], dtype=int)
+        ll_current = - self.model.ll_byfeature.compute()
+        self.telemetry.emit("train_start", step=0, ll=np.sum(ll_current), n_features=n_features, n_jobs=n_jobs)
+
+        queue = collections.deque(split_features(idx=np.arange(0, n_features), n_shards=n_shards))
+        futures = {}
+        t0 = time.time()
+        with executor:
+            while len(queue) > 0 or len(futures) > 0:
+                while len(queue) > 0 and len(futures) < n_jobs:
+                    idx = queue.popleft()
+                    input_data_kwargs["data"] = shard_data(x=self.x, idx=idx)
+                    train_kwargs = dict(kwargs)
+                    train_kwargs["max_steps"] = int(min(steps_per_round, max_steps - np.max(steps_done[idx])))
+                    future = executor.submit(
+                        train_shard,
+                        estimator_class=type(self),
+                        input_data_class=type(input_data),
+                        input_data_kwargs=dict(input_data_kwargs),
+                        estimator_kwargs={
+                            "init_a": a_var[:, idx],
+                            "init_b": b_var[:, idx],
+                            "quick_scale": not self._train_scale,
+                            "dtype": self.dtype,
+                            "compute_dtype": self.model.compute_dtype
+                        },
+                        train_loc=self._train_loc,
+                        train_scale=self._train_scale,
+                        train_kwargs=train_kwargs
+                    )
+                    futures[future] = idx
+                done, _ = concurrent.futures.wait(list(futures.keys()), return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    idx = futures.pop(future)
+                    a_var_shard, b_var_shard, converged_shard, ll_shard, steps_shard = future.result()
+                    a_var[:, idx] = a_var_shard
+                    b_var[:, idx] = b_var_shard
+                    fully_converged[idx] = converged_shard
+                    ll_current[idx] = ll_shard
+                    steps_done[idx] += steps_shard
+                    self.lls.append(ll_current.copy())
+                    # Re-queue features that are not converged and split them if workers would be idle otherwise:
+                    idx_remaining = idx[np.logical_and(
+                        np.logical_not(converged_shard),
+                        steps_done[idx] < max_steps
+                    )]
+                    if len(idx_remaining) > 0:
+                        queue.extend(split_features(
+                            idx=idx_remaining,
+                            n_shards=n_jobs - len(queue) - len(futures)
+                        ))
+                    self.telemetry.emit(
+                        "shard",
+                        n_features=len(idx),
+                        n_steps=steps_shard,
+                        ll=np.sum(ll_current),
+                        converged=np.mean(fully_converged),
+                        n_queued=len(queue),
+                        seconds=time.time() - t0
+                    )
+
+        self.model.a_var = a_var
+        self.model.b_var = b_var
+        self.model.converged = fully_converged.copy()
+        self.fully_converged = fully_converged
+        self._niter = int(np.max(steps_done))
+        self.telemetry.emit(
+            "train_end",
+            step=self._niter,
+            ll=np.sum(ll_current),
+            converged=np.mean(fully_converged),
+            seconds=time.time() - t0
+        )
 
     def a_step_gd(
             self,
@@ -224,24 +661,28 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
         :return:
         """
         iter = 0
-        a_var_old = self.model.a_var.compute()
+        a_var_old = self.model.model_vars.a_var.copy()
         converged = np.tile(True, self.model.model_vars.n_features)
         converged[idx] = False
         ll_current = - self.model.ll_byfeature.compute()
         while np.any(np.logical_not(converged)) and iter < max_iter:
             idx_to_update = np.where(np.logical_not(converged))[0]
-            jac = np.zeros_like(self.model.a_var).compute()
+            jac = np.zeros(self.model.model_vars.a_var.shape, dtype=self.model.model_vars.a_var.dtype)
             # Use mean jacobian so that learning rate is independent of number of samples.
             jac[:, idx_to_update] = - self.model.jac_a.compute().T[:, idx_to_update] / \
                                     self.model.input_data.num_observations
-            self.model._a_var = self.model.a_var.compute() + lr * jac
+            self.model.a_var_j_setter(
+                value=self.model.model_vars.a_var[:, idx_to_update] + lr * jac[:, idx_to_update],
+                j=idx_to_update
+            )
             # Assess convergence:
             ll_previous = ll_current
             ll_current = - self.model.ll_byfeature.compute()
             converged_f = (ll_current - ll_previous) / ll_previous > -ftol
-            a_var_new = self.model.a_var.compute()
-            a_var_new[:, converged_f] = a_var_new[:, converged_f] - lr * jac[:, converged_f]
-            self.model.a_var = a_var_new
+            self.model.a_var_j_setter(
+                value=self.model.model_vars.a_var[:, converged_f] - lr * jac[:, converged_f],
+                j=converged_f
+            )
             converged = np.logical_or(converged, converged_f)
             iter += 1
             logging.getLogger("batchglm").info(
@@ -252,74 +693,261 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
                     np.mean(converged) * 100
                 )
             )
-        return self.model.a_var.compute() - a_var_old
+        return self.model.model_vars.a_var - a_var_old
 
     def iwls_step(
             self,
-            idx_update: np.ndarray
+            idx_update: np.ndarray,
+            ll_current: np.ndarray = None,
+            max_halvings: int = 5,
+            trust_region: bool = False
     ) -> np.ndarray:
         """
+        IRLS step of the location model of the features in idx_update.
 
-        :return: (inferred param x features)
+        The systems are solved via Cholesky decomposition, singular systems are solved with least-squares.
+        The result of the solve, including the features with singular systems, is kept in self.iwls_solve_result.
+
+        If ll_current is given, the step is backtracked by feature and written into the parameters: The loss is
+        evaluated at the full step for all features and only re-evaluated at halved steps for the features for which
+        the Armijo condition (sufficient decrease of the loss by pkg_constants.IRLS_ARMIJO_C times the decrease
+        predicted by the score) does not hold. Features without such a step after max_halvings halvings keep their
+        parameters. The accepted step fractions, 0 for kept parameters, and the losses at the new parameters are
+        kept in self.iwls_step_fraction and self.iwls_ll (features in idx_update).
+        If trust_region is set, the step is controlled by the trust region radii of the features instead,
+        see _iwls_trust_region().
+
+        :param ll_current: Loss by feature at the current parameters (all features).
+        :param max_halvings: Maximum number of step-halvings if ll_current is given.
+        :param trust_region: Whether to use trust region instead of line search control if ll_current is given.
+        :return: (inferred param x features), the accepted steps if ll_current is given.
         """
-        w = self.model.fim_weight_aa_j(j=idx_update)  # (observations x features)
-        ybar = self.model.ybar_j(j=idx_update)  # (observations x features)
         # Translate to problem of form ax = b for each feature:
         # (in the following, X=design and Y=counts)
         # a=X^T*W*X: ([features] x inferred param)
         # x=theta: ([features] x inferred param)
         # b=X^T*W*Ybar: ([features] x inferred param)
-        xh = np.matmul(self.model.design_loc, self.model.constraints_loc)
-        xhw = np.einsum('ob,of->fob', xh, w)
-        a = np.einsum('fob,oc->fbc', xhw, xh)
-        b = np.einsum('fob,of->fb', xhw, ybar)
-
-        delta_theta = np.zeros_like(self.model.a_var)
-        if isinstance(delta_theta, dask.array.core.Array):
-            delta_theta = delta_theta.compute()
-
-        if isinstance(a, dask.array.core.Array):
-            # Have to use a workaround to solve problems in parallel in dask here. This workaround does
-            # not work if there is only a single problem, ie. if the first dimension of a and b has length 1.
-            if a.shape[0] != 1:
-                get_cond_number = lambda x: np.expand_dims(np.expand_dims(np.linalg.cond(x, p=None), axis=-1), axis=-1)
-                invertible = np.where(dask.array.map_blocks(
-                    get_cond_number, a, chunks=a.shape
-                ).squeeze().compute() < 1 / sys.float_info.epsilon)[0]
-                if len(idx_update[invertible]) > 1:
-                    delta_theta[:, idx_update[invertible]] = dask.array.map_blocks(
-                        np.linalg.solve, a[invertible], b[invertible, :, None],
-                        chunks=b[invertible, :, None].shape
-                    ).squeeze().T.compute()
-                elif len(idx_update[invertible]) == 1:
-                    delta_theta[:, idx_update[invertible]] = np.expand_dims(
-                        np.linalg.solve(a[invertible[0]], b[invertible[0]]).compute(),
-                        axis=-1
-                    )
-            else:
-                if np.linalg.cond(a.compute(), p=None) < 1 / sys.float_info.epsilon:
-                    delta_theta[:, idx_update] = np.expand_dims(
-                        np.linalg.solve(a[0], b[0]).compute(),
-                        axis=-1
-                    )
-                    invertible = np.array([0])
-                else:
-                    invertible = np.array([])
+        if self._streaming is not None:
+            a, b = self._streaming.iwls_system(idx=idx_update)
+        else:
+            w = self.model.fim_weight_aa_j(j=idx_update)  # (observations x features)
+            ybar = self.model.ybar_j(j=idx_update)  # (observations x features)
+            a = self.model.assembly_loc.xtwx(w)
+            b = self.model.assembly_loc.xtw(w * ybar)
+
+        if isinstance(a, dask.array.core.Array) or isinstance(b, dask.array.core.Array):
+            a, b = dask.compute(a, b)
+
+        # Computed dask zeros can be read-only views if all parameters are in one chunk.
+        delta_theta = np.zeros(self.model.model_vars.a_var.shape, dtype=self.model.model_vars.a_var.dtype)
+
+        # a is negative definite as the weights are the negative Fisher weights, solve -a x = -b instead:
+        with self.telemetry.timer("solve"):
+            self.iwls_solve_result = cholesky_solve(a=-a, b=-b)
+        delta_theta[:, idx_update] = self.iwls_solve_result.x.T
+        # The system of an incremental refit is an approximation and cannot be reused for the FIM.
+        if not isinstance(self._streaming, IncrementalIwls):
+            self._iwls_factor = {
+                "idx": np.asarray(idx_update),
+                "params": self.model.model_vars.params[:, idx_update].copy(),
+                "compute_dtype": self.model.compute_dtype,
+                "l": self.iwls_solve_result.l,
+                "cholesky_failed": self.iwls_solve_result.cholesky_failed
+            }
         else:
-            invertible = np.where(np.linalg.cond(a, p=None) < 1 / sys.float_info.epsilon)[0]
-            delta_theta[:, idx_update[invertible]] = np.linalg.solve(a[invertible], b[invertible]).T
-        if invertible.shape[0] < len(idx_update):
-            sys.stdout.write("caught %i linalg singular matrix errors\n" % (len(idx_update) - invertible.shape[0]))
-        # Via np.linalg.lsts:
-        #delta_theta[:, idx_update] = np.concatenate([
-        #    np.expand_dims(np.linalg.lstsq(a[i, :, :], b[i, :])[0], axis=-1)
-        #    for i in idx_update)
-        #], axis=-1)
-        # Via np.linalg.inv:
-        # #delta_theta[:, idx_update] = np.concatenate([
-        #    np.expand_dims(np.matmul(np.linalg.inv(a[i, :, :]), b[i, :]), axis=-1)
-        #    for i in idx_update)
-        #], axis=-1)
+            self._iwls_factor = None
+        if self.iwls_solve_result.n_cholesky_failed > 0:
+            logger.debug(
+                "iwls step: used least-squares for %i singular systems" % self.iwls_solve_result.n_cholesky_failed
+            )
+        if ll_current is None:
+            return delta_theta
+        if trust_region:
+            return self._iwls_trust_region(
+                idx_update=idx_update,
+                delta_theta=delta_theta,
+                a=a,
+                b=b,
+                ll_current=ll_current
+            )
+
+        # b is the gradient of the loss, the directional derivative of the loss along the step is negative for descent
+        # directions and is set to zero otherwise so that the line search accepts any step that does not increase
+        # the loss:
+        slope = np.minimum(np.sum(b * self.iwls_solve_result.x, axis=1), 0.)
+        slope[np.logical_not(np.isfinite(slope))] = 0.
+        a_var = self.model.model_vars.a_var[:, idx_update].copy()
+        fraction = np.ones([len(idx_update)], dtype=a_var.dtype)
+        ll_new = ll_current[idx_update].copy()
+        idx_search = np.arange(0, len(idx_update))
+        for i in range(max_halvings + 1):
+            j = idx_update[idx_search]
+            self.model.a_var_j_setter(
+                value=a_var[:, idx_search] + fraction[idx_search] * delta_theta[:, j],
+                j=j
+            )
+            ll_proposal = - self._ll_byfeature_j(j=j)
+            accept = ll_proposal <= ll_current[j] + pkg_constants.IRLS_ARMIJO_C * fraction[idx_search] * \
+                slope[idx_search]
+            ll_new[idx_search[accept]] = ll_proposal[accept]
+            idx_search = idx_search[np.logical_not(accept)]
+            if len(idx_search) == 0:
+                break
+            fraction[idx_search] = fraction[idx_search] / 2.
+        # Features without sufficient decrease keep their parameters:
+        if len(idx_search) > 0:
+            self.model.a_var_j_setter(value=a_var[:, idx_search], j=idx_update[idx_search])
+            fraction[idx_search] = 0.
+        if np.any(np.logical_and(fraction > 0., fraction < 1.)):
+            logger.debug(
+                "iwls step: backtracked %i steps" % int(np.sum(np.logical_and(fraction > 0., fraction < 1.)))
+            )
+        delta_theta[:, idx_update] = delta_theta[:, idx_update] * fraction
+        self.iwls_step_fraction = fraction
+        self.iwls_ll = ll_new
+        return delta_theta
+
+    def _accelerate(
+            self,
+            idx: np.ndarray,
+            ll_current: np.ndarray
+    ) -> Tuple[np.ndarray, int]:
+        """
+        SQUAREM extrapolation of the parameters of the features idx at the end of a cycle of location and scale model
+        updates.
+
+        The parameters at the ends of the previous two cycles of each feature are kept in self._acceleration_params.
+        Given the parameters theta0, theta1 and theta2 at the ends of three successive cycles of a feature, the
+        extrapolation is theta0 - 2 * alpha * r + alpha^2 * v with r = theta1 - theta0, v = theta2 - 2 * theta1 + theta0
+        and alpha = - |r| / |v| (step length scheme S3 of Varadhan and Roland, 2008), where alpha is clipped to
+        [-pkg_constants.SQUAREM_MAX_STEP_LENGTH, -1]. alpha = -1 yields theta2. An extrapolation is only kept if it
+        decreases the loss compared to theta2, the next cycle then starts from the extrapolated parameters.
+
+        :param idx: Features that completed a cycle.
+        :param ll_current: Loss of the features idx at the end of the cycle.
+        :return: Tuple of the loss of the features idx after extrapolation and the number of kept extrapolations.
+        """
+        npar_a = self.model.model_vars.npar_a
+        history = self._acceleration_params
+        n = self._acceleration_n[idx]
+        theta = self.model.model_vars.params[:, idx].copy()
+        ll_new = ll_current.copy()
+
+        # Record cycle ends of features without enough history:
+        for i in [0, 1]:
+            j = idx[n == i]
+            history[i][:, j] = theta[:, n == i]
+            self._acceleration_n[j] = i + 1
+
+        pos = np.where(n >= 2)[0]
+        if len(pos) == 0:
+            return ll_new, 0
+        j = idx[pos]
+        theta0 = history[0][:, j]
+        theta1 = history[1][:, j]
+        theta2 = theta[:, pos]
+        r = theta1 - theta0
+        v = theta2 - 2. * theta1 + theta0
+        alpha = - np.sqrt(np.sum(np.square(r), axis=0)) / np.maximum(
+            np.sqrt(np.sum(np.square(v), axis=0)),
+            np.nextafter(0, np.inf, dtype=v.dtype)
+        )
+        alpha = np.clip(alpha, -pkg_constants.SQUAREM_MAX_STEP_LENGTH, -1.)
+        theta_extrapolated = theta0 - 2. * alpha * r + np.square(alpha) * v
+
+        # Features with alpha = -1 are not extrapolated, the loss is only evaluated for the other features:
+        accept = alpha < -1.
+        if np.any(accept):
+            j_trial = j[accept]
+            self.model.a_var_j_setter(value=theta_extrapolated[:npar_a, accept], j=j_trial)
+            self.model.b_var_j_setter(value=theta_extrapolated[npar_a:, accept], j=j_trial)
+            ll_extrapolated = - self._ll_byfeature_j(j=j_trial)
+            # Safeguard: Features of which the extrapolation does not decrease the loss keep the plain update.
+            improved = ll_extrapolated < ll_current[pos[accept]]
+            if np.any(np.logical_not(improved)):
+                self.model.a_var_j_setter(
+                    value=theta2[:npar_a][:, accept][:, np.logical_not(improved)],
+                    j=j_trial[np.logical_not(improved)]
+                )
+                self.model.b_var_j_setter(
+                    value=theta2[npar_a:][:, accept][:, np.logical_not(improved)],
+                    j=j_trial[np.logical_not(improved)]
+                )
+            ll_new[pos[accept][improved]] = ll_extrapolated[improved]
+            accept[accept] = improved
+        reject = np.logical_not(accept)
+        # Accepted extrapolations start a new history, rejected ones continue with the last two cycle ends:
+        history[0][:, j[accept]] = self.model.model_vars.params[:, j[accept]]
+        self._acceleration_n[j[accept]] = 1
+        history[0][:, j[reject]] = theta1[:, reject]
+        history[1][:, j[reject]] = theta2[:, reject]
+        return ll_new, int(np.sum(accept))
+
+    def _iwls_trust_region(
+            self,
+            idx_update: np.ndarray,
+            delta_theta: np.ndarray,
+            a: np.ndarray,
+            b: np.ndarray,
+            ll_current: np.ndarray
+    ) -> np.ndarray:
+        """
+        Trust region control of the IRLS step of the location model of the features in idx_update.
+
+        This follows the trust region updates of the tf1 backend (nr_tr): The Newton step of each feature is clipped
+        to the radius of this feature in self.trust_region_radius_a and written into the parameters. The step is kept
+        if the loss decreases by more than pkg_constants.TRUST_REGION_ETA0. The radius shrinks by TRUST_REGION_T1 if
+        the step is rejected or if the ratio of actual to predicted decrease of the loss is at most TRUST_REGION_ETA1,
+        and grows by TRUST_REGION_T2 if this ratio is above TRUST_REGION_ETA2.
+        The predicted decrease is the decrease of the quadratic model of the loss with gradient b and hessian -a.
+
+        :param delta_theta: Newton steps (inferred param x features), all features.
+        :param a: X^T*W*X of the features in idx_update (features x inferred param x inferred param)
+        :param b: X^T*W*Ybar of the features in idx_update (features x inferred param)
+        :param ll_current: Loss by feature at the current parameters (all features).
+        :return: (inferred param x features), the accepted steps.
+        """
+        assert pkg_constants.TRUST_REGION_ETA0 < pkg_constants.TRUST_REGION_ETA1, \
+            "eta0 must be smaller than eta1"
+        assert pkg_constants.TRUST_REGION_ETA1 <= pkg_constants.TRUST_REGION_ETA2, \
+            "eta1 must be smaller than or equal to eta2"
+        assert pkg_constants.TRUST_REGION_T1 <= 1, "t1 must be smaller than 1"
+        assert pkg_constants.TRUST_REGION_T2 >= 1, "t2 must be larger than 1"
+
+        radius = self.trust_region_radius_a[idx_update]
+        step = delta_theta[:, idx_update]
+        tiny = np.nextafter(0, np.inf, dtype=step.dtype)
+        # Clip steps to the trust region:
+        step_norm = np.sqrt(np.sum(np.square(step), axis=0))
+        fraction = np.where(step_norm > radius, radius / np.maximum(step_norm, tiny), 1.)
+        step = step * fraction
+        # Decrease of the loss predicted by its quadratic model:
+        gain_predicted = - np.sum(b.T * step, axis=0) + 0.5 * np.einsum("if,fij,jf->f", step, a, step)
+
+        a_var = self.model.model_vars.a_var[:, idx_update].copy()
+        self.model.a_var_j_setter(value=a_var + step, j=idx_update)
+        ll_proposal = - self._ll_byfeature_j(j=idx_update)
+        gain = ll_current[idx_update] - ll_proposal
+        ratio = gain / np.maximum(gain_predicted, tiny)
+
+        # Features of which the step does not decrease the loss keep their parameters:
+        accept = gain > pkg_constants.TRUST_REGION_ETA0
+        if np.any(np.logical_not(accept)):
+            self.model.a_var_j_setter(
+                value=a_var[:, np.logical_not(accept)],
+                j=idx_update[np.logical_not(accept)]
+            )
+        # Update trust regions:
+        decrease_radius = np.logical_or(np.logical_not(accept), ratio <= pkg_constants.TRUST_REGION_ETA1)
+        increase_radius = np.logical_and(accept, ratio > pkg_constants.TRUST_REGION_ETA2)
+        radius = np.where(decrease_radius, radius * pkg_constants.TRUST_REGION_T1, radius)
+        radius = np.where(increase_radius, radius * pkg_constants.TRUST_REGION_T2, radius)
+        self.trust_region_radius_a[idx_update] = np.minimum(radius, pkg_constants.TRUST_REGION_UPPER_BOUND)
+
+        fraction = np.where(accept, fraction, 0.)
+        delta_theta[:, idx_update] = delta_theta[:, idx_update] * fraction
+        self.iwls_step_fraction = fraction
+        self.iwls_ll = np.where(accept, ll_proposal, ll_current[idx_update])
         return delta_theta
 
     def b_step(
@@ -342,6 +970,18 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
                 lr=lr,
                 max_iter=max_iter
             )
+        elif method.lower() in ["nr"]:
+            return self._b_step_nr(
+                idx_update=idx_update,
+                ftol=ftol,
+                max_iter=max_iter
+            )
+        elif method.lower() in ["brent_vectorized"]:
+            return self._b_step_brent_vectorized(
+                idx_update=idx_update,
+                ftol=ftol,
+                max_iter=max_iter
+            )
         else:
             return self._b_step_loop(
                 idx_update=idx_update,
@@ -363,27 +1003,28 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
         :return:
         """
         iter = 0
-        b_var_old = self.model.b_var.compute()
+        b_var_old = self.model.model_vars.b_var.copy()
         converged = np.tile(True, self.model.model_vars.n_features)
         converged[idx_update] = False
         ll_current = - self.model.ll_byfeature.compute()
         while np.any(np.logical_not(converged)) and iter < max_iter:
             idx_to_update = np.where(np.logical_not(converged))[0]
-            jac = np.zeros_like(self.model.b_var).compute()
+            jac = np.zeros(self.model.model_vars.b_var.shape, dtype=self.model.model_vars.b_var.dtype)
             # Use mean jacobian so that learning rate is independent of number of samples.
             jac[:, idx_to_update] = self.model.jac_b_j(j=idx_to_update).compute().T / \
                                     self.model.input_data.num_observations
             self.model.b_var_j_setter(
-                value=(self.model.b_var.compute() + lr * jac)[:, idx_to_update],
+                value=self.model.model_vars.b_var[:, idx_to_update] + lr * jac[:, idx_to_update],
                 j=idx_to_update
             )
             # Assess convergence:
             ll_previous = ll_current
             ll_current = - self.model.ll_byfeature.compute()
             converged_f = (ll_current - ll_previous) / ll_previous > -ftol
-            b_var_new = self.model.b_var.compute()
-            b_var_new[:, converged_f] = b_var_new[:, converged_f] - lr * jac[:, converged_f]
-            self.model.b_var = b_var_new
+            self.model.b_var_j_setter(
+                value=self.model.model_vars.b_var[:, converged_f] - lr * jac[:, converged_f],
+                j=converged_f
+            )
             converged = np.logical_or(converged, converged_f)
             iter += 1
             logging.getLogger("batchglm").info(
@@ -394,53 +1035,7 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
                     np.mean(converged) * 100
                 )
             )
-        return self.model.b_var.compute() - b_var_old
-
-    def optim_handle(
-            self,
-            b_j,
-            data_j,
-            eta_loc_j,
-            xh_scale,
-            max_iter,
-            ftol
-    ):
-        # Need to supply dense numpy array to scipy optimize:
-        if isinstance(data_j, sparse.COO) or isinstance(data_j, scipy.sparse.csr_matrix):
-            data_j = data_j.todense()
-        if len(data_j.shape) == 1:
-            data_j = np.expand_dims(data_j, axis=-1)
-
-        ll = self.model.ll_handle()
-        lb, ub = self.model.param_bounds(dtype=data_j.dtype)
-        lb_bracket = np.max([lb["b_var"], b_j - 20])
-        ub_bracket = np.min([ub["b_var"], b_j + 20])
-
-        def cost_b_var(x, data_jj, eta_loc_jj, xh_scale_jj):
-            x = np.clip(np.array([[x]]), lb["b_var"], ub["b_var"])
-            return - np.sum(ll(data_jj, eta_loc_jj, x, xh_scale_jj))
-
-        # jac_b = self.model.jac_b_handle()
-        # def cost_b_var_prime(x, data_jj, eta_loc_jj, xh_scale_jj):
-        #    x = np.clip(np.array([[x]]), lb["b_var"], ub["b_var"])
-        #    return - np.sum(jac_b(data_jj, eta_loc_jj, x, xh_scale_jj))
-        # return scipy.optimize.line_search(
-        #    f=cost_b_var,
-        #    myfprime=cost_b_var_prime,
-        #    args=(data_j, eta_loc_j, xh_scale),
-        #    maxiter=max_iter,
-        #    xk=b_j+5,
-        #    pk=-np.ones_like(b_j)
-        # )
-
-        return scipy.optimize.brent(
-            func=cost_b_var,
-            args=(data_j, eta_loc_j, xh_scale),
-            maxiter=max_iter,
-            tol=ftol,
-            brack=(lb_bracket, ub_bracket),
-            full_output=True
-        )
+        return self.model.model_vars.b_var - b_var_old
 
     def _b_step_loop(
             self,
@@ -454,53 +1049,33 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
 
         :return:
         """
-        delta_theta = np.zeros_like(self.model.b_var)
-        if isinstance(delta_theta, dask.array.core.Array):
-            delta_theta = delta_theta.compute()
-
-        xh_scale = np.matmul(self.model.design_scale, self.model.constraints_scale).compute()
-        b_var = self.model.b_var.compute()
-        if nproc > 1 and len(idx_update) > nproc:
-            sys.stdout.write('\rFitting %i dispersion models: (progress not available with multiprocessing)' % len(idx_update))
-            sys.stdout.flush()
-            with multiprocessing.Pool(processes=nproc) as pool:
-                x = self.x.compute()
-                eta_loc = self.model.eta_loc.compute()
-                results = pool.starmap(
-                    self.optim_handle,
-                    [(
-                        b_var[0, j],
-                        x[:, [j]],
-                        eta_loc[:, [j]],
-                        xh_scale,
-                        max_iter,
-                        ftol
-                    ) for j in idx_update]
-                )
-                pool.close()
-            delta_theta[0, idx_update] = np.array([x[0] for x in results])
-            sys.stdout.write('\r')
-            sys.stdout.flush()
+        # Computed dask zeros can be read-only views if all parameters are in one chunk.
+        delta_theta = np.zeros(self.model.model_vars.b_var.shape, dtype=self.model.model_vars.b_var.dtype)
+
+        xh_scale = self.model.xh_scale.compute()
+        b_var = self.model.model_vars.b_var
+        if nproc > 1 and len(idx_update) > nproc and self._b_pool_supported():
+            delta_theta[0, idx_update] = self._get_b_pool(nproc=nproc).fit(
+                idx_update=idx_update,
+                eta_loc_j=np.asarray(self.model.eta_loc_j(j=idx_update).compute()),
+                b_var=b_var,
+                max_iter=max_iter,
+                ftol=ftol,
+                progress=self._scale_progress
+            )
         else:
             t0 = time.time()
             for i, j in enumerate(idx_update):
-                sys.stdout.write(
-                    '\rFitting dispersion models: %.2f%% in %.2fsec' %
-                    (
-                        np.round(i / len(idx_update) * 100., 2),
-                        time.time() - t0
-                    )
-                )
-                sys.stdout.flush()
+                self._scale_progress(n_done=i, n_total=len(idx_update), seconds=time.time() - t0)
                 if method.lower() == "brent":
                     eta_loc = self.model.eta_loc_j(j=j).compute()
-                    data = self.x[:, [j]].compute()
+                    data = self.model.x_j(j=[j]).compute()
                     # Need to supply dense numpy array to scipy optimize:
                     if isinstance(data, sparse.COO) or isinstance(data, scipy.sparse.csr_matrix):
                         data = data.todense()
 
                     ll = self.model.ll_handle()
-                    lb, ub = self.model.param_bounds(dtype=data.dtype)
+                    lb, ub = self.model.param_bounds_cached(dtype=self.model.model_vars.b_var.dtype)
                     lb_bracket = np.max([lb["b_var"], b_var[0, j] - 20])
                     ub_bracket = np.min([ub["b_var"], b_var[0, j] + 20])
 
@@ -523,32 +1098,571 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
                     )
                 else:
                     raise ValueError("method %s not recognized" % method)
-            sys.stdout.write('\r')
-            sys.stdout.flush()
+            self._scale_progress(n_done=len(idx_update), n_total=len(idx_update), seconds=time.time() - t0)
+
+        delta_theta[:, idx_update] = delta_theta[:, idx_update] - self.model.model_vars.b_var[:, idx_update]
+        return delta_theta
 
-        if isinstance(self.model.b_var, dask.array.core.Array):
-            delta_theta[:, idx_update] = delta_theta[:, idx_update] - self.model.b_var.compute()[:, idx_update]
+    def _scale_progress(
+            self,
+            n_done: int,
+            n_total: int,
+            seconds: float
+    ):
+        """
+        Report progress of the scale model fits of one scale model update.
+
+        Events are only emitted if n_done changed and at most once per pkg_constants.TELEMETRY_PROGRESS_INTERVAL
+        seconds, the call with n_done == n_total is always emitted.
+        """
+        t_now = time.time()
+        state = self._scale_progress_state
+        if state is None or state[0] != n_total or n_done < state[1]:
+            # New scale model update.
+            state = (n_total, 0, t_now)
+            self._scale_progress_state = state
+        if n_done == state[1] and n_done > 0:
+            return
+        if n_done == n_total or (n_done > state[1] and t_now - state[2] >= pkg_constants.TELEMETRY_PROGRESS_INTERVAL):
+            self.telemetry.emit("scale_progress", n_done=n_done, n_total=n_total, seconds=seconds)
+            self._scale_progress_state = (n_total, n_done, t_now)
+
+    def _b_pool_supported(self) -> bool:
+        """
+        Whether count data can be copied to the process pool of scale model updates, see _get_b_pool().
+
+        Count data that are read chunk by chunk from their storage, on disk or in a compact data type, would be loaded
+        into memory as a whole, the scale model is then updated in this process.
+        """
+        if getattr(self.input_data, "x_lazy", False) or is_disk_backed(self.x):
+            if self._b_pool_warned is False:
+                logger.warning(
+                    "count data are read from their storage chunk by chunk, scale model updates are not run in a "
+                    "process pool as this would load all count data into memory"
+                )
+                self._b_pool_warned = True
+            return False
+        return True
+
+    def _get_b_pool(
+            self,
+            nproc: int
+    ) -> ScaleModelPool:
+        """
+        Process pool for scale model line searches, started at the first scale model update of a training run.
+
+        The pool is kept for the remaining scale model updates of the training run and closed at the end of train().
+        """
+        if self._b_pool is not None and self._b_pool.nproc != nproc:
+            self._close_b_pool()
+        if self._b_pool is None:
+            x = self.x.compute() if isinstance(self.x, dask.array.core.Array) else self.x
+            lb, ub = self.model.param_bounds_cached(dtype=np.float64)
+            self._b_pool = ScaleModelPool(
+                x=x,
+                xh_scale=self.model.xh_scale.compute(),
+                ll_fun=self.model.ll_b_fun(),
+                ll_bounds=(lb["ll"], ub["ll"]),
+                b_bounds=(lb["b_var"], ub["b_var"]),
+                nproc=nproc
+            )
+        return self._b_pool
+
+    def _close_b_pool(self):
+        if self._b_pool is not None:
+            self._b_pool.close()
+            self._b_pool = None
+
+    def _b_step_data(
+            self,
+            idx_update: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Fetch the dense data block and the parts of the model that are constant during a scale model update.
+
+        :return: Tuple of
+
+            - data: (observations x features in idx_update)
+            - eta_loc: (observations x features in idx_update)
+            - xh_scale: (observations x inferred scale param)
+            - b_var: (inferred scale param x features), all features
+        """
+        xh_scale = self.model.xh_scale
+        if isinstance(xh_scale, dask.array.core.Array):
+            xh_scale = xh_scale.compute()
+        b_var = self.model.model_vars.b_var
+        eta_loc = self.model.eta_loc_j(j=idx_update)
+        if isinstance(eta_loc, dask.array.core.Array):
+            eta_loc = eta_loc.compute()
+        data = self.model.x_j(j=idx_update)
+        if isinstance(data, dask.array.core.Array):
+            data = data.compute()
+        # Need dense numpy array for vectorized evaluation of the likelihood:
+        if isinstance(data, sparse.COO) or isinstance(data, scipy.sparse.csr_matrix):
+            data = data.todense()
+        return np.asarray(data), eta_loc, xh_scale, b_var
+
+    def _b_step_nr(
+            self,
+            idx_update: np.ndarray,
+            max_iter: int,
+            ftol: float,
+            max_halvings: int = 10
+    ) -> np.ndarray:
+        """
+        Damped Newton-Raphson updates of the scale model of all features in idx_update at the same time.
+
+        Score and hessian of all active features are evaluated in one vectorized pass based on the analytic
+        weights of the model. A Newton step that leads to a worse likelihood is halved for this feature until
+        the likelihood improves, a feature for which no improving step is found after max_halvings halvings is
+        considered converged. Features are also considered converged if the relative decrease in loss is
+        smaller than ftol or if the step is smaller than pkg_constants.XTOL_BY_FEATURE_SCALE.
+
+        :return: (inferred param x features)
+        """
+        # Computed dask zeros can be read-only views if all parameters are in one chunk.
+        delta_theta = np.zeros(self.model.model_vars.b_var.shape, dtype=self.model.model_vars.b_var.dtype)
+        if len(idx_update) == 0:
+            return delta_theta
+
+        b_var = self.model.model_vars.b_var
+        lb, ub = self.model.param_bounds_cached(dtype=b_var.dtype)
+        if self._streaming is not None:
+            def cost_b_var(b, idx):
+                return - self._streaming.ll_byfeature(idx=idx_update[idx], b_var=b)
+
+            def score_b_var(b, idx):
+                jac, hessian = self._streaming.scale_score(idx=idx_update[idx], b_var=b)
+                return jac.T, hessian.T
         else:
-            delta_theta[:, idx_update] = delta_theta[:, idx_update] - self.model.b_var.copy()[:, idx_update]
+            data, eta_loc, xh_scale, _ = self._b_step_data(idx_update=idx_update)
+            ll = self.model.ll_handle()
+            jac_b = self.model.jac_b_handle()
+            hessian_bb = self.model.hessian_bb_handle()
+
+            def cost_b_var(b, idx):
+                return - np.sum(ll(data[:, idx], eta_loc[:, idx], b, xh_scale), axis=0)
+
+            def score_b_var(b, idx):
+                jac = np.matmul(xh_scale.T, jac_b(data[:, idx], eta_loc[:, idx], b, xh_scale))
+                hessian = np.matmul(np.square(xh_scale).T, hessian_bb(data[:, idx], eta_loc[:, idx], b, xh_scale))
+                return jac, hessian
+
+        b = b_var[:, idx_update].copy()
+        ll_current = cost_b_var(b, np.arange(0, len(idx_update)))
+
+        iter = 0
+        active = np.arange(0, len(idx_update))
+        while len(active) > 0 and iter < max_iter:
+            # Score and hessian of the log-likelihood: (features x inferred param) and (features x 1)
+            # The numpy backend only supports a single scale parameter so that the Newton step is a division.
+            jac, hessian = score_b_var(b[:, active], active)
+            # Ascent direction for non-concave parts of the likelihood, Newton step otherwise:
+            step = jac / np.maximum(np.abs(hessian), np.nextafter(0, np.inf, dtype=hessian.dtype))
+            step = np.clip(step, -1. * pkg_constants.NR_B_MAX_STEP, pkg_constants.NR_B_MAX_STEP)
+
+            # Step-halving for features for which the trial step leads to a worse loss:
+            ll_proposal = np.zeros_like(ll_current[active])
+            idx_halving = np.arange(0, len(active))
+            for i in range(max_halvings + 1):
+                b_proposal = np.clip(b[:, active[idx_halving]] + step[:, idx_halving], lb["b_var"], ub["b_var"])
+                ll_proposal[idx_halving] = cost_b_var(b_proposal, active[idx_halving])
+                bad_step = ll_proposal[idx_halving] > ll_current[active[idx_halving]]
+                idx_halving = idx_halving[bad_step]
+                if len(idx_halving) == 0:
+                    break
+                step[:, idx_halving] = step[:, idx_halving] / 2.
+            # Features without improving step are kept at their previous value:
+            step[:, idx_halving] = 0.
+            ll_proposal[idx_halving] = ll_current[active[idx_halving]]
+            b[:, active] = np.clip(b[:, active] + step, lb["b_var"], ub["b_var"])
+
+            # Assess convergence:
+            ll_previous = ll_current[active]
+            ll_current[active] = ll_proposal
+            converged_f = np.logical_or(
+                np.abs(ll_previous - ll_proposal) / np.maximum(
+                    np.nextafter(0, np.inf, dtype=ll_previous.dtype),
+                    np.abs(ll_previous)
+                ) < ftol,
+                np.max(np.abs(step), axis=0) < pkg_constants.XTOL_BY_FEATURE_SCALE
+            )
+            active = active[np.logical_not(converged_f)]
+            iter += 1
+            logger.debug(
+                "iter %i: ll=%f, converged scale model: %.2f%%" %
+                (
+                    iter,
+                    np.sum(ll_current),
+                    (1. - len(active) / len(idx_update)) * 100
+                )
+            )
+
+        delta_theta[:, idx_update] = b - b_var[:, idx_update]
+        return delta_theta
+
+    def _b_step_brent_vectorized(
+            self,
+            idx_update: np.ndarray,
+            max_iter: int,
+            ftol: float
+    ) -> np.ndarray:
+        """
+        Brent line search on the scale model of all features in idx_update at the same time.
+
+        This follows the iterations of scipy.optimize.brent but keeps the state of the minimization of each feature
+        in a vector so that each probe is a single likelihood evaluation over an (observations x active features)
+        block. Features are dropped from the active block as soon as their individual line search converged.
+        The search interval of each feature is the bracket used by the per-feature loop, ie. the current estimate
+        +/- 20 in linker space, intersected with the parameter bounds.
+
+        :return: (inferred param x features)
+        """
+        golden = 0.3819660  # 1 - 1 / golden ratio, as in scipy.optimize.brent.
+        mintol = 1.0e-11
+
+        # Computed dask zeros can be read-only views if all parameters are in one chunk.
+        delta_theta = np.zeros(self.model.model_vars.b_var.shape, dtype=self.model.model_vars.b_var.dtype)
+        if len(idx_update) == 0:
+            return delta_theta
+
+        data, eta_loc, xh_scale, b_var = self._b_step_data(idx_update=idx_update)
+        ll = self.model.ll_handle()
+        lb, ub = self.model.param_bounds_cached(dtype=self.model.model_vars.b_var.dtype)
+
+        def cost_b_var(b, idx):
+            b = np.clip(np.expand_dims(b, axis=0), lb["b_var"], ub["b_var"])
+            return - np.sum(ll(data[:, idx], eta_loc[:, idx], b, xh_scale), axis=0)
+
+        # Initialise search intervals [a, b] around current estimate x.
+        x = b_var[0, idx_update].copy()
+        a = np.maximum(lb["b_var"], x - 20)
+        b = np.minimum(ub["b_var"], x + 20)
+        w = x.copy()
+        v = x.copy()
+        fx = cost_b_var(x, np.arange(0, len(idx_update)))
+        fw = fx.copy()
+        fv = fx.copy()
+        deltax = np.zeros_like(x)
+        rat = np.zeros_like(x)
+
+        iter = 0
+        active = np.arange(0, len(idx_update))
+        t0 = time.time()
+        while len(active) > 0 and iter < max_iter:
+            self._scale_progress(
+                n_done=len(idx_update) - len(active),
+                n_total=len(idx_update),
+                seconds=time.time() - t0
+            )
+            # Check convergence and drop converged features from active set:
+            tol1 = ftol * np.abs(x[active]) + mintol
+            tol2 = 2.0 * tol1
+            xmid = 0.5 * (a[active] + b[active])
+            still_active = np.abs(x[active] - xmid) >= (tol2 - 0.5 * (b[active] - a[active]))
+            active = active[still_active]
+            tol1 = tol1[still_active]
+            tol2 = tol2[still_active]
+            xmid = xmid[still_active]
+            if len(active) == 0:
+                break
+
+            xa = x[active]
+            aa = a[active]
+            ba = b[active]
+            deltax_a = deltax[active]
+            rat_a = rat[active]
+
+            # Golden section step into the larger of the two segments:
+            golden_deltax = np.where(xa >= xmid, aa - xa, ba - xa)
+            # Parabolic step through x, w and v:
+            tmp1 = (xa - w[active]) * (fx[active] - fv[active])
+            tmp2 = (xa - v[active]) * (fx[active] - fw[active])
+            p = (xa - v[active]) * tmp2 - (xa - w[active]) * tmp1
+            tmp2 = 2.0 * (tmp2 - tmp1)
+            p = np.where(tmp2 > 0.0, -p, p)
+            tmp2 = np.abs(tmp2)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                parabolic_ok = np.logical_and(
+                    np.logical_and(p > tmp2 * (aa - xa), p < tmp2 * (ba - xa)),
+                    np.abs(p) < np.abs(0.5 * tmp2 * deltax_a)
+                )
+                rat_parabolic = np.where(parabolic_ok, p / tmp2, 0.)
+            u_parabolic = xa + rat_parabolic
+            too_close_to_bounds = np.logical_or((u_parabolic - aa) < tol2, (ba - u_parabolic) < tol2)
+            rat_parabolic = np.where(
+                too_close_to_bounds,
+                np.where(xmid - xa >= 0, tol1, -tol1),
+                rat_parabolic
+            )
+
+            use_golden = np.abs(deltax_a) <= tol1
+            use_parabolic = np.logical_and(np.logical_not(use_golden), parabolic_ok)
+            deltax_new = np.where(use_golden, golden_deltax, rat_a)
+            deltax_new = np.where(
+                np.logical_and(np.logical_not(use_golden), np.logical_not(parabolic_ok)),
+                golden_deltax,
+                deltax_new
+            )
+            rat_new = np.where(use_parabolic, rat_parabolic, golden * deltax_new)
+            deltax[active] = deltax_new
+            rat[active] = rat_new
+
+            # Update by at least tol1:
+            u = np.where(
+                np.abs(rat_new) < tol1,
+                np.where(rat_new >= 0, xa + tol1, xa - tol1),
+                xa + rat_new
+            )
+            fu = cost_b_var(u, active)
+
+            # Update brackets and points:
+            worse = fu > fx[active]
+            better = np.logical_not(worse)
+            idx_w = active[worse]
+            a[idx_w] = np.where(u[worse] < x[idx_w], u[worse], a[idx_w])
+            b[idx_w] = np.where(u[worse] < x[idx_w], b[idx_w], u[worse])
+            replace_w = np.logical_or(fu[worse] <= fw[idx_w], w[idx_w] == x[idx_w])
+            replace_v = np.logical_and(
+                np.logical_not(replace_w),
+                np.logical_or(np.logical_or(fu[worse] <= fv[idx_w], v[idx_w] == x[idx_w]), v[idx_w] == w[idx_w])
+            )
+            idx_rw = idx_w[replace_w]
+            v[idx_rw] = w[idx_rw]
+            fv[idx_rw] = fw[idx_rw]
+            w[idx_rw] = u[worse][replace_w]
+            fw[idx_rw] = fu[worse][replace_w]
+            idx_rv = idx_w[replace_v]
+            v[idx_rv] = u[worse][replace_v]
+            fv[idx_rv] = fu[worse][replace_v]
+
+            idx_b = active[better]
+            a[idx_b] = np.where(u[better] >= x[idx_b], x[idx_b], a[idx_b])
+            b[idx_b] = np.where(u[better] >= x[idx_b], b[idx_b], x[idx_b])
+            v[idx_b] = w[idx_b]
+            fv[idx_b] = fw[idx_b]
+            w[idx_b] = x[idx_b]
+            fw[idx_b] = fx[idx_b]
+            x[idx_b] = u[better]
+            fx[idx_b] = fu[better]
+            iter += 1
+        self._scale_progress(n_done=len(idx_update), n_total=len(idx_update), seconds=time.time() - t0)
+
+        delta_theta[0, idx_update] = x - b_var[0, idx_update]
         return delta_theta
 
     def finalize(self):
         """
-        Evaluate all tensors that need to be exported from session and save these as class attributes
-        and close session.
-
-        Changes .model entry from tf1-based EstimatorGraph to numpy based Model instance and
-        transfers relevant attributes.
-        """
-        # Read from numpy-IRLS estimator specific model:
-        self._hessian = - self.model.fim.compute()
-        fisher_inv = np.zeros_like(self._hessian)
-        invertible = np.where(np.linalg.cond(self._hessian, p=None) < 1 / sys.float_info.epsilon)[0]
-        fisher_inv[invertible] = np.linalg.inv(- self._hessian[invertible])
-        self._fisher_inv = fisher_inv
-        self._jacobian = np.sum(np.abs(self.model.jac.compute() / self.model.x.shape[0]), axis=1)
-        self._log_likelihood = self.model.ll_byfeature.compute()
-        self._loss = np.sum(self._log_likelihood)
+        Conclude training.
+
+        hessian, fisher_inv, jacobian, log_likelihood and loss are not evaluated here but on first access, and are
+        then cached until the parameters change. Use hessian_j(), fisher_inv_j(), jacobian_j() and
+        log_likelihood_j() to only evaluate these for some features or, for the Fisher inverse, only its diagonal.
+        """
+        self._finalized = True
+        self._final_cache = {}
+        self._final_cache_version = None
+
+    def _final_cached(self, name, fun):
+        """
+        Evaluate fun() once per parameter version, see ModelIwls._cached().
+        """
+        if self._final_cache_version != self.model.model_vars.version:
+            self._final_cache = {}
+            self._final_cache_version = self.model.model_vars.version
+        if name not in self._final_cache.keys():
+            self._final_cache[name] = fun()
+        return self._final_cache[name]
+
+    def _finalize_stats(self, idx) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Location FIM block, scores and log-likelihood of the features idx in streaming mode, all features are
+        evaluated in one pass over the data and cached.
+        """
+        if idx is None:
+            return self._final_cached(
+                "finalize_stats",
+                lambda: self._streaming.finalize_stats(idx=np.arange(0, self.model.model_vars.n_features))
+            )
+        return self._streaming.finalize_stats(idx=idx)
+
+    def _fim_j(self, idx) -> np.ndarray:
+        """
+        FIM of the features idx, all features if None.
+
+        :return: (features x inferred param x inferred param)
+        """
+        if self._streaming is not None:
+            # Model was trained in streaming mode, reductions over observations are also streamed here.
+            fim_aa = self._finalize_stats(idx=idx)[0]
+        elif idx is None:
+            fim_aa = self.model.fim_aa
+        else:
+            fim_aa = self.model.assembly_loc.xtwx(self.model.fim_weight_aa_j(j=idx))
+        fim_ab = self.model.fim_ab
+        fim_bb = self.model.fim_bb
+        if idx is not None:
+            fim_ab = fim_ab[idx]
+            fim_bb = fim_bb[idx]
+        fim = self.model.fim_from_blocks(fim_aa=fim_aa, fim_ab=fim_ab, fim_bb=fim_bb)
+        return fim.compute() if isinstance(fim, dask.array.core.Array) else fim
+
+    def hessian_j(self, idx: np.ndarray = None) -> np.ndarray:
+        """
+        Hessian, approximated by the negative FIM, of the features idx.
+
+        :param idx: Features, all features if None.
+        :return: (features x inferred param x inferred param)
+        """
+        if idx is None:
+            return self._final_cached("hessian", lambda: - self._fim_j(idx=None))
+        return - self._fim_j(idx=np.asarray(idx))
+
+    def _reusable_factor(self, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Features of idx for which the Cholesky factor of the last IRLS step is the Cholesky factor of the FIM.
+
+        This is the case if the FIM only has a location model block and if the parameters of the feature did not
+        change since the factorization, e.g. because the last step of the feature was reverted.
+
+        :return: Tuple of positions in idx and positions in the factorization of these features.
+        """
+        factor = self._iwls_factor
+        empty = np.zeros([0], dtype=int)
+        if factor is None or \
+                factor["compute_dtype"] != self.model.compute_dtype or \
+                self.model.fim_bb.shape[-1] > 0:
+            return empty, empty
+        pos_factor = np.full([self.model.model_vars.n_features], -1, dtype=int)
+        pos_factor[factor["idx"]] = np.arange(0, len(factor["idx"]))
+        pos_factor = pos_factor[idx]
+        pos_idx = np.where(pos_factor >= 0)[0]
+        pos_factor = pos_factor[pos_idx]
+        unchanged = np.all(self.model.model_vars.params[:, idx[pos_idx]] == factor["params"][:, pos_factor], axis=0)
+        unchanged = np.logical_and(unchanged, np.logical_not(factor["cholesky_failed"][pos_factor]))
+        return pos_idx[unchanged], pos_factor[unchanged]
+
+    def fisher_inv_j(
+            self,
+            idx: np.ndarray = None,
+            diagonal: bool = False
+    ) -> np.ndarray:
+        """
+        Inverse of the FIM of the features idx, set to zero for features with singular FIM.
+
+        The Cholesky factors of the last IRLS step are reused for features whose parameters did not change since,
+        the FIM is only evaluated for the remaining features.
+
+        :param idx: Features, all features if None.
+        :param diagonal: Only compute the diagonal of the inverse.
+        :return: (features x inferred param x inferred param), or (features x inferred param) if diagonal
+        """
+        if idx is None:
+            if diagonal:
+                return self._final_cached(
+                    "fisher_inv_diagonal",
+                    lambda: self.fisher_inv_j(idx=np.arange(0, self.model.model_vars.n_features), diagonal=True)
+                )
+            else:
+                return self._final_cached(
+                    "fisher_inv",
+                    lambda: self.fisher_inv_j(idx=np.arange(0, self.model.model_vars.n_features), diagonal=False)
+                )
+        idx = np.asarray(idx)
+        pos_reused, pos_factor = self._reusable_factor(idx=idx)
+        pos_new = np.setdiff1d(np.arange(0, len(idx)), pos_reused)
+        if len(pos_new) == len(idx):
+            if len(idx) == self.model.model_vars.n_features:
+                # Use the cached hessian of all features.
+                fim = - self.hessian_j(idx=None)[idx]
+            else:
+                fim = self._fim_j(idx=idx)
+            result = cholesky_inverse(a=fim, diagonal=diagonal)
+        else:
+            n_par = self.model.model_vars.npar_a
+            x = np.zeros(
+                [len(idx), n_par] if diagonal else [len(idx), n_par, n_par],
+                dtype=self.model.model_vars.a_var.dtype
+            )
+            cholesky_failed = np.zeros([len(idx)], dtype=bool)
+            if len(pos_reused) > 0:
+                result_reused = cholesky_inverse_from_factor(
+                    l=self._iwls_factor["l"][pos_factor],
+                    cholesky_failed=self._iwls_factor["cholesky_failed"][pos_factor],
+                    diagonal=diagonal
+                )
+                x[pos_reused] = result_reused.x
+            if len(pos_new) > 0:
+                result_new = cholesky_inverse(a=self._fim_j(idx=idx[pos_new]), diagonal=diagonal)
+                x[pos_new] = result_new.x
+                cholesky_failed[pos_new] = result_new.cholesky_failed
+            result = BatchedSolveResult(x=x, cholesky_failed=cholesky_failed)
+        if len(idx) == self.model.model_vars.n_features and not diagonal:
+            self.fisher_inv_result = result
+        return result.x
+
+    def jacobian_j(self, idx: np.ndarray = None) -> np.ndarray:
+        """
+        Mean absolute score by observation of the features idx.
+
+        :param idx: Features, all features if None.
+        :return: (features)
+        """
+        if idx is None:
+            return self._final_cached("jacobian", lambda: self._jacobian_j(idx=None))
+        return self._jacobian_j(idx=np.asarray(idx))
+
+    def _jacobian_j(self, idx) -> np.ndarray:
+        if self._streaming is not None:
+            _, jac_a, jac_b, _ = self._finalize_stats(idx=idx)
+            jac = np.concatenate([jac_a, jac_b], axis=-1)
+        elif idx is None:
+            jac = self.model.jac
+        else:
+            jac = np.concatenate([self.model.jac_a_j(j=idx), self.model.jac_b_j(j=idx)], axis=-1)
+        if isinstance(jac, dask.array.core.Array):
+            jac = jac.compute()
+        return np.sum(np.abs(jac / self.model.x.shape[0]), axis=1)
+
+    def log_likelihood_j(self, idx: np.ndarray = None) -> np.ndarray:
+        """
+        Log-likelihood of the features idx.
+
+        :param idx: Features, all features if None.
+        :return: (features)
+        """
+        if idx is None:
+            return self._final_cached("log_likelihood", lambda: self._log_likelihood_j(idx=None))
+        return self._log_likelihood_j(idx=np.asarray(idx))
+
+    def _log_likelihood_j(self, idx) -> np.ndarray:
+        if self._streaming is not None:
+            return self._finalize_stats(idx=idx)[3]
+        elif idx is None:
+            ll = self.model.ll_byfeature
+        else:
+            ll = self.model.ll_byfeature_j(j=idx)
+        return ll.compute() if isinstance(ll, dask.array.core.Array) else ll
+
+    @property
+    def hessian(self):
+        return self.hessian_j() if self._finalized else None
+
+    @property
+    def fisher_inv(self):
+        return self.fisher_inv_j() if self._finalized else None
+
+    @property
+    def jacobian(self):
+        return self.jacobian_j() if self._finalized else None
+
+    @property
+    def log_likelihood(self):
+        return self.log_likelihood_j() if self._finalized else None
+
+    @property
+    def loss(self):
+        return np.sum(self.log_likelihood_j()) if self._finalized else None
 
     @abc.abstractmethod
     def get_model_container(
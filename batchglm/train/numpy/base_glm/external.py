@@ -1,4 +1,6 @@
 from batchglm.models.base_glm import InputDataGLM, _ModelGLM, _EstimatorGLM
+from batchglm.models.base.input import is_disk_backed
 
-from batchglm.utils.linalg import groupwise_solve_lm
+from batchglm.utils.linalg import groupwise_solve_lm, cholesky_solve, cholesky_inverse, \
+    cholesky_inverse_from_factor, BatchedSolveResult
 from batchglm import pkg_constants
\ No newline at end of file
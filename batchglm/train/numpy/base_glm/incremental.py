@@ -0,0 +1,191 @@
+"""
+Incremental refits of the numpy backend after new observations were appended to the data of a previous fit.
+
+The log-likelihood of the observations of the previous fit is replaced by its second order expansion around the
+parameters of the previous fit. This expansion only depends on per-feature sufficient statistics (IRLS system,
+scale model score and hessian and log-likelihood) which are cached after the previous fit, so that only the new
+observations have to be read during the first iterations of the refit.
+"""
+import numpy as np
+from typing import Tuple
+
+from .checkpoint import _write_atomic, load_checkpoint
+from .streaming import StreamingIwls
+
+
+class SufficientStatistics:
+    """
+    Per-feature sufficient statistics of the log-likelihood of the observations of a fit.
+
+    All statistics are evaluated at the parameters a_var and b_var of the fit and follow the conventions of
+    StreamingIwls: a and b are the IRLS system of the location model, jac_b and hessian_b are score and hessian
+    diagonal of the scale model.
+    """
+
+    n_obs: int
+    a_var: np.ndarray
+    b_var: np.ndarray
+    a: np.ndarray
+    b: np.ndarray
+    jac_b: np.ndarray
+    hessian_b: np.ndarray
+    ll: np.ndarray
+
+    def __init__(
+            self,
+            n_obs: int,
+            a_var: np.ndarray,
+            b_var: np.ndarray,
+            a: np.ndarray,
+            b: np.ndarray,
+            jac_b: np.ndarray,
+            hessian_b: np.ndarray,
+            ll: np.ndarray
+    ):
+        """
+
+        :param n_obs: Number of observations of the fit, these are the first observations of the data of a refit.
+        :param a_var: Location model parameters (inferred param x features).
+        :param b_var: Scale model parameters (inferred param x features).
+        :param a: X^T*W*X: (features x inferred param x inferred param)
+        :param b: X^T*W*Ybar: (features x inferred param)
+        :param jac_b: Score of the scale model (features x inferred param)
+        :param hessian_b: Hessian diagonal of the scale model (features x inferred param)
+        :param ll: Log-likelihood (features)
+        """
+        self.n_obs = int(n_obs)
+        self.a_var = np.asarray(a_var)
+        self.b_var = np.asarray(b_var)
+        self.a = np.asarray(a)
+        self.b = np.asarray(b)
+        self.jac_b = np.asarray(jac_b)
+        self.hessian_b = np.asarray(hessian_b)
+        self.ll = np.asarray(ll)
+
+    @classmethod
+    def from_model(
+            cls,
+            model,
+            chunk_size_cells: int
+    ):
+        """
+        Evaluate the sufficient statistics of all observations at the current parameters of a model.
+
+        :param model: ModelIwls instance.
+        :param chunk_size_cells: Number of observations that are read at a time.
+        """
+        streaming = StreamingIwls(model=model, chunk_size_cells=chunk_size_cells)
+        idx = np.arange(0, model.model_vars.n_features)
+        a, b = streaming.iwls_system(idx=idx)
+        jac_b, hessian_b = streaming.scale_score(idx=idx)
+        return cls(
+            n_obs=streaming.n_obs,
+            a_var=model.model_vars.a_var.copy(),
+            b_var=model.model_vars.b_var.copy(),
+            a=a,
+            b=b,
+            jac_b=jac_b,
+            hessian_b=hessian_b,
+            ll=streaming.ll_byfeature(idx=idx)
+        )
+
+    def save(self, path: str):
+        """
+        Write the statistics to an .npz file, the file is replaced atomically.
+        """
+        _write_atomic(path, dict([(k, np.asarray(v)) for k, v in vars(self).items()]))
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Read statistics written by save().
+        """
+        return cls(**load_checkpoint(path))
+
+
+class IncrementalIwls:
+    """
+    Evaluation of the IRLS systems, scores and losses of an incremental refit.
+
+    Quantities are the sum of the second order expansion of the previous observations, based on cached
+    SufficientStatistics, and of the exact contributions of the new observations, which are streamed over chunks.
+    This has the interface of StreamingIwls that is used during training.
+    """
+
+    def __init__(
+            self,
+            model,
+            stats: SufficientStatistics,
+            chunk_size_cells: int
+    ):
+        """
+
+        :param model: ModelIwls instance of the refit.
+        :param stats: Sufficient statistics of the previous fit.
+        :param chunk_size_cells: Number of new observations per chunk.
+        """
+        if stats.a_var.shape != model.model_vars.a_var.shape or stats.b_var.shape != model.model_vars.b_var.shape:
+            raise ValueError(
+                "sufficient statistics of parameters of shape %s and %s do not match model parameters of shape %s and %s"
+                % (str(stats.a_var.shape), str(stats.b_var.shape),
+                   str(model.model_vars.a_var.shape), str(model.model_vars.b_var.shape))
+            )
+        self.model = model
+        self.stats = stats
+        self.new = StreamingIwls(model=model, chunk_size_cells=chunk_size_cells, obs_start=stats.n_obs)
+        if stats.n_obs > self.new.n_obs:
+            raise ValueError(
+                "sufficient statistics of %i observations but data only has %i observations" %
+                (stats.n_obs, self.new.n_obs)
+            )
+
+    def _delta(self, idx, b_var=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Difference of the parameters of features idx to the parameters of the previous fit.
+
+        :return: Tuple of location and scale model differences (features x inferred param).
+        """
+        if b_var is None:
+            b_var = self.model.model_vars.b_var[:, idx]
+        delta_a = self.model.model_vars.a_var[:, idx] - self.stats.a_var[:, idx]
+        delta_b = b_var - self.stats.b_var[:, idx]
+        return delta_a.T, delta_b.T
+
+    def ll_byfeature(self, idx, b_var=None) -> np.ndarray:
+        """
+        Log-likelihood of the features idx, see StreamingIwls.ll_byfeature().
+
+        :return: (features)
+        """
+        delta_a, delta_b = self._delta(idx=idx, b_var=b_var)
+        # a is the negative Fisher information and b the negative score of the location model:
+        ll_previous = self.stats.ll[idx] - \
+            np.sum(self.stats.b[idx] * delta_a, axis=1) + \
+            0.5 * np.einsum("fi,fij,fj->f", delta_a, self.stats.a[idx], delta_a) + \
+            np.sum(self.stats.jac_b[idx] * delta_b, axis=1) + \
+            0.5 * np.sum(self.stats.hessian_b[idx] * np.square(delta_b), axis=1)
+        return ll_previous + self.new.ll_byfeature(idx=idx, b_var=b_var)
+
+    def iwls_system(self, idx) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        IRLS system of the location model of the features idx, see StreamingIwls.iwls_system().
+
+        :return: Tuple of a (features x inferred param x inferred param) and b (features x inferred param).
+        """
+        delta_a, _ = self._delta(idx=idx)
+        a, b = self.new.iwls_system(idx=idx)
+        a += self.stats.a[idx]
+        b += self.stats.b[idx] - np.einsum("fij,fj->fi", self.stats.a[idx], delta_a)
+        return a, b
+
+    def scale_score(self, idx, b_var=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score and diagonal of the hessian of the scale model of the features idx, see StreamingIwls.scale_score().
+
+        :return: Tuple of score (features x inferred param) and hessian diagonal (features x inferred param).
+        """
+        _, delta_b = self._delta(idx=idx, b_var=b_var)
+        jac, hessian = self.new.scale_score(idx=idx, b_var=b_var)
+        jac += self.stats.jac_b[idx] + self.stats.hessian_b[idx] * delta_b
+        hessian += self.stats.hessian_b[idx]
+        return jac, hessian
@@ -0,0 +1,263 @@
+"""
+Lazy evaluation of the IRLS systems, scores and losses of the numpy backend as dask graphs.
+
+Each quantity that training needs, e.g. the IRLS system of the location model or the log-likelihood of a trial
+update, is built as a single dask graph over chunks of observations and is evaluated in one call to the configured
+dask scheduler. Quantities that are needed together, such as FIM and score, share the nodes that evaluate the
+observation-level weights and are reduced chunk by chunk in the same graph. Count data and intermediates that are
+reused across evaluations at the same parameters are persisted in the memory of the scheduler.
+"""
+import dask
+import dask.array
+import logging
+import numpy as np
+from typing import Tuple, Union
+
+logger = logging.getLogger("batchglm")
+
+
+def _get_scheduler(scheduler):
+    """
+    Resolve a scheduler argument of LazyIwls.
+
+    :return: Tuple of the scheduler argument for dask.compute() and a dask.distributed.Client that was started here
+        and has to be closed by the caller, or None.
+    """
+    if isinstance(scheduler, str) and scheduler.lower() == "distributed":
+        try:
+            import dask.distributed
+        except ImportError:
+            raise ImportError("scheduler \"distributed\" requires dask.distributed, install distributed")
+        client = dask.distributed.Client(dask.distributed.LocalCluster())
+        logger.info("started local dask.distributed cluster: %s" % client.dashboard_link)
+        return client, client
+    elif isinstance(scheduler, str):
+        if scheduler.lower() not in ["threads", "processes", "synchronous", "single-threaded", "sync"]:
+            raise ValueError("scheduler %s not recognized" % scheduler)
+        return scheduler.lower(), None
+    else:
+        # dask.distributed.Client or any other scheduler that dask.compute() accepts.
+        return scheduler, None
+
+
+class LazyIwls:
+    """
+    Evaluation of the sufficient statistics of the numpy backend as dask graphs on a configurable scheduler.
+
+    This has the interface of StreamingIwls that is used during training. Count data are rechunked along
+    observations into blocks of chunk_size_cells observations of all features and persisted once, linear predictors
+    of the location model are persisted for the current location model parameters so that the iterations of a scale
+    model update do not re-evaluate them.
+    """
+
+    chunk_size_cells: int
+
+    def __init__(
+            self,
+            model,
+            chunk_size_cells: int,
+            scheduler: Union[str, object] = "threads"
+    ):
+        """
+
+        :param model: ModelIwls instance.
+        :param chunk_size_cells: Number of observations per chunk.
+        :param scheduler: dask scheduler that graphs are evaluated on:
+
+            - "threads": thread pool of this process
+            - "processes": process pool
+            - "synchronous": this thread, for debugging
+            - "distributed": local dask.distributed cluster that is started here and stopped by close()
+            - a dask.distributed.Client, which is not closed by close()
+        """
+        self.model = model
+        self.chunk_size_cells = int(chunk_size_cells)
+        self.scheduler, self._client = _get_scheduler(scheduler)
+        self._setup()
+
+    def _setup(self):
+        """
+        Rechunk count data and designs to chunks of observations and persist them on the scheduler.
+
+        Count data that are read chunk by chunk from their storage, see InputDataBase.x_lazy, are not persisted so
+        that they stay on disk or in their compact data type.
+        """
+        self._persist_x = not getattr(self.model.input_data, "x_lazy", False)
+        x = self.model.x
+        if not isinstance(x, dask.array.core.Array):
+            x = dask.array.from_array(x, chunks=(self.chunk_size_cells, x.shape[1]), asarray=False)
+        x = x.rechunk((self.chunk_size_cells, x.shape[1]))
+        chunks_obs = x.chunks[0]
+
+        def _rechunk(y):
+            if y is None:
+                return None
+            if not isinstance(y, dask.array.core.Array):
+                y = dask.array.from_array(np.asarray(y), chunks=(chunks_obs, y.shape[1]))
+            return y.rechunk((chunks_obs, y.shape[1]))
+
+        if self._persist_x:
+            (x,) = self.persist(x)
+        self.x = x
+        self.xh_loc, self.xh_scale, self.size_factors = self.persist(
+            _rechunk(self.model.xh_loc),
+            _rechunk(self.model.xh_scale),
+            _rechunk(self.model.size_factors)
+        )
+        # Persisted intermediates by name: Tuple of parameter version (None if independent of the parameters),
+        # map of features to columns (-1 if not contained) and the persisted array.
+        self._persisted = {}
+
+    def compute(self, *args):
+        return dask.compute(*args, scheduler=self.scheduler)
+
+    def persist(self, *args):
+        # None entries are passed through, dask.persist() returns them unchanged.
+        return dask.persist(*args, scheduler=self.scheduler)
+
+    def close(self):
+        """
+        Release persisted data and stop the dask.distributed cluster if it was started by this instance.
+
+        The instance cannot be used for evaluations afterwards.
+        """
+        self._persisted = {}
+        self.x, self.xh_loc, self.xh_scale, self.size_factors = None, None, None, None
+        if self._client is not None:
+            client = self._client
+            self._client = None
+            client.close()
+            client.cluster.close()
+
+    def _cached(self, name, idx, version, fun):
+        """
+        Persisted result of fun(idx), served from a persisted superset of features idx if version matches.
+
+        Only the most recent array is kept by name.
+
+        :param version: Parameter version that the array depends on, None if it does not depend on the parameters.
+        """
+        idx = np.asarray(idx, dtype=np.int64)
+        if name in self._persisted.keys():
+            version_cached, local, value = self._persisted[name]
+            if version_cached == version:
+                idx_local = local[idx]
+                if np.all(idx_local >= 0):
+                    return value[:, idx_local]
+        (value,) = self.persist(fun(idx))
+        local = np.zeros([self.model.model_vars.n_features], dtype=np.int64) - 1
+        local[idx] = np.arange(0, len(idx))
+        self._persisted[name] = (version, local, value)
+        return value
+
+    def x_j(self, idx):
+        """
+        Count data of the features idx.
+
+        :return: (observations x features)
+        """
+        if not self._persist_x:
+            return self.x[:, np.asarray(idx, dtype=np.int64)]
+        return self._cached("x", idx, None, lambda j: self.x[:, j])
+
+    def eta_loc_j(self, idx):
+        """
+        Linear predictor of the location model of the features idx at the current parameters.
+
+        :return: (observations x features)
+        """
+        def fun(j):
+            a_var = self.model.model_vars.a_var[:, j]
+            if self.model.compute_dtype is not None:
+                a_var = a_var.astype(self.model.compute_dtype)
+            eta_loc = dask.array.matmul(self.xh_loc, a_var)
+            if self.size_factors is not None:
+                eta_loc = eta_loc + self.size_factors
+            return self.model.np_clip_param(eta_loc, "eta_loc")
+
+        return self._cached("eta_loc", idx, self.model.model_vars.version, fun)
+
+    def eta_scale_j(self, idx, b_var=None):
+        """
+        Linear predictor of the scale model of the features idx.
+
+        :param b_var: Scale model parameters of features idx (inferred param x features),
+            current parameters if None.
+        :return: (observations x features)
+        """
+        if b_var is None:
+            b_var = self.model.model_vars.b_var[:, idx]
+        if self.model.compute_dtype is not None:
+            b_var = b_var.astype(self.model.compute_dtype)
+        return self.model.np_clip_param(dask.array.matmul(self.xh_scale, b_var), "eta_scale")
+
+    def _ll(self, idx, b_var=None):
+        ll = self.model.ll_chunk(
+            x=self.x_j(idx),
+            eta_loc=self.eta_loc_j(idx),
+            eta_scale=self.eta_scale_j(idx, b_var=b_var)
+        )
+        return dask.array.sum(ll, axis=0, dtype=self.model.accumulate_dtype)
+
+    def ll_byfeature(self, idx, b_var=None) -> np.ndarray:
+        """
+        Log-likelihood of the features idx, see StreamingIwls.ll_byfeature().
+
+        :return: (features)
+        """
+        (ll,) = self.compute(self._ll(idx=idx, b_var=b_var))
+        return np.asarray(ll).astype(self.model.model_vars.a_var.dtype)
+
+    def _iwls_system(self, idx):
+        x = self.x_j(idx)
+        eta_loc = self.eta_loc_j(idx)
+        eta_scale = self.eta_scale_j(idx)
+        w = self.model.fim_weight_aa_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+        ybar = self.model.ybar_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+        return self.model.assembly_loc.xtwx(w), self.model.assembly_loc.xtw(w * ybar)
+
+    def iwls_system(self, idx) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        IRLS system of the location model of the features idx, see StreamingIwls.iwls_system().
+
+        a and b are evaluated in one graph that shares the weights of each chunk of observations.
+
+        :return: Tuple of a (features x inferred param x inferred param) and b (features x inferred param).
+        """
+        a, b = self.compute(*self._iwls_system(idx=idx))
+        dtype = self.model.model_vars.a_var.dtype
+        return np.asarray(a).astype(dtype), np.asarray(b).astype(dtype)
+
+    def _scale_score(self, idx, b_var=None):
+        x = self.x_j(idx)
+        eta_loc = self.eta_loc_j(idx)
+        eta_scale = self.eta_scale_j(idx, b_var=b_var)
+        jac = self.model.assembly_scale.xtw(
+            self.model.jac_weight_b_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+        )
+        hessian = dask.array.matmul(
+            self.model.hessian_weight_bb_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale).T,
+            dask.array.square(self.xh_scale)
+        )
+        return jac, hessian
+
+    def scale_score(self, idx, b_var=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score and diagonal of the hessian of the scale model of the features idx, see StreamingIwls.scale_score().
+
+        :return: Tuple of score (features x inferred param) and hessian diagonal (features x inferred param).
+        """
+        jac, hessian = self.compute(*self._scale_score(idx=idx, b_var=b_var))
+        dtype = self.model.model_vars.b_var.dtype
+        return np.asarray(jac).astype(dtype), np.asarray(hessian).astype(dtype)
+
+    def finalize_stats(self, idx) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Location FIM block, scores and log-likelihood of the features idx in one graph,
+        see StreamingIwls.finalize_stats().
+        """
+        fim_aa, jac_a = self._iwls_system(idx=idx)
+        jac_b, _ = self._scale_score(idx=idx)
+        fim_aa, jac_a, jac_b, ll = self.compute(fim_aa, jac_a, jac_b, self._ll(idx=idx))
+        dtype = self.model.model_vars.a_var.dtype
+        return tuple([np.asarray(y).astype(dtype) for y in [fim_aa, jac_a, jac_b, ll]])
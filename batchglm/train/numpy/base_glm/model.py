@@ -1,7 +1,10 @@
 import abc
+import dask.array
 import numpy as np
 import logging
 
+from .assembly import Assembly, build_assembly
+
 logger = logging.getLogger("batchglm")
 
 
@@ -9,9 +12,18 @@ class ModelIwls:
 
     def __init__(
             self,
-            model_vars
+            model_vars,
+            compute_dtype=None
     ):
+        """
+
+        :param model_vars: ModelVarsGlm instance that holds the parameters.
+        :param compute_dtype: Data type of the parameters in observation-level quantities (eta, location, scale,
+            weights and log-likelihood terms), data type of the parameters if None. Reductions over observations
+            are accumulated in the data type of the parameters, see set_compute_dtype().
+        """
         self.model_vars = model_vars
+        self.compute_dtype = None
         #self.params = np.concatenate(
         #    [
         #        model_vars.init_a_clipped,
@@ -19,6 +31,279 @@ class ModelIwls:
         #    ],
         #    axis=0
         #)
+        # Cache of parameter dependent quantities, only valid for one parameter version, see _cached().
+        self._cache = {}
+        self._cache_version = None
+        # Cache of design dependent quantities, these do not change during training.
+        self._xh_loc = None
+        self._xh_scale = None
+        self._assembly_loc = None
+        self._assembly_scale = None
+        self._assembly_loc_scale = None
+        # Designs and size factors in the compute data type, see _cast_compute().
+        self._compute_cast = {}
+        # Count data of the active features packed into a contiguous array, see compact().
+        self._active_idx = None
+        self._active_x = None
+        self._active_local = None
+        self.set_compute_dtype(compute_dtype)
+
+    def set_compute_dtype(self, dtype):
+        """
+        Set the data type of observation-level quantities, see __init__().
+
+        This allows mixed precision training: Observation-level quantities can be evaluated in float32 while FIMs,
+        scores and log-likelihoods are accumulated in the float64 data type of the parameters. Designs and size factors
+        are cast to dtype, so that those of compact integer counts, which InputDataGLM keeps in float64 if no
+        cast_dtype is given, do not promote observation-level quantities. Note that the data type of
+        observation-level quantities also depends on the data type of the count data.
+        """
+        dtype = np.dtype(dtype) if dtype is not None else None
+        if dtype == self.model_vars.params.dtype:
+            dtype = None
+        if dtype != self.compute_dtype:
+            self.compute_dtype = dtype
+            self._cache = {}
+            self._cache_version = None
+            self._xh_loc = None
+            self._xh_scale = None
+            self._compute_cast = {}
+            self._assembly_loc = None
+            self._assembly_scale = None
+            self._assembly_loc_scale = None
+
+    @property
+    def accumulate_dtype(self):
+        """
+        Data type in which reductions over observations are accumulated, None if this is the data type of the
+        observation-level quantities.
+        """
+        if self.compute_dtype is None:
+            return None
+        else:
+            return self.model_vars.params.dtype
+
+    def _cached(self, name, j, fun):
+        """
+        Evaluate fun() once per parameter version and feature index set.
+
+        The cache is emptied if the parameters were updated through the setters of the model variables since
+        the last call. Dask arrays are persisted so that graphs using the cached value do not re-evaluate it.
+
+        :param name: Name of the cached quantity.
+        :param j: Feature indices that the cached quantity refers to, None if all features.
+        :param fun: Function without arguments that evaluates the quantity.
+        """
+        if self._cache_version != self.model_vars.version:
+            self._cache = {}
+            self._cache_version = self.model_vars.version
+        if j is None:
+            key = (name, None)
+        else:
+            j = np.asarray(j, dtype=np.int64)
+            key = (name, j.shape, j.tobytes())
+        if key not in self._cache.keys():
+            value = fun()
+            if isinstance(value, dask.array.core.Array):
+                value = value.persist()
+            self._cache[key] = value
+        return self._cache[key]
+
+    def _cast_compute(self, name, x):
+        """
+        x in the compute data type, cached by name until the compute data type changes.
+        """
+        if self.compute_dtype is None or x is None or x.dtype == self.compute_dtype:
+            return x
+        if name not in self._compute_cast.keys():
+            self._compute_cast[name] = x.astype(self.compute_dtype)
+        return self._compute_cast[name]
+
+    @property
+    def design_loc(self):
+        return self._cast_compute("design_loc", super(ModelIwls, self).design_loc)
+
+    @property
+    def design_scale(self):
+        return self._cast_compute("design_scale", super(ModelIwls, self).design_scale)
+
+    @property
+    def size_factors(self):
+        return self._cast_compute("size_factors", super(ModelIwls, self).size_factors)
+
+    @property
+    def xh_loc(self):
+        """
+        Location design matrix in the space of inferred parameters.
+
+        :return: observations x inferred param
+        """
+        if self._xh_loc is None:
+            self._xh_loc = np.matmul(self.design_loc, self.constraints_loc)
+            if self.compute_dtype is not None:
+                self._xh_loc = self._xh_loc.astype(self.compute_dtype)
+            if isinstance(self._xh_loc, dask.array.core.Array):
+                self._xh_loc = self._xh_loc.persist()
+        return self._xh_loc
+
+    @property
+    def xh_scale(self):
+        """
+        Scale design matrix in the space of inferred parameters.
+
+        :return: observations x inferred param
+        """
+        if self._xh_scale is None:
+            self._xh_scale = np.matmul(self.design_scale, self.constraints_scale)
+            if self.compute_dtype is not None:
+                self._xh_scale = self._xh_scale.astype(self.compute_dtype)
+            if isinstance(self._xh_scale, dask.array.core.Array):
+                self._xh_scale = self._xh_scale.persist()
+        return self._xh_scale
+
+    @property
+    def n_active(self) -> int:
+        """
+        Number of features in the packed count data, all features if the data are not packed.
+        """
+        if self._active_idx is None:
+            return self.model_vars.n_features
+        else:
+            return len(self._active_idx)
+
+    def compact(self, idx):
+        """
+        Pack the count data of the features in idx into a contiguous array.
+
+        Count data of subsets of these features are then sliced from this smaller array, see x_j(), so that the cost of
+        gathering data of features in an iteration scales with the number of features that are still trained.
+        Count data that are read chunk by chunk from their storage, see InputDataBase.x_lazy, are only packed as
+        lazy selection and are not loaded into memory, so that they stay on disk or in their compact data type.
+
+        :param idx: Features to pack, usually all features that are not converged. Release packed data if None.
+        """
+        if idx is None:
+            self._active_idx = None
+            self._active_x = None
+            self._active_local = None
+            return
+        idx = np.sort(np.asarray(idx, dtype=np.int64))
+        x = self.x_j(j=idx)
+        if isinstance(x, dask.array.core.Array):
+            x = x.rechunk((x.chunks[0], self.x.chunksize[1]))
+            if not getattr(self.input_data, "x_lazy", False):
+                x = x.persist()
+        local = np.zeros([self.model_vars.n_features], dtype=np.int64) - 1
+        local[idx] = np.arange(0, len(idx))
+        self._active_idx = idx
+        self._active_x = x
+        self._active_local = local
+
+    def x_j(self, j):
+        """
+        Count data of features j.
+
+        Served from the packed count data of active features if these contain all features in j, see compact().
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        if self._active_idx is not None:
+            j = np.asarray(j, dtype=np.int64)
+            if j.shape == self._active_idx.shape and np.all(j == self._active_idx):
+                return self._active_x
+            j_local = self._active_local[j]
+            if np.all(j_local >= 0):
+                return self._active_x[:, j_local]
+        return self.x[:, j]
+
+    @property
+    def assembly_loc(self) -> Assembly:
+        """
+        Assembly engine for reductions over observations that involve the location design only, see assembly.py.
+        """
+        if self._assembly_loc is None:
+            self._assembly_loc = build_assembly(xh_a=self.xh_loc, dtype=self.accumulate_dtype)
+        return self._assembly_loc
+
+    @property
+    def assembly_scale(self) -> Assembly:
+        """
+        Assembly engine for reductions over observations that involve the scale design only, see assembly.py.
+        """
+        if self._assembly_scale is None:
+            self._assembly_scale = build_assembly(xh_a=self.xh_scale, dtype=self.accumulate_dtype)
+        return self._assembly_scale
+
+    @property
+    def assembly_loc_scale(self) -> Assembly:
+        """
+        Assembly engine for reductions over observations that involve the location and the scale design,
+        see assembly.py.
+        """
+        if self._assembly_loc_scale is None:
+            self._assembly_loc_scale = build_assembly(
+                xh_a=self.xh_loc,
+                xh_b=self.xh_scale,
+                dtype=self.accumulate_dtype
+            )
+        return self._assembly_loc_scale
+
+    @property
+    def a(self) -> np.ndarray:
+        a_var = self.model_vars.a_var
+        if self.compute_dtype is not None:
+            a_var = a_var.astype(self.compute_dtype)
+        return np.dot(self.constraints_loc, a_var)
+
+    @property
+    def b(self) -> np.ndarray:
+        b_var = self.model_vars.b_var
+        if self.compute_dtype is not None:
+            b_var = b_var.astype(self.compute_dtype)
+        return np.dot(self.constraints_scale, b_var)
+
+    @property
+    def eta_loc(self) -> np.ndarray:
+        return self._cached("eta_loc", None, lambda: super(ModelIwls, self).eta_loc)
+
+    @property
+    def eta_scale(self) -> np.ndarray:
+        return self._cached("eta_scale", None, lambda: super(ModelIwls, self).eta_scale)
+
+    @property
+    def location(self):
+        return self._cached("location", None, lambda: super(ModelIwls, self).location)
+
+    @property
+    def scale(self):
+        return self._cached("scale", None, lambda: super(ModelIwls, self).scale)
+
+    def eta_loc_j(self, j) -> np.ndarray:
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._cached("eta_loc", j, lambda: super(ModelIwls, self).eta_loc_j(j=j))
+
+    def eta_scale_j(self, j) -> np.ndarray:
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._cached("eta_scale", j, lambda: super(ModelIwls, self).eta_scale_j(j=j))
+
+    def location_j(self, j):
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._cached("location", j, lambda: super(ModelIwls, self).location_j(j=j))
+
+    def scale_j(self, j):
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._cached("scale", j, lambda: super(ModelIwls, self).scale_j(j=j))
 
     @property
     def converged(self):
@@ -34,15 +319,22 @@ class ModelIwls:
 
     @property
     def a_var(self):
-        return self.model_vars.a_var
+        # Copy so that callers cannot modify the parameters of training through the returned array,
+        # use model_vars.a_var for read access to the parameter buffer.
+        return self.model_vars.a_var.copy()
 
     @a_var.setter
     def a_var(self, value):
         self.model_vars.a_var = value
 
+    def a_var_j_setter(self, value, j):
+        self.model_vars.a_var_j_setter(value=value, j=j)
+
     @property
     def b_var(self):
-        return self.model_vars.b_var
+        # Copy so that callers cannot modify the parameters of training through the returned array,
+        # use model_vars.b_var for read access to the parameter buffer.
+        return self.model_vars.b_var.copy()
 
     @b_var.setter
     def b_var(self, value):
@@ -63,12 +355,46 @@ class ModelIwls:
     def ll_j(self, j) -> np.ndarray:
         pass
 
+    @abc.abstractmethod
+    def ll_b_fun(self):
+        """
+        Module level function of (x, eta_loc, b_var, xh_scale) that evaluates the log-likelihood on dense data as a
+        function of the scale model parameters. In contrast to ll_handle(), this can be sent to worker processes.
+        """
+        pass
+
+    @abc.abstractmethod
+    def fim_weight_aa_chunk(self, x, eta_loc, eta_scale) -> np.ndarray:
+        """
+        Location FIM weights of a chunk of observations, as a function of the chunk of count data and of the
+        linear predictors of the location and of the scale model, see streaming.py.
+
+        :return: observations in chunk x features
+        """
+        pass
+
+    @abc.abstractmethod
+    def ybar_chunk(self, x, eta_loc, eta_scale) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def ll_chunk(self, x, eta_loc, eta_scale) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def jac_weight_b_chunk(self, x, eta_loc, eta_scale) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def hessian_weight_bb_chunk(self, x, eta_loc, eta_scale) -> np.ndarray:
+        pass
+
     @property
     def ll_byfeature(self) -> np.ndarray:
-        return np.sum(self.ll, axis=0)
+        return np.sum(self.ll, axis=0, dtype=self.accumulate_dtype)
 
     def ll_byfeature_j(self, j) -> np.ndarray:
-        return np.sum(self.ll_j(j=j), axis=0)
+        return np.sum(self.ll_j(j=j), axis=0, dtype=self.accumulate_dtype)
 
     @abc.abstractmethod
     def fim_weight_aa(self) -> np.ndarray:
@@ -106,12 +432,7 @@ class ModelIwls:
         # design: (observations x observed param)
         # w: (observations x features)
         # fim: (features x inferred param x inferred param)
-        xh = np.matmul(self.design_loc, self.constraints_loc)
-        return np.einsum(
-            'fob,oc->fbc',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.assembly_loc.xtwx(w)
 
     @abc.abstractmethod
     def fim_ab(self) -> np.ndarray:
@@ -128,9 +449,19 @@ class ModelIwls:
 
         :return: (features x inferred param x inferred param)
         """
-        fim_aa = self.fim_aa
-        fim_bb = self.fim_bb
-        fim_ab = self.fim_ab
+        return self.fim_from_blocks(fim_aa=self.fim_aa, fim_ab=self.fim_ab, fim_bb=self.fim_bb)
+
+    def fim_from_blocks(self, fim_aa, fim_ab, fim_bb) -> np.ndarray:
+        """
+        Full FIM from its location-location, location-scale and scale-scale blocks.
+
+        Models without FIM of the scale model return empty location-scale and scale-scale blocks, the FIM then
+        only covers the location model.
+
+        :return: (features x inferred param x inferred param)
+        """
+        if fim_bb.shape[-1] == 0:
+            return - fim_aa
         fim_ba = np.transpose(fim_ab, axes=[0, 2, 1])
         return - np.concatenate([
             np.concatenate([fim_aa, fim_ab], axis=2),
@@ -148,12 +479,7 @@ class ModelIwls:
         :return: (features x inferred param x inferred param)
         """
         w = self.hessian_weight_aa
-        xh = np.matmul(self.design_loc, self.constraints_loc)
-        return np.einsum(
-            'fob,oc->fbc',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.assembly_loc.xtwx(w)
 
     @abc.abstractmethod
     def hessian_weight_ab(self) -> np.ndarray:
@@ -166,11 +492,7 @@ class ModelIwls:
         :return: (features x inferred param x inferred param)
         """
         w = self.hessian_weight_ab
-        return np.einsum(
-            'fob,oc->fbc',
-            np.einsum('ob,of->fob', np.matmul(self.design_loc, self.constraints_loc), w),
-            np.matmul(self.design_scale, self.constraints_scale)
-        )
+        return self.assembly_loc_scale.xtwx(w)
 
     @abc.abstractmethod
     def hessian_weight_bb(self) -> np.ndarray:
@@ -183,12 +505,7 @@ class ModelIwls:
         :return: (features x inferred param x inferred param)
         """
         w = self.hessian_weight_bb
-        xh = np.matmul(self.design_scale, self.constraints_scale)
-        return np.einsum(
-            'fob,oc->fbc',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.assembly_scale.xtwx(w)
 
     @property
     def hessian(self) -> np.ndarray:
@@ -217,12 +534,7 @@ class ModelIwls:
         """
         w = self.fim_weight_aa  # (observations x features)
         ybar = self.ybar  # (observations x features)
-        xh = np.matmul(self.design_loc, self.constraints_loc)  # (observations x inferred param)
-        return np.einsum(
-            'fob,of->fb',
-            np.einsum('ob,of->fob', xh, w),
-            ybar
-        )
+        return self.assembly_loc.xtw(w * ybar)
 
     def jac_a_j(self, j) -> np.ndarray:
         """
@@ -234,12 +546,7 @@ class ModelIwls:
             j = [j]
         w = self.fim_weight_aa_j(j=j)  # (observations x features)
         ybar = self.ybar_j(j=j)  # (observations x features)
-        xh = np.matmul(self.design_loc, self.constraints_loc)  # (observations x inferred param)
-        return np.einsum(
-            'fob,of->fb',
-            np.einsum('ob,of->fob', xh, w),
-            ybar
-        )
+        return self.assembly_loc.xtw(w * ybar)
 
     @property
     def jac_b(self) -> np.ndarray:
@@ -248,12 +555,7 @@ class ModelIwls:
         :return: (features x inferred param)
         """
         w = self.jac_weight_b  # (observations x features)
-        xh = np.matmul(self.design_scale, self.constraints_scale)  # (observations x inferred param)
-        return np.einsum(
-            'fob,of->fb',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.assembly_scale.xtw(w)
 
     def jac_b_j(self, j) -> np.ndarray:
         """
@@ -263,10 +565,5 @@ class ModelIwls:
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-            w = self.jac_weight_b_j(j=j)  # (observations x features)
-            xh = np.matmul(self.design_scale, self.constraints_scale)  # (observations x inferred param)
-            return np.einsum(
-                'fob,of->fb',
-                np.einsum('ob,of->fob', xh, w),
-                xh
-            )
+        w = self.jac_weight_b_j(j=j)  # (observations x features)
+        return self.assembly_scale.xtw(w)
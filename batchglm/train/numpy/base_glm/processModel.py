@@ -8,12 +8,23 @@ class ProcessModelGlm:
     def param_bounds(self, dtype):
         pass
 
+    def param_bounds_cached(self, dtype):
+        """
+        Parameter bounds by data type, only computed once per data type.
+        """
+        dtype = np.dtype(dtype)
+        if not hasattr(self, "_param_bounds_cache"):
+            self._param_bounds_cache = {}
+        if dtype not in self._param_bounds_cache.keys():
+            self._param_bounds_cache[dtype] = self.param_bounds(dtype)
+        return self._param_bounds_cache[dtype]
+
     def np_clip_param(
             self,
             param,
             name
     ):
-        bounds_min, bounds_max = self.param_bounds(param.dtype)
+        bounds_min, bounds_max = self.param_bounds_cached(param.dtype)
         return np.clip(
             param,
             bounds_min[name],
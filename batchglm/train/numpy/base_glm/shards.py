@@ -0,0 +1,82 @@
+"""
+Training of feature subsets (shards) of a GLM as independent tasks, see EstimatorGlm.train_sharded().
+
+The tasks only consist of numpy and scipy.sparse arrays and of classes so that they can be run in thread pools and
+in process pools alike.
+"""
+import dask
+import numpy as np
+import scipy.sparse
+import sparse
+
+
+def shard_data(x, idx: np.ndarray):
+    """
+    Count data of a feature subset as numpy array or scipy.sparse.csr_matrix.
+
+    :param x: Count data (observations x features).
+    :param idx: Features in shard.
+    """
+    x_shard = x[:, idx]
+    if not isinstance(x_shard, np.ndarray) and hasattr(x_shard, "compute"):
+        x_shard = x_shard.compute()
+    if isinstance(x_shard, sparse.COO):
+        x_shard = x_shard.tocsr()
+    elif isinstance(x_shard, scipy.sparse.spmatrix):
+        x_shard = x_shard.tocsr()
+    return x_shard
+
+
+def split_features(idx: np.ndarray, n_shards: int) -> list:
+    """
+    Split features into at most n_shards non-empty shards of similar size.
+    """
+    n_shards = max(min(n_shards, len(idx)), 1)
+    return [x for x in np.array_split(idx, n_shards) if len(x) > 0]
+
+
+def train_shard(
+        estimator_class,
+        input_data_class,
+        input_data_kwargs: dict,
+        estimator_kwargs: dict,
+        train_loc: bool,
+        train_scale: bool,
+        train_kwargs: dict
+):
+    """
+    Train the GLMs of one shard of features.
+
+    :param estimator_class: Estimator class of the sharded estimator.
+    :param input_data_class: Input data class of the sharded estimator.
+    :param input_data_kwargs: Arguments to input_data_class, including the count data of the shard.
+    :param estimator_kwargs: Arguments to estimator_class other than input_data, including the initialisation
+        of the shard.
+    :param train_loc: Whether location model is trained.
+    :param train_scale: Whether scale model is trained.
+    :param train_kwargs: Arguments to train().
+    :return: Tuple of
+
+        - location model parameters (inferred param x features)
+        - scale model parameters (inferred param x features)
+        - full convergence by feature (features)
+        - loss by feature (features)
+        - number of iterations run
+    """
+    # Parallelisation is across shards, dask graphs of one shard are evaluated in the worker thread or process.
+    # This also avoids that forked workers use the thread pool of the parent process.
+    with dask.config.set(scheduler="synchronous"):
+        estimator = estimator_class(
+            input_data=input_data_class(**input_data_kwargs),
+            **estimator_kwargs
+        )
+        estimator._train_loc = train_loc
+        estimator._train_scale = train_scale
+        estimator.train(**train_kwargs)
+        a_var = estimator.model.model_vars.a_var.copy()
+        b_var = estimator.model.model_vars.b_var.copy()
+        if len(estimator.lls) > 0:
+            ll = estimator.lls[-1]
+        else:
+            ll = - estimator.model.ll_byfeature.compute()
+    return a_var, b_var, estimator.fully_converged, ll, estimator.niter
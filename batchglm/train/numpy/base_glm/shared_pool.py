@@ -0,0 +1,267 @@
+"""
+Process pool for feature-wise scale model line searches on data in shared memory.
+
+The count data, the scale design and the scale model parameters are copied once into multiprocessing.shared_memory
+buffers that the worker processes attach to when they are started. The location model predictor of the features of
+one update is written to a buffer of its own for each update, which workers attach to on their first task of the
+update. Tasks are ranges of positions in the array of features to update and only consist of a few integers and the
+name of this buffer, results are written into a shared output array. Sparse count data are kept in compressed sparse
+column format and columns are densified in the workers.
+"""
+import logging
+import multiprocessing
+import multiprocessing.shared_memory
+import numpy as np
+import scipy.optimize
+import scipy.sparse
+import sparse
+import time
+
+logger = logging.getLogger("batchglm")
+
+# State of a worker process, set by _init_worker().
+_worker_state = {}
+
+
+class SharedArray:
+    """
+    Numpy array backed by a multiprocessing.shared_memory block.
+    """
+
+    def __init__(
+            self,
+            shape,
+            dtype,
+            name: str = None
+    ):
+        """
+
+        :param shape: Shape of array.
+        :param dtype: Data type of array.
+        :param name: Name of existing shared memory block to attach to, a new block is allocated if None.
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        if name is None:
+            self.shm = multiprocessing.shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = multiprocessing.shared_memory.SharedMemory(name=name)
+        self.array = np.ndarray(shape=self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def from_array(cls, array: np.ndarray):
+        shared = cls(shape=array.shape, dtype=array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @property
+    def spec(self):
+        """
+        Arguments to attach to this block in another process.
+        """
+        return self.shape, self.dtype.str, self.shm.name
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _init_worker(specs, ll_fun, ll_bounds, b_bounds):
+    _worker_state["arrays"] = dict([
+        (k, SharedArray(shape=shape, dtype=dtype, name=name))
+        for k, (shape, dtype, name) in specs.items()
+    ])
+    _worker_state["ll_fun"] = ll_fun
+    _worker_state["ll_bounds"] = ll_bounds
+    _worker_state["b_bounds"] = b_bounds
+
+
+def _attach_eta_loc(spec):
+    """
+    Attach to the location model predictor buffer of the current update, the buffer of the previous update is
+    released.
+    """
+    shape, dtype, name = spec
+    eta_loc = _worker_state.get("eta_loc", None)
+    if eta_loc is None or eta_loc.shm.name != name:
+        if eta_loc is not None:
+            eta_loc.close()
+        eta_loc = SharedArray(shape=shape, dtype=dtype, name=name)
+        _worker_state["eta_loc"] = eta_loc
+    return eta_loc.array
+
+
+def _data_j(arrays, j):
+    if "x" in arrays.keys():
+        return arrays["x"].array[:, [j]].astype(np.float64)
+    else:
+        indptr = arrays["x_indptr"].array
+        data_j = np.zeros([arrays["xh_scale"].shape[0], 1])
+        data_j[arrays["x_indices"].array[indptr[j]:indptr[j + 1]], 0] = \
+            arrays["x_data"].array[indptr[j]:indptr[j + 1]]
+        return data_j
+
+
+def _fit_b_range(start, stop, max_iter, ftol, eta_loc_spec):
+    """
+    Run brent line searches for the scale models of the features at positions start to stop in the update index.
+
+    :param eta_loc_spec: SharedArray.spec of the location model predictor of the features in the update index.
+    :return: Number of fitted features.
+    """
+    arrays = _worker_state["arrays"]
+    eta_loc = _attach_eta_loc(eta_loc_spec)
+    ll_fun = _worker_state["ll_fun"]
+    lb_ll, ub_ll = _worker_state["ll_bounds"]
+    lb_b, ub_b = _worker_state["b_bounds"]
+    xh_scale = arrays["xh_scale"].array
+    for i in range(start, stop):
+        j = arrays["idx_update"].array[i]
+        data_j = _data_j(arrays=arrays, j=j)
+        eta_loc_j = eta_loc[:, [i]]
+        b_j = arrays["b_var"].array[0, j]
+
+        def cost_b_var(x):
+            x = np.clip(np.array([[x]]), lb_b, ub_b)
+            return - np.sum(np.clip(ll_fun(data_j, eta_loc_j, x, xh_scale), lb_ll, ub_ll))
+
+        arrays["b_out"].array[j] = scipy.optimize.brent(
+            func=cost_b_var,
+            maxiter=max_iter,
+            tol=ftol,
+            brack=(np.max([lb_b, b_j - 20]), np.min([ub_b, b_j + 20])),
+            full_output=False
+        )
+    return stop - start
+
+
+def _fit_b_range_star(args):
+    return _fit_b_range(*args)
+
+
+class ScaleModelPool:
+    """
+    Persistent process pool for brent line searches of the scale model of each feature.
+
+    The pool is meant to be kept alive across the scale model updates of one training run: The count data and the
+    scale design are only shared once, before each update only the location model predictor of the updated features
+    and the current scale model parameters are written to shared memory.
+    """
+
+    def __init__(
+            self,
+            x,
+            xh_scale: np.ndarray,
+            ll_fun,
+            ll_bounds,
+            b_bounds,
+            nproc: int
+    ):
+        """
+
+        :param x: Count data (observations x features), dense numpy array, scipy.sparse matrix or sparse.COO.
+        :param xh_scale: Scale design matrix in the space of inferred parameters (observations x inferred param).
+        :param ll_fun: Module level function of (x, eta_loc, b_var, xh_scale) that evaluates the log-likelihood
+            as a function of the scale model parameters, see ModelIwls.ll_b_fun().
+        :param ll_bounds: Tuple of lower and upper clipping bound of the log-likelihood.
+        :param b_bounds: Tuple of lower and upper bound of the scale model parameters.
+        :param nproc: Number of worker processes.
+        """
+        self.nproc = nproc
+        self.n_obs, self.n_features = x.shape
+        self.arrays = {}
+        try:
+            if isinstance(x, sparse.COO) or isinstance(x, scipy.sparse.spmatrix):
+                x = x.tocsc()
+                x.sum_duplicates()
+                self.arrays["x_data"] = SharedArray.from_array(x.data)
+                self.arrays["x_indices"] = SharedArray.from_array(x.indices)
+                self.arrays["x_indptr"] = SharedArray.from_array(x.indptr)
+            else:
+                self.arrays["x"] = SharedArray.from_array(np.asarray(x))
+            self.arrays["xh_scale"] = SharedArray.from_array(np.asarray(xh_scale, dtype=np.float64))
+            self.arrays["b_var"] = SharedArray(shape=[1, self.n_features], dtype=np.float64)
+            self.arrays["idx_update"] = SharedArray(shape=[self.n_features], dtype=np.int64)
+            self.arrays["b_out"] = SharedArray(shape=[self.n_features], dtype=np.float64)
+            self.pool = multiprocessing.Pool(
+                processes=nproc,
+                initializer=_init_worker,
+                initargs=(
+                    dict([(k, v.spec) for k, v in self.arrays.items()]),
+                    ll_fun,
+                    tuple(ll_bounds),
+                    tuple(b_bounds)
+                )
+            )
+        except Exception:
+            self._free()
+            raise
+
+    def fit(
+            self,
+            idx_update: np.ndarray,
+            eta_loc_j: np.ndarray,
+            b_var: np.ndarray,
+            max_iter: int,
+            ftol: float,
+            progress=None
+    ) -> np.ndarray:
+        """
+        Run brent line searches for the scale models of the features in idx_update.
+
+        :param idx_update: Features to fit.
+        :param eta_loc_j: Location model predictor of the features in idx_update (observations x features in
+            idx_update), it is written to a shared memory block that is released after the update.
+        :param b_var: Current scale model parameters (1 x features), used to bracket line searches.
+        :param progress: Function that is called with the keyword arguments n_done, n_total and seconds each time
+            a task finished.
+        :return: Optimal scale model parameters of features in idx_update.
+        """
+        n_update = len(idx_update)
+        eta_loc = SharedArray.from_array(np.asarray(eta_loc_j, dtype=np.float64))
+        try:
+            self.arrays["b_var"].array[...] = b_var
+            self.arrays["idx_update"].array[:n_update] = idx_update
+            # Use more tasks than processes so that workers are balanced and progress can be reported.
+            chunk_size = max(int(np.ceil(n_update / (4 * self.nproc))), 1)
+            tasks = [
+                (i, min(i + chunk_size, n_update), max_iter, ftol, eta_loc.spec)
+                for i in range(0, n_update, chunk_size)
+            ]
+            t0 = time.time()
+            n_done = 0
+            for n in self.pool.imap_unordered(_fit_b_range_star, tasks):
+                n_done += n
+                if progress is not None:
+                    progress(n_done=n_done, n_total=n_update, seconds=time.time() - t0)
+        finally:
+            # Workers keep their mapping until they attach to the block of the next update.
+            eta_loc.close()
+            eta_loc.unlink()
+        return self.arrays["b_out"].array[idx_update].copy()
+
+    def _free(self):
+        for v in self.arrays.values():
+            v.close()
+            v.unlink()
+        self.arrays = {}
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self._free()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.pool.terminate()
+            self.pool.join()
+            self._free()
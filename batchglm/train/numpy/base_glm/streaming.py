@@ -0,0 +1,187 @@
+"""
+Out-of-core evaluation of the IRLS systems, scores and losses by streaming over chunks of observations.
+
+All quantities that the numpy backend needs during training are sums over observations. Instead of materializing
+(observations x features) arrays of weights and likelihoods, the count data and the design are read chunk by chunk
+and the contributions of each chunk are accumulated into (features x inferred param x inferred param),
+(features x inferred param) and (features) arrays. Peak memory is therefore bounded by the chunk size.
+"""
+import dask.array
+import numpy as np
+from typing import Tuple
+
+from .assembly import build_assembly
+
+
+def _compute(x):
+    return x.compute() if isinstance(x, dask.array.core.Array) else x
+
+
+class StreamingIwls:
+    """
+    Accumulation of the sufficient statistics of the numpy backend over chunks of observations.
+
+    Count data are only read chunk by chunk and are not kept. The design matrices in the space of inferred
+    parameters are small (observations x inferred param) and are computed once.
+    """
+
+    chunk_size_cells: int
+    obs_start: int
+    xh_loc: np.ndarray
+    xh_scale: np.ndarray
+    size_factors: np.ndarray
+
+    def __init__(
+            self,
+            model,
+            chunk_size_cells: int,
+            obs_start: int = 0
+    ):
+        """
+
+        :param model: ModelIwls instance.
+        :param chunk_size_cells: Number of observations per chunk.
+        :param obs_start: First observation that is read, all sums only run over observations obs_start and later.
+        """
+        self.model = model
+        self.chunk_size_cells = int(chunk_size_cells)
+        self.obs_start = int(obs_start)
+        self.xh_loc = np.asarray(_compute(model.xh_loc))
+        self.xh_scale = np.asarray(_compute(model.xh_scale))
+        size_factors = model.size_factors
+        self.size_factors = None if size_factors is None else np.asarray(_compute(size_factors))
+        self.assembly_loc = build_assembly(xh_a=self.xh_loc, dtype=model.accumulate_dtype)
+        self.assembly_scale = build_assembly(xh_a=self.xh_scale, dtype=model.accumulate_dtype)
+
+    @property
+    def n_obs(self) -> int:
+        return self.xh_loc.shape[0]
+
+    def chunks(self):
+        """
+        Slices of observations of all chunks.
+        """
+        for start in range(self.obs_start, self.n_obs, self.chunk_size_cells):
+            yield slice(start, min(start + self.chunk_size_cells, self.n_obs))
+
+    def read_chunk(self, s, idx, a_var=None, b_var=None):
+        """
+        Read count data and evaluate linear predictors of the features idx on the chunk of observations s.
+
+        :param a_var: Location model parameters of features idx (inferred param x features),
+            current parameters if None.
+        :param b_var: Scale model parameters of features idx (inferred param x features),
+            current parameters if None.
+        :return: Tuple of count data, eta_loc and eta_scale (observations in chunk x features)
+        """
+        if a_var is None:
+            a_var = self.model.model_vars.a_var[:, idx]
+        if b_var is None:
+            b_var = self.model.model_vars.b_var[:, idx]
+        if self.model.compute_dtype is not None:
+            a_var = a_var.astype(self.model.compute_dtype)
+            b_var = b_var.astype(self.model.compute_dtype)
+        x = _compute(self.model.x[s][:, idx])
+        eta_loc = np.matmul(self.xh_loc[s], a_var)
+        if self.size_factors is not None:
+            eta_loc = eta_loc + self.size_factors[s]
+        eta_loc = self.model.np_clip_param(eta_loc, "eta_loc")
+        eta_scale = self.model.np_clip_param(np.matmul(self.xh_scale[s], b_var), "eta_scale")
+        return x, eta_loc, eta_scale
+
+    def ll_byfeature(self, idx, b_var=None) -> np.ndarray:
+        """
+        Log-likelihood of the features idx.
+
+        :param b_var: Scale model parameters of features idx (inferred param x features),
+            current parameters if None.
+        :return: (features)
+        """
+        ll = np.zeros([len(idx)], dtype=self.model.model_vars.a_var.dtype)
+        for s in self.chunks():
+            x, eta_loc, eta_scale = self.read_chunk(s=s, idx=idx, b_var=b_var)
+            ll += np.sum(
+                self.model.ll_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale),
+                axis=0,
+                dtype=self.model.accumulate_dtype
+            )
+        return ll
+
+    def iwls_system(self, idx) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        IRLS system of the location model of the features idx, see EstimatorGlm.iwls_step().
+
+        :return: Tuple of
+
+            - a=X^T*W*X: (features x inferred param x inferred param)
+            - b=X^T*W*Ybar: (features x inferred param)
+        """
+        n_par = self.xh_loc.shape[1]
+        a = np.zeros([len(idx), n_par, n_par], dtype=self.model.model_vars.a_var.dtype)
+        b = np.zeros([len(idx), n_par], dtype=self.model.model_vars.a_var.dtype)
+        for s in self.chunks():
+            x, eta_loc, eta_scale = self.read_chunk(s=s, idx=idx)
+            w = self.model.fim_weight_aa_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+            ybar = self.model.ybar_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+            assembly = self.assembly_loc.subset(s)
+            a += assembly.xtwx(w)
+            b += assembly.xtw(w * ybar)
+        return a, b
+
+    def scale_score(self, idx, b_var=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score and diagonal of the hessian of the scale model of the features idx.
+
+        :param b_var: Scale model parameters of features idx (inferred param x features),
+            current parameters if None.
+        :return: Tuple of score (features x inferred param) and hessian diagonal (features x inferred param).
+        """
+        n_par = self.xh_scale.shape[1]
+        jac = np.zeros([len(idx), n_par], dtype=self.model.model_vars.b_var.dtype)
+        hessian = np.zeros([len(idx), n_par], dtype=self.model.model_vars.b_var.dtype)
+        for s in self.chunks():
+            x, eta_loc, eta_scale = self.read_chunk(s=s, idx=idx, b_var=b_var)
+            jac += self.assembly_scale.subset(s).xtw(
+                self.model.jac_weight_b_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+            )
+            hessian += np.matmul(
+                self.model.hessian_weight_bb_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale).T,
+                np.square(self.xh_scale[s]),
+                dtype=hessian.dtype
+            )
+        return jac, hessian
+
+    def finalize_stats(self, idx) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Location FIM block, scores and log-likelihood of the features idx in one pass over the data.
+
+        :return: Tuple of
+
+            - fim_aa: (features x inferred param x inferred param)
+            - jac_a: (features x inferred loc param)
+            - jac_b: (features x inferred scale param)
+            - ll: (features)
+        """
+        n_par_a = self.xh_loc.shape[1]
+        n_par_b = self.xh_scale.shape[1]
+        dtype = self.model.model_vars.a_var.dtype
+        fim_aa = np.zeros([len(idx), n_par_a, n_par_a], dtype=dtype)
+        jac_a = np.zeros([len(idx), n_par_a], dtype=dtype)
+        jac_b = np.zeros([len(idx), n_par_b], dtype=dtype)
+        ll = np.zeros([len(idx)], dtype=dtype)
+        for s in self.chunks():
+            x, eta_loc, eta_scale = self.read_chunk(s=s, idx=idx)
+            w = self.model.fim_weight_aa_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+            ybar = self.model.ybar_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+            assembly_loc = self.assembly_loc.subset(s)
+            fim_aa += assembly_loc.xtwx(w)
+            jac_a += assembly_loc.xtw(w * ybar)
+            jac_b += self.assembly_scale.subset(s).xtw(
+                self.model.jac_weight_b_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale)
+            )
+            ll += np.sum(
+                self.model.ll_chunk(x=x, eta_loc=eta_loc, eta_scale=eta_scale),
+                axis=0,
+                dtype=self.model.accumulate_dtype
+            )
+        return fim_aa, jac_a, jac_b, ll
@@ -0,0 +1,161 @@
+import abc
+import collections
+import contextlib
+import json
+import logging
+import numpy as np
+import time
+from typing import Callable, List
+
+logger = logging.getLogger("batchglm")
+
+
+def _to_json(x):
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    raise TypeError("object of type %s is not JSON serializable" % type(x))
+
+
+class TelemetrySink(abc.ABC):
+    """
+    Receiver of training events, see Telemetry.
+    """
+
+    @abc.abstractmethod
+    def emit(self, event: dict):
+        pass
+
+    def close(self):
+        pass
+
+
+class CallbackSink(TelemetrySink):
+    """
+    Passes each event to a function.
+    """
+
+    def __init__(self, fn: Callable[[dict], None]):
+        self.fn = fn
+
+    def emit(self, event: dict):
+        self.fn(event)
+
+
+class JsonLinesSink(TelemetrySink):
+    """
+    Appends each event as one JSON object per line to a file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "a")
+
+    def emit(self, event: dict):
+        self._f.write(json.dumps(event, default=_to_json) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class LoggingSink(TelemetrySink):
+    """
+    Writes each event as one message to a logger.
+
+    Progress events, which are emitted many times within an iteration, are written at progress_level.
+    """
+
+    def __init__(
+            self,
+            logger_name: str = "batchglm",
+            level: int = logging.INFO,
+            progress_level: int = logging.DEBUG
+    ):
+        self.logger = logging.getLogger(logger_name)
+        self.level = level
+        self.progress_level = progress_level
+
+    def emit(self, event: dict):
+        level = self.progress_level if event["event"].endswith("_progress") else self.level
+        if self.logger.isEnabledFor(level):
+            self.logger.log(
+                level,
+                "%s: %s" % (
+                    event["event"],
+                    ", ".join(["%s=%s" % (k, v) for k, v in event.items() if k not in ["event", "time"]])
+                )
+            )
+
+
+class Telemetry:
+    """
+    Structured training events of an estimator.
+
+    Events are dictionaries with the name of the event under "event", the wall clock time under "time" and
+    event-specific fields. Each event is passed to all sinks and kept in a ring buffer of the most recent events.
+    Progress events, with names that end with "_progress", are not kept so that they do not displace iterations.
+    Durations of parts of an iteration are accumulated with timer() and are attached to the next event that is
+    emitted with pop_timings().
+    """
+
+    sinks: List[TelemetrySink]
+    events: collections.deque
+
+    def __init__(
+            self,
+            sinks: List[TelemetrySink] = None,
+            buffer_size: int = 1000
+    ):
+        """
+
+        :param sinks: Receivers of events, a LoggingSink of the "batchglm" logger if None.
+        :param buffer_size: Number of the most recent events that are kept in events.
+        """
+        self.sinks = list(sinks) if sinks is not None else [LoggingSink()]
+        self.events = collections.deque(maxlen=buffer_size)
+        self._timings = {}
+
+    def add_sink(self, sink: TelemetrySink):
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink: TelemetrySink):
+        self.sinks.remove(sink)
+
+    def emit(self, event: str, **fields):
+        """
+        Record an event and pass it to all sinks.
+
+        :param event: Name of the event.
+        :param fields: Fields of the event, should be JSON serializable or numpy scalars and arrays.
+        """
+        record = {"event": event, "time": time.time()}
+        record.update(fields)
+        if not event.endswith("_progress"):
+            self.events.append(record)
+        for sink in self.sinks:
+            sink.emit(record)
+
+    @contextlib.contextmanager
+    def timer(self, name: str):
+        """
+        Accumulate the duration of the enclosed block in seconds under name, see pop_timings().
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._timings[name] = self._timings.get(name, 0.) + time.perf_counter() - t0
+
+    def pop_timings(self) -> dict:
+        """
+        Durations accumulated since the last call.
+        """
+        timings = self._timings
+        self._timings = {}
+        return timings
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
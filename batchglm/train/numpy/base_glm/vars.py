@@ -1,6 +1,5 @@
 import dask.array
 import numpy as np
-import scipy.sparse
 import abc
 
 
@@ -8,6 +7,8 @@ class ModelVarsGlm:
     """
     Build variables to be optimzed and their constraints.
 
+    All parameters are kept in one preallocated, contiguous numpy array (params). a_var and b_var are views into
+    the location and scale model rows of this array and are written in place.
     """
 
     constraints_loc: np.ndarray
@@ -16,6 +17,7 @@ class ModelVarsGlm:
     a_var: np.ndarray
     b_var: np.ndarray
     converged: np.ndarray
+    version: int
     npar_a: int
     dtype: str
     n_features: int
@@ -40,73 +42,66 @@ class ModelVarsGlm:
         self.constraints_loc = np.asarray(constraints_loc, dtype)
         self.constraints_scale = np.asarray(constraints_scale, dtype)
 
-        init_a_clipped = self.np_clip_param(np.asarray(init_a, dtype=dtype), "a_var")
-        init_b_clipped = self.np_clip_param(np.asarray(init_b, dtype=dtype), "b_var")
-        self.params = dask.array.from_array(np.concatenate(
-            [
-                init_a_clipped,
-                init_b_clipped,
-            ],
-            axis=0
-        ), chunks=(1000, chunk_size_genes))
-        self.npar_a = init_a_clipped.shape[0]
+        self.dtype = dtype
+        self.npar_a = init_a.shape[0]
+        self.n_features = init_a.shape[1]
+        self.params = np.empty([init_a.shape[0] + init_b.shape[0], self.n_features], dtype=dtype, order="C")
+        self._write(self.params[0:self.npar_a], init_a, "a_var")
+        self._write(self.params[self.npar_a:], init_b, "b_var")
+        # Counter of parameter updates, used to invalidate caches of quantities that depend on the parameters.
+        self.version = 0
 
         # Properties to follow gene-wise convergence.
-        self.converged = np.repeat(a=False, repeats=self.params.shape[1])  # Initialise to non-converged.
+        self.converged = np.repeat(a=False, repeats=self.n_features)  # Initialise to non-converged.
 
-        self.dtype = dtype
-        self.n_features = self.params.shape[1]
         self.idx_train_loc = np.arange(0, init_a.shape[0])
         self.idx_train_scale = np.arange(init_a.shape[0], init_a.shape[0] + init_b.shape[0])
 
+    def _write(self, out, value, name):
+        """
+        Clip value to the bounds of parameter name and write it into the view out of params.
+        """
+        if isinstance(value, dask.array.core.Array):
+            value = value.compute()
+        bounds_min, bounds_max = self.param_bounds_cached(self.params.dtype)
+        np.clip(np.asarray(value, dtype=self.params.dtype), bounds_min[name], bounds_max[name], out=out)
+
     @property
     def idx_not_converged(self):
         return np.where(np.logical_not(self.converged))[0]
 
     @property
     def a_var(self):
-        a_var = self.params[0:self.npar_a]
-        return self.np_clip_param(a_var, "a_var")
+        return self.params[0:self.npar_a]
 
     @a_var.setter
     def a_var(self, value):
-        # Threshold new entry:
-        value = self.np_clip_param(value, "a_var")
-        # Write either new dask array or into numpy array:
-        if isinstance(self.params, dask.array.core.Array):
-            temp = self.params.compute()
-            temp[0:self.npar_a] = value
-            self.params = dask.array.from_array(temp, chunks=self.params.chunksize)
-        else:
-            self.params[0:self.npar_a] = value
+        self._write(self.params[0:self.npar_a], value, "a_var")
+        self.version += 1
+
+    def a_var_j_setter(self, value, j):
+        """
+        Write location model parameters of features j, which can be an index array or a boolean mask over features.
+        """
+        # Rows and columns have to be indexed separately so that the write goes into params and not into a copy.
+        a_var = self.params[0:self.npar_a]
+        a_var[:, j] = self.np_clip_param(np.asarray(value, dtype=self.params.dtype), "a_var")
+        self.version += 1
 
     @property
     def b_var(self):
-        b_var = self.params[self.npar_a:]
-        return self.np_clip_param(b_var, "b_var")
+        return self.params[self.npar_a:]
 
     @b_var.setter
     def b_var(self, value):
-        # Threshold new entry:
-        value = self.np_clip_param(value, "b_var")
-        # Write either new dask array or into numpy array:
-        if isinstance(self.params, dask.array.core.Array):
-            temp = self.params.compute()
-            temp[self.npar_a:] = value
-            self.params = dask.array.from_array(temp, chunks=self.params.chunksize)
-        else:
-            self.params[self.npar_a:] = value
+        self._write(self.params[self.npar_a:], value, "b_var")
+        self.version += 1
 
     def b_var_j_setter(self, value, j):
-        # Threshold new entry:
-        value = self.np_clip_param(value, "b_var")
-        # Write either new dask array or into numpy array:
-        if isinstance(self.params, dask.array.core.Array):
-            temp = self.params.compute()
-            temp[self.npar_a:, j] = value
-            self.params = dask.array.from_array(temp, chunks=self.params.chunksize)
-        else:
-            self.params[self.npar_a:, j] = value
+        # Rows and columns have to be indexed separately so that the write goes into params and not into a copy.
+        b_var = self.params[self.npar_a:]
+        b_var[:, j] = self.np_clip_param(np.asarray(value, dtype=self.params.dtype), "b_var")
+        self.version += 1
 
     @abc.abstractmethod
     def param_bounds(self, dtype):
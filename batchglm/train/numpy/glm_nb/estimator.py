@@ -1,6 +1,5 @@
 from typing import Tuple, Union
 import numpy as np
-import sys
 
 from .external import InputDataGLM, Model, EstimatorGlm
 from .external import init_par
@@ -24,6 +23,8 @@ class Estimator(EstimatorGlm):
             batch_size: Union[None, Tuple[int, int]] = None,
             quick_scale: bool = False,
             dtype="float64",
+            compute_dtype=None,
+            init_model=None,
             **kwargs
     ):
         """
@@ -54,20 +55,26 @@ class Estimator(EstimatorGlm):
         :param quick_scale: bool
             Whether `scale` will be fitted faster and maybe less accurate.
             Useful in scenarios where fitting the exact `scale` is not absolutely necessary.
-        :param dtype: Numerical precision.
+        :param dtype: Numerical precision of the parameters and of reductions over observations.
+        :param compute_dtype: Numerical precision of observation-level quantities (eta, location, scale, weights and
+            log-likelihood terms), same as dtype if None. Use "float32" with dtype="float64" for mixed precision
+            training. Designs are cast to compute_dtype. The count data should then also be float32, e.g. via
+            InputDataGLM(cast_dtype="float32"), or a compact integer type such as uint16, as numpy promotes mixed
+            operations to the larger data type.
+        :param init_model: (Optional) Previous fit to warm-start from, e.g. a trained Estimator of the same features.
+            Parameters are matched by the names of the location and scale model parameters, parameters without a
+            match are initialised as zero. Used if init_a or init_b are "auto" or "init_model".
         """
         init_a, init_b, train_loc, train_scale = init_par(
             input_data=input_data,
             init_a=init_a,
             init_b=init_b,
-            init_model=None
+            init_model=init_model
         )
         self._train_loc = train_loc
         self._train_scale = train_scale
         if quick_scale:
             self._train_scale = False
-        sys.stdout.write("training location model: %s\n" % str(self._train_loc))
-        sys.stdout.write("training scale model: %s\n" % str(self._train_scale))
         init_a = init_a.astype(dtype)
         init_b = init_b.astype(dtype)
 
@@ -84,13 +91,15 @@ class Estimator(EstimatorGlm):
             model_vars=self.model_vars,
             compute_mu=self._train_loc,
             compute_r=not self._train_scale,
-            dtype=dtype
+            dtype=dtype,
+            compute_dtype=compute_dtype
         )
         super(Estimator, self).__init__(
             input_data=input_data,
             model=model,
             dtype=dtype
         )
+        self.telemetry.emit("init", train_loc=self._train_loc, train_scale=self._train_scale)
 
     def get_model_container(
             self,
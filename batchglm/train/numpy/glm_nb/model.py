@@ -1,16 +1,39 @@
 import dask.array
 import logging
 import numpy as np
-import scipy.sparse
 import scipy.special
-import sparse
 
 from .external import Model, ModelIwls, InputDataGLM
 from .processModel import ProcessModel
+from . import sparse_kernels
 
 logger = logging.getLogger(__name__)
 
 
+def ll_b(x, eta_loc, b_var, xh_scale):
+    """
+    Log-likelihood as a function of the scale model parameters on dense data, without clipping.
+
+    This is a module level function so that it can be sent to worker processes.
+
+    :return: observations x features
+    """
+    eta_scale = np.matmul(xh_scale, b_var)
+    scale = np.exp(eta_scale)
+    loc = np.exp(eta_loc)
+    log_r_plus_mu = np.log(scale + loc)
+    if isinstance(x, np.ndarray) or isinstance(x, dask.array.core.Array):
+        # dense numpy or dask
+        ll = scipy.special.gammaln(scale + x) - \
+             scipy.special.gammaln(x + np.ones_like(scale)) - \
+             scipy.special.gammaln(scale) + \
+             x * (eta_loc - log_r_plus_mu) + \
+             np.multiply(scale, eta_scale - log_r_plus_mu)
+    else:
+        raise ValueError("type x %s not supported" % type(x))
+    return ll
+
+
 class ModelIwlsNb(ModelIwls, Model, ProcessModel):
 
     compute_mu: bool
@@ -23,6 +46,7 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
             compute_mu,
             compute_r,
             dtype,
+            compute_dtype=None
     ):
         self.compute_mu = compute_mu
         self.compute_r = compute_r
@@ -32,7 +56,8 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         )
         ModelIwls.__init__(
             self=self,
-            model_vars=model_vars
+            model_vars=model_vars,
+            compute_dtype=compute_dtype
         )
 
     @property
@@ -43,13 +68,48 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         """
         return - self.location * self.scale / (self.scale + self.location)
 
+    @property
+    def x_is_sparse(self) -> bool:
+        """
+        Whether the count data are stored as sparse matrix, either directly or in the chunks of a dask array.
+        """
+        if isinstance(self.x, dask.array.core.Array):
+            return sparse_kernels.is_sparse(self.x._meta)
+        else:
+            return sparse_kernels.is_sparse(self.x)
+
+    def _apply_sparse_kernel(self, kernel, x, *args):
+        """
+        Evaluate a kernel from sparse_kernels on sparse count data.
+
+        Kernels are applied block-wise if x is a dask array.
+
+        :param kernel: Function of x and dense arrays of the same shape as x.
+        :param x: Count data (observations x features)
+        :param args: Dense model quantities (observations x features)
+        :return: observations x features
+        """
+        if isinstance(x, dask.array.core.Array):
+            # Blocks of the model quantities have to match the blocks of x, which can differ after slicing.
+            args = [y.rechunk(x.chunks) if isinstance(y, dask.array.core.Array) else y for y in args]
+            return dask.array.map_blocks(kernel, x, *args, dtype=args[0].dtype)
+        else:
+            args = [y.compute() if isinstance(y, dask.array.core.Array) else y for y in args]
+            return kernel(x, *args)
+
+    def _ybar(self, x, loc):
+        if self.x_is_sparse:
+            return self._apply_sparse_kernel(sparse_kernels.ybar, x, loc)
+        else:
+            return (x - loc) / loc
+
     @property
     def ybar(self) -> np.ndarray:
         """
 
         :return: observations x features
         """
-        return np.asarray(self.x - self.location) / self.location
+        return self._ybar(x=self.x, loc=self.location)
 
     def fim_weight_aa_j(self, j):
         """
@@ -66,23 +126,12 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-        if isinstance(self.x, np.ndarray) or isinstance(self.x, dask.array.core.Array):
-            return (self.x[:, j] - self.location_j(j=j)) / self.location_j(j=j)
-        else:
-            return np.asarray(self.x[:, j] - self.location_j(j=j)) / self.location_j(j=j)
-
-    @property
-    def jac_weight_b(self):
-        """
+        return self._ybar(x=self.x_j(j=j), loc=self.location_j(j=j))
 
-        :return: observations x features
-        """
-        scale = self.scale
-        loc = self.location
-        if isinstance(self.x, scipy.sparse.csr_matrix):
-            scale_plus_x = np.asarray(scale + self.x)
-        else:
-            scale_plus_x = scale + self.x
+    def _jac_weight_b(self, x, scale, loc):
+        if self.x_is_sparse:
+            return self._apply_sparse_kernel(sparse_kernels.jac_weight_b, x, scale, loc)
+        scale_plus_x = scale + x
         r_plus_mu = scale + loc
 
         # Define graphs for individual terms of constant term of hessian:
@@ -91,6 +140,14 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         const3 = np.log(scale) + np.ones_like(scale) - np.log(r_plus_mu)
         return scale * (const1 + const2 + const3)
 
+    @property
+    def jac_weight_b(self):
+        """
+
+        :return: observations x features
+        """
+        return self._jac_weight_b(x=self.x, scale=self.scale, loc=self.location)
+
     def jac_weight_b_j(self, j):
         """
 
@@ -99,19 +156,7 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-        scale = self.scale_j(j=j)
-        loc = self.location_j(j=j)
-        if isinstance(self.x, scipy.sparse.csr_matrix):
-            scale_plus_x = np.asarray(scale + self.x[:, j])
-        else:
-            scale_plus_x = scale + self.x[:, j]
-        r_plus_mu = scale + loc
-
-        # Define graphs for individual terms of constant term of hessian:
-        const1 = scipy.special.digamma(scale_plus_x) - scipy.special.digamma(scale)
-        const2 = - scale_plus_x / r_plus_mu
-        const3 = np.log(scale) + np.ones_like(scale) - np.log(r_plus_mu)
-        return scale * (const1 + const2 + const3)
+        return self._jac_weight_b(x=self.x_j(j=j), scale=self.scale_j(j=j), loc=self.location_j(j=j))
 
     @property
     def fim_ab(self) -> np.ndarray:
@@ -127,7 +172,7 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
 
         :return: (features x inferred param x inferred param)
         """
-        return np.zeros([self.b_var.shape[1], 0, 0])
+        return np.zeros([self.model_vars.b_var.shape[1], 0, 0])
 
     @property
     def fim_bb(self) -> np.ndarray:
@@ -143,108 +188,127 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
 
         :return: (features x inferred param x inferred param)
         """
-        return np.zeros([self.b_var.shape[1], 0, 0])
+        return np.zeros([self.model_vars.b_var.shape[1], 0, 0])
 
     @property
     def hessian_weight_ab(self):
         scale = self.scale
         loc = self.location
+        if self.x_is_sparse:
+            return self._apply_sparse_kernel(sparse_kernels.hessian_weight_ab, self.x, scale, loc)
         return np.multiply(
             loc * scale,
-            np.asarray(self.x - loc) / np.square(loc + scale)
+            (self.x - loc) / np.square(loc + scale)
         )
 
     @property
     def hessian_weight_aa(self):
         scale = self.scale
         loc = self.location
-        if isinstance(self.x, np.ndarray) or isinstance(self.x, dask.array.core.Array):
-            x_by_scale_plus_one = self.x / scale + np.ones_like(scale)
-        else:
-            x_by_scale_plus_one = np.asarray(self.x.divide(scale) + np.ones_like(scale))
-
+        if self.x_is_sparse:
+            return self._apply_sparse_kernel(sparse_kernels.hessian_weight_aa, self.x, scale, loc)
+        x_by_scale_plus_one = self.x / scale + np.ones_like(scale)
         return - loc * x_by_scale_plus_one / np.square((loc / scale) + np.ones_like(loc))
 
-    @property
-    def hessian_weight_bb(self):
-        scale = self.scale
-        loc = self.location
-        scale_plus_x = np.asarray(self.x + scale)
+    def _hessian_weight_bb(self, x, scale, loc):
+        if self.x_is_sparse:
+            return self._apply_sparse_kernel(sparse_kernels.hessian_weight_bb, x, scale, loc)
+        scale_plus_x = x + scale
         scale_plus_loc = scale + loc
         # Define graphs for individual terms of constant term of hessian:
         const1 = scipy.special.digamma(scale_plus_x) + scale * scipy.special.polygamma(n=1, x=scale_plus_x)
-        const2 = - scipy.special.digamma(scale) + scale * scipy.special.polygamma(n=1, x=scale)
-        const3 = - loc * scale_plus_x + np.ones_like(scale) * 2. * scale * scale_plus_loc / np.square(scale_plus_loc)
+        const2 = - scipy.special.digamma(scale) - scale * scipy.special.polygamma(n=1, x=scale)
+        const3 = - (loc * scale_plus_x + np.ones_like(scale) * 2. * scale * scale_plus_loc) / np.square(scale_plus_loc)
         const4 = np.log(scale) + np.ones_like(scale) * 2. - np.log(scale_plus_loc)
         return scale * (const1 + const2 + const3 + const4)
 
     @property
-    def ll(self):
-        scale = self.scale
-        loc = self.location
-        log_r_plus_mu = np.log(scale + loc)
-        if isinstance(self.x, np.ndarray) or isinstance(self.x, dask.array.core.Array):
-            # dense numpy or dask
-            ll = scipy.special.gammaln(scale + self.x) - \
-                 scipy.special.gammaln(self.x + np.ones_like(scale)) - \
-                 scipy.special.gammaln(scale) + \
-                 self.x * (self.eta_loc - log_r_plus_mu) + \
-                 np.multiply(scale, self.eta_scale - log_r_plus_mu)
+    def hessian_weight_bb(self):
+        return self._hessian_weight_bb(x=self.x, scale=self.scale, loc=self.location)
+
+    def hessian_weight_bb_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_bb(x=self.x_j(j=j), scale=self.scale_j(j=j), loc=self.location_j(j=j))
+
+    def _ll(self, x, scale, loc, eta_loc, eta_scale):
+        if self.x_is_sparse:
+            ll = self._apply_sparse_kernel(sparse_kernels.ll, x, scale, loc, eta_loc, eta_scale)
         else:
-            # sparse scipy
-            ll = scipy.special.gammaln(np.asarray(scale + self.x)) - \
-                scipy.special.gammaln(self.x + np.ones_like(scale)) - \
+            # dense numpy or dask
+            log_r_plus_mu = np.log(scale + loc)
+            ll = scipy.special.gammaln(scale + x) - \
+                scipy.special.gammaln(x + np.ones_like(scale)) - \
                 scipy.special.gammaln(scale) + \
-                np.asarray(self.x.multiply(self.eta_loc - log_r_plus_mu) +
-                           np.multiply(scale, self.eta_scale - log_r_plus_mu))
-            ll = np.asarray(ll)
+                x * (eta_loc - log_r_plus_mu) + \
+                np.multiply(scale, eta_scale - log_r_plus_mu)
         return self.np_clip_param(ll, "ll")
 
+    @property
+    def ll(self):
+        return self._ll(
+            x=self.x,
+            scale=self.scale,
+            loc=self.location,
+            eta_loc=self.eta_loc,
+            eta_scale=self.eta_scale
+        )
+
     def ll_j(self, j):
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-        scale = self.scale_j(j=j)
-        loc = self.location_j(j=j)
-        log_r_plus_mu = np.log(scale + loc)
-        if isinstance(self.x, np.ndarray) or isinstance(self.x, dask.array.core.Array):
-            # dense numpy or dask
-            ll = scipy.special.gammaln(scale + self.x[:, j]) - \
-                 scipy.special.gammaln(self.x[:, j] + np.ones_like(scale)) - \
-                 scipy.special.gammaln(scale) + \
-                 self.x[:, j] * (self.eta_loc_j(j=j) - log_r_plus_mu) + \
-                 np.multiply(scale, self.eta_scale_j(j=j) - log_r_plus_mu)
-        else:
-            # sparse scipy
-            ll = scipy.special.gammaln(np.asarray(scale + self.x[:, j])) - \
-                 scipy.special.gammaln(self.x + np.ones_like(scale)) - \
-                 scipy.special.gammaln(scale) + \
-                 np.asarray(self.x[:, j].multiply(self.eta_loc_j(j=j) - log_r_plus_mu) +
-                            np.multiply(scale, self.eta_scale_j(j=j) - log_r_plus_mu))
-            ll = np.asarray(ll)
-        return self.np_clip_param(ll, "ll")
+        return self._ll(
+            x=self.x_j(j=j),
+            scale=self.scale_j(j=j),
+            loc=self.location_j(j=j),
+            eta_loc=self.eta_loc_j(j=j),
+            eta_scale=self.eta_scale_j(j=j)
+        )
+
+    def fim_weight_aa_chunk(self, x, eta_loc, eta_scale):
+        loc = self.inverse_link_loc(eta_loc)
+        scale = self.inverse_link_scale(eta_scale)
+        return - loc * scale / (scale + loc)
+
+    def ybar_chunk(self, x, eta_loc, eta_scale):
+        return self._ybar(x=x, loc=self.inverse_link_loc(eta_loc))
+
+    def ll_chunk(self, x, eta_loc, eta_scale):
+        return self._ll(
+            x=x,
+            scale=self.inverse_link_scale(eta_scale),
+            loc=self.inverse_link_loc(eta_loc),
+            eta_loc=eta_loc,
+            eta_scale=eta_scale
+        )
+
+    def jac_weight_b_chunk(self, x, eta_loc, eta_scale):
+        return self._jac_weight_b(x=x, scale=self.inverse_link_scale(eta_scale), loc=self.inverse_link_loc(eta_loc))
+
+    def hessian_weight_bb_chunk(self, x, eta_loc, eta_scale):
+        return self._hessian_weight_bb(
+            x=x,
+            scale=self.inverse_link_scale(eta_scale),
+            loc=self.inverse_link_loc(eta_loc)
+        )
+
+    def ll_b_fun(self):
+        return ll_b
 
     def ll_handle(self):
         def fun(x, eta_loc, b_var, xh_scale):
-            eta_scale = np.matmul(xh_scale, b_var)
-            scale = np.exp(eta_scale)
-            loc = np.exp(eta_loc)
-            log_r_plus_mu = np.log(scale + loc)
-            if isinstance(x, np.ndarray) or isinstance(x, dask.array.core.Array):
-                # dense numpy or dask
-                ll = scipy.special.gammaln(scale + x) - \
-                     scipy.special.gammaln(x + np.ones_like(scale)) - \
-                     scipy.special.gammaln(scale) + \
-                     x * (eta_loc - log_r_plus_mu) + \
-                     np.multiply(scale, eta_scale - log_r_plus_mu)
-            else:
-                raise ValueError("type x %s not supported" % type(x))
-            return self.np_clip_param(ll, "ll")
+            return self.np_clip_param(ll_b(x=x, eta_loc=eta_loc, b_var=b_var, xh_scale=xh_scale), "ll")
         return fun
 
     def jac_b_handle(self):
         def fun(x, eta_loc, b_var, xh_scale):
-            scale = np.exp(b_var)
+            scale = np.exp(np.matmul(xh_scale, b_var))
             loc = np.exp(eta_loc)
             scale_plus_x = scale + x
             r_plus_mu = scale + loc
@@ -256,3 +320,20 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
             return scale * (const1 + const2 + const3)
 
         return fun
+
+    def hessian_bb_handle(self):
+        def fun(x, eta_loc, b_var, xh_scale):
+            scale = np.exp(np.matmul(xh_scale, b_var))
+            loc = np.exp(eta_loc)
+            scale_plus_x = scale + x
+            scale_plus_loc = scale + loc
+
+            # Define graphs for individual terms of constant term of hessian:
+            const1 = scipy.special.digamma(scale_plus_x) + scale * scipy.special.polygamma(n=1, x=scale_plus_x)
+            const2 = - scipy.special.digamma(scale) - scale * scipy.special.polygamma(n=1, x=scale)
+            const3 = - (loc * scale_plus_x + np.ones_like(scale) * 2. * scale * scale_plus_loc) / \
+                np.square(scale_plus_loc)
+            const4 = np.log(scale) + np.ones_like(scale) * 2. - np.log(scale_plus_loc)
+            return scale * (const1 + const2 + const3 + const4)
+
+        return fun
@@ -0,0 +1,117 @@
+"""
+Kernels for the negative binomial model on sparse count data.
+
+All terms of the likelihood, the score and the hessian weights that involve special functions vanish for zero counts:
+gammaln(r+x)-gammaln(r), gammaln(x+1) and digamma(r+x)-digamma(r) are zero if x=0. Each quantity is therefore
+computed as a closed-form term that only depends on the location (mu) and the scale (r) and that is valid for
+observations with zero counts, plus a correction that is only evaluated on the stored non-zero entries of x.
+The cost of special function evaluations therefore scales with the number of non-zero entries of x.
+
+All kernels take x as scipy.sparse matrix or sparse.COO of shape (observations x features) and dense arrays of the
+same shape for the model quantities and return dense arrays of shape (observations x features).
+"""
+import numpy as np
+import scipy.sparse
+import scipy.special
+import sparse
+
+
+def is_sparse(x) -> bool:
+    return isinstance(x, scipy.sparse.spmatrix) or isinstance(x, sparse.COO)
+
+
+def nonzeros(x):
+    """
+    Coordinates and values of the stored entries of a sparse matrix.
+
+    :param x: scipy.sparse matrix or sparse.COO (observations x features)
+    :return: Tuple of observation indices, feature indices and values of stored entries.
+    """
+    if isinstance(x, sparse.COO):
+        return x.coords[0], x.coords[1], x.data
+    else:
+        x = x.tocoo()
+        # Stored entries have to be unique for the additive corrections below:
+        x.sum_duplicates()
+        return x.row, x.col, x.data
+
+
+def ll(x, scale, loc, eta_loc, eta_scale):
+    """
+    :return: observations x features
+    """
+    log_r_plus_mu = np.log(scale + loc)
+    ll = scale * (eta_scale - log_r_plus_mu)
+    idx_obs, idx_features, values = nonzeros(x)
+    r = scale[idx_obs, idx_features]
+    ll[idx_obs, idx_features] += scipy.special.gammaln(r + values) - \
+        scipy.special.gammaln(r) - \
+        scipy.special.gammaln(values + 1.) + \
+        values * (eta_loc[idx_obs, idx_features] - log_r_plus_mu[idx_obs, idx_features])
+    return ll
+
+
+def ybar(x, loc):
+    """
+    :return: observations x features
+    """
+    ybar = - np.ones_like(loc)
+    idx_obs, idx_features, values = nonzeros(x)
+    ybar[idx_obs, idx_features] += values / loc[idx_obs, idx_features]
+    return ybar
+
+
+def jac_weight_b(x, scale, loc):
+    """
+    :return: observations x features
+    """
+    r_plus_mu = scale + loc
+    jac = scale * (np.log(scale) + np.ones_like(scale) - np.log(r_plus_mu) - scale / r_plus_mu)
+    idx_obs, idx_features, values = nonzeros(x)
+    r = scale[idx_obs, idx_features]
+    jac[idx_obs, idx_features] += r * (
+        scipy.special.digamma(r + values) - scipy.special.digamma(r) - values / r_plus_mu[idx_obs, idx_features]
+    )
+    return jac
+
+
+def hessian_weight_aa(x, scale, loc):
+    """
+    :return: observations x features
+    """
+    denominator = np.square((loc / scale) + np.ones_like(loc))
+    hessian = - loc / denominator
+    idx_obs, idx_features, values = nonzeros(x)
+    hessian[idx_obs, idx_features] -= loc[idx_obs, idx_features] * values / scale[idx_obs, idx_features] / \
+        denominator[idx_obs, idx_features]
+    return hessian
+
+
+def hessian_weight_ab(x, scale, loc):
+    """
+    :return: observations x features
+    """
+    factor = loc * scale / np.square(loc + scale)
+    hessian = - factor * loc
+    idx_obs, idx_features, values = nonzeros(x)
+    hessian[idx_obs, idx_features] += factor[idx_obs, idx_features] * values
+    return hessian
+
+
+def hessian_weight_bb(x, scale, loc):
+    """
+    :return: observations x features
+    """
+    scale_plus_loc = scale + loc
+    # The digamma and trigamma terms cancel for zero counts:
+    const3 = - (loc * scale + 2. * scale * scale_plus_loc) / np.square(scale_plus_loc)
+    const4 = np.log(scale) + np.ones_like(scale) * 2. - np.log(scale_plus_loc)
+    hessian = scale * (const3 + const4)
+    idx_obs, idx_features, values = nonzeros(x)
+    r = scale[idx_obs, idx_features]
+    hessian[idx_obs, idx_features] += r * (
+        scipy.special.digamma(r + values) + r * scipy.special.polygamma(n=1, x=r + values) -
+        scipy.special.digamma(r) - r * scipy.special.polygamma(n=1, x=r) -
+        loc[idx_obs, idx_features] * values / np.square(scale_plus_loc[idx_obs, idx_features])
+    )
+    return hessian
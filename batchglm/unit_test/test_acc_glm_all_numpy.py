@@ -1,6 +1,8 @@
 import logging
 import numpy as np
+import os
 import scipy.sparse
+import tempfile
 import unittest
 
 import batchglm.api as glm
@@ -17,7 +19,11 @@ class _TestAccuracyGlmAllEstim:
             quick_scale,
             noise_model,
             sparse,
-            init_mode
+            init_mode,
+            compact_counts=False,
+            compute_dtype=None,
+            init_model=None,
+            x=None
     ):
         if noise_model is None:
             raise ValueError("noise_model is None")
@@ -27,9 +33,13 @@ class _TestAccuracyGlmAllEstim:
             else:
                 raise ValueError("noise_model not recognized")
 
+        if x is None:
+            x = simulator.input_data.x
+        if compact_counts:
+            x = np.asarray(x).astype(np.uint32)
         if sparse:
             input_data = InputDataGLM(
-                data=scipy.sparse.csr_matrix(simulator.input_data.x),
+                data=scipy.sparse.csr_matrix(x),
                 design_loc=simulator.input_data.design_loc,
                 design_scale=simulator.input_data.design_scale,
                 design_loc_names=simulator.input_data.design_loc_names,
@@ -38,11 +48,13 @@ class _TestAccuracyGlmAllEstim:
                 constraints_scale=simulator.input_data.constraints_scale,
                 size_factors=simulator.input_data.size_factors,
                 chunk_size_cells=int(1e9),
-                chunk_size_genes=2
+                chunk_size_genes=2,
+                compact_counts=compact_counts,
+                cast_dtype=compute_dtype if compute_dtype is not None else "float64"
             )
         else:
             input_data = InputDataGLM(
-                data=simulator.input_data.x,
+                data=x,
                 design_loc=simulator.input_data.design_loc,
                 design_scale=simulator.input_data.design_scale,
                 design_loc_names=simulator.input_data.design_loc_names,
@@ -51,22 +63,31 @@ class _TestAccuracyGlmAllEstim:
                 constraints_scale=simulator.input_data.constraints_scale,
                 size_factors=simulator.input_data.size_factors,
                 chunk_size_cells=int(1e9),
-                chunk_size_genes=2
+                chunk_size_genes=2,
+                compact_counts=compact_counts,
+                cast_dtype=compute_dtype if compute_dtype is not None else "float64"
             )
 
         self.estimator = Estimator(
             input_data=input_data,
             quick_scale=quick_scale,
             init_a=init_mode,
-            init_b=init_mode
+            init_b=init_mode,
+            compute_dtype=compute_dtype,
+            init_model=init_model
         )
         self.sim = simulator
 
     def estimate(
-            self
+            self,
+            sharded=False,
+            **train_kwargs
     ):
         self.estimator.initialize()
-        self.estimator.train_sequence(training_strategy="DEFAULT")
+        if sharded:
+            self.estimator.train_sharded(**train_kwargs)
+        else:
+            self.estimator.train_sequence(training_strategy="DEFAULT", **train_kwargs)
 
     def eval_estimation(
             self,
@@ -244,7 +265,11 @@ class _TestAccuracyGlmAll(
             batched,
             train_loc,
             train_scale,
-            sparse
+            sparse,
+            compact_counts=False,
+            compute_dtype=None,
+            x=None,
+            **train_kwargs
     ):
         self.optims_tested = {
             "nb": ["IRLS"],
@@ -268,9 +293,12 @@ class _TestAccuracyGlmAll(
                 quick_scale=False if train_scale else True,
                 noise_model=self.noise_model,
                 sparse=sparse,
-                init_mode=init_mode
+                init_mode=init_mode,
+                compact_counts=compact_counts,
+                compute_dtype=compute_dtype,
+                x=x
             )
-            estimator.estimate()
+            estimator.estimate(**train_kwargs)
             estimator.estimator.finalize()
             success = estimator.eval_estimation(
                 train_loc=train_loc,
@@ -328,6 +356,292 @@ class _TestAccuracyGlmAll(
             sparse=sparse
         )
 
+    def _test_b_methods(self, sparse, method_b):
+        self.basic_test(
+            batched=False,
+            train_loc=True,
+            train_scale=True,
+            sparse=sparse,
+            method_b=method_b
+        )
+        self.basic_test(
+            batched=False,
+            train_loc=False,
+            train_scale=True,
+            sparse=sparse,
+            method_b=method_b
+        )
+
+    def _test_sharded(self, sparse, backend):
+        self.basic_test(
+            batched=False,
+            train_loc=True,
+            train_scale=True,
+            sparse=sparse,
+            sharded=True,
+            n_jobs=2,
+            backend=backend,
+            steps_per_round=8
+        )
+
+    def _test_streaming(self, sparse):
+        for train_loc, train_scale in [(True, True), (True, False), (False, True)]:
+            self.basic_test(
+                batched=False,
+                train_loc=train_loc,
+                train_scale=train_scale,
+                sparse=sparse,
+                method_b="nr",
+                streaming=True,
+                chunk_size_cells=300
+            )
+
+    def _test_line_search(self, sparse, max_halvings_a):
+        self.basic_test(
+            batched=False,
+            train_loc=True,
+            train_scale=True,
+            sparse=sparse,
+            max_halvings_a=max_halvings_a
+        )
+
+    def _test_trust_region(self, sparse):
+        for train_loc, train_scale in [(True, True), (True, False)]:
+            self.basic_test(
+                batched=False,
+                train_loc=train_loc,
+                train_scale=train_scale,
+                sparse=sparse,
+                trust_region_a=True
+            )
+
+    def _test_acceleration(self, sparse):
+        for method_b in ["brent", "nr"]:
+            self.basic_test(
+                batched=False,
+                train_loc=True,
+                train_scale=True,
+                sparse=sparse,
+                method_b=method_b,
+                acceleration="squarem"
+            )
+
+    def _test_lazy(self, sparse, scheduler):
+        self.basic_test(
+            batched=False,
+            train_loc=True,
+            train_scale=True,
+            sparse=sparse,
+            method_b="nr",
+            lazy=True,
+            scheduler=scheduler,
+            chunk_size_cells=300
+        )
+
+    def _test_memmap(self):
+        x = np.asarray(self.simulator(train_loc=True).input_data.x)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fn = os.path.join(tmp_dir, "x.dat")
+            x_mmap = np.memmap(fn, dtype=x.dtype, mode="w+", shape=x.shape)
+            x_mmap[:] = x
+            x_mmap.flush()
+            del x_mmap
+            self.basic_test(
+                batched=False,
+                train_loc=True,
+                train_scale=True,
+                sparse=False,
+                x=np.memmap(fn, dtype=x.dtype, mode="r", shape=x.shape)
+            )
+
+    def _test_anndata_backed(self, sparse):
+        import anndata
+
+        x = np.asarray(self.simulator(train_loc=True).input_data.x)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fn = os.path.join(tmp_dir, "x.h5ad")
+            anndata.AnnData(X=scipy.sparse.csr_matrix(x) if sparse else x).write_h5ad(fn)
+            adata = anndata.read_h5ad(fn, backed="r")
+            try:
+                self.basic_test(
+                    batched=False,
+                    train_loc=True,
+                    train_scale=True,
+                    sparse=False,
+                    x=adata
+                )
+            finally:
+                adata.file.close()
+
+    def _test_checkpoint(self, sparse):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "checkpoint.npz")
+            estimator = _TestAccuracyGlmAllEstim(
+                simulator=self.simulator(train_loc=True),
+                quick_scale=False,
+                noise_model=self.noise_model,
+                sparse=sparse,
+                init_mode="standard"
+            )
+            estimator.estimator.initialize()
+            estimator.estimator.train(max_steps=3, checkpoint_path=path, checkpoint_every=1)
+            assert os.path.exists(path), "no checkpoint written"
+
+            estimator_resumed = _TestAccuracyGlmAllEstim(
+                simulator=self.simulator(train_loc=True),
+                quick_scale=False,
+                noise_model=self.noise_model,
+                sparse=sparse,
+                init_mode="standard"
+            )
+            estimator_resumed.estimator.initialize()
+            estimator_resumed.estimator.train(resume_from=path)
+            assert len(estimator_resumed.estimator.lls) > len(estimator.estimator.lls), "training did not resume"
+            estimator_resumed.estimator.finalize()
+            assert estimator_resumed.eval_estimation(train_loc=True, train_scale=True), \
+                "resumed training did not yield exact results"
+
+            # Checkpoint in the format without format_version and the state of scheduling, trust regions and
+            # acceleration:
+            path_unversioned = os.path.join(tmp_dir, "checkpoint_unversioned.npz")
+            with np.load(path) as f:
+                state = dict([
+                    (k, f[k]) for k in f.files
+                    if k not in ["format_version", "loc_steps", "trust_region_radius_a", "acceleration_params",
+                                 "acceleration_n"]
+                ])
+            np.savez(path_unversioned, **state)
+            estimator_unversioned = _TestAccuracyGlmAllEstim(
+                simulator=self.simulator(train_loc=True),
+                quick_scale=False,
+                noise_model=self.noise_model,
+                sparse=sparse,
+                init_mode="standard"
+            )
+            estimator_unversioned.estimator.initialize()
+            estimator_unversioned.estimator.train(resume_from=path_unversioned)
+            estimator_unversioned.estimator.finalize()
+            assert estimator_unversioned.eval_estimation(train_loc=True, train_scale=True), \
+                "training resumed from unversioned checkpoint did not yield exact results"
+
+    def _test_incremental(self, sparse):
+        from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM
+
+        sim = self.simulator(train_loc=True)
+        # Previous fit on all but the last observations:
+        n_obs_previous = sim.input_data.num_observations - 200
+        x = np.asarray(sim.input_data.x)[:n_obs_previous]
+        size_factors = sim.input_data.size_factors
+        input_data_previous = InputDataGLM(
+            data=scipy.sparse.csr_matrix(x) if sparse else x,
+            design_loc=np.asarray(sim.input_data.design_loc)[:n_obs_previous],
+            design_scale=np.asarray(sim.input_data.design_scale)[:n_obs_previous],
+            design_loc_names=sim.input_data.design_loc_names,
+            design_scale_names=sim.input_data.design_scale_names,
+            constraints_loc=sim.input_data.constraints_loc,
+            constraints_scale=sim.input_data.constraints_scale,
+            size_factors=np.asarray(size_factors)[:n_obs_previous] if size_factors is not None else None,
+            chunk_size_cells=int(1e9),
+            chunk_size_genes=2,
+            cast_dtype="float64"
+        )
+        estimator_previous = Estimator(input_data=input_data_previous, init_a="standard", init_b="standard")
+        estimator_previous.initialize()
+        estimator_previous.train_sequence(training_strategy="DEFAULT", method_b="nr")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "stats.npz")
+            estimator_previous.sufficient_statistics().save(path)
+
+            estimator = _TestAccuracyGlmAllEstim(
+                simulator=sim,
+                quick_scale=False,
+                noise_model=self.noise_model,
+                sparse=sparse,
+                init_mode="init_model",
+                init_model=estimator_previous
+            )
+            estimator.estimate(method_b="nr", incremental_stats=path, incremental_steps=2)
+            estimator.estimator.finalize()
+            assert estimator.eval_estimation(train_loc=True, train_scale=True), \
+                "incremental refit did not yield exact results"
+
+    def _test_telemetry(self, sparse):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "events.jsonl")
+            events = []
+            estimator = _TestAccuracyGlmAllEstim(
+                simulator=self.simulator(train_loc=True),
+                quick_scale=False,
+                noise_model=self.noise_model,
+                sparse=sparse,
+                init_mode="standard"
+            )
+            sink = glm.models.numpy.JsonLinesSink(path=path)
+            estimator.estimator.telemetry.add_sink(glm.models.numpy.CallbackSink(fn=events.append))
+            estimator.estimator.telemetry.add_sink(sink)
+            estimator.estimate()
+            sink.close()
+
+            iterations = [e for e in events if e["event"] == "iteration"]
+            assert len(iterations) == estimator.estimator.niter, "not one event per iteration"
+            assert events[-1]["event"] == "train_end"
+            for e in iterations:
+                for k in ["ll", "n_active", "n_scale", "n_singular", "n_reverted", "timings"]:
+                    assert k in e.keys(), "%s missing in iteration event" % k
+            assert any(["loc_step" in e["timings"] for e in iterations])
+            assert any(["scale_step" in e["timings"] for e in iterations])
+            with open(path) as f:
+                assert len(f.readlines()) == len(events), "not all events written to file"
+
+    def _test_nothing_trained(self, sparse):
+        from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM
+
+        # Closed-form location model on a one-hot design is exact and the scale model is not trained:
+        sim = self.simulator(train_loc=False)
+        x = np.asarray(sim.input_data.x)
+        input_data = InputDataGLM(
+            data=scipy.sparse.csr_matrix(x) if sparse else x,
+            design_loc=sim.input_data.design_loc,
+            design_scale=sim.input_data.design_scale,
+            design_loc_names=sim.input_data.design_loc_names,
+            design_scale_names=sim.input_data.design_scale_names,
+            chunk_size_cells=int(1e9),
+            chunk_size_genes=2,
+            cast_dtype="float64"
+        )
+        estimator = Estimator(input_data=input_data, init_a="closed_form", init_b="standard", quick_scale=True)
+        assert not estimator._train_loc and not estimator._train_scale
+        estimator.initialize()
+        estimator.train(max_steps=100)
+        assert estimator.niter <= 1, "training ran %i iterations without trained parameters" % estimator.niter
+        assert np.all(estimator.fully_converged)
+
+    def _test_finalize(self, sparse):
+        estimator = _TestAccuracyGlmAllEstim(
+            simulator=self.simulator(train_loc=True),
+            quick_scale=False,
+            noise_model=self.noise_model,
+            sparse=sparse,
+            init_mode="standard"
+        )
+        estimator.estimate()
+        estimator.estimator.finalize()
+        idx = np.array([1, 3, 4])
+        fisher_inv = estimator.estimator.fisher_inv
+        assert np.allclose(estimator.estimator.fisher_inv_j(idx=idx), fisher_inv[idx])
+        assert np.allclose(
+            estimator.estimator.fisher_inv_j(idx=idx, diagonal=True),
+            np.diagonal(fisher_inv[idx], axis1=1, axis2=2)
+        )
+        assert np.allclose(estimator.estimator.hessian_j(idx=idx), estimator.estimator.hessian[idx])
+        assert np.allclose(estimator.estimator.jacobian_j(idx=idx), estimator.estimator.jacobian[idx])
+        assert np.allclose(
+            estimator.estimator.log_likelihood_j(idx=idx),
+            estimator.estimator.log_likelihood[idx]
+        )
+        assert np.isclose(estimator.estimator.loss, np.sum(estimator.estimator.log_likelihood))
+
     def _test_full(self, sparse):
         self._test_full_a_and_b(sparse=sparse)
         self._test_full_a_only(sparse=sparse)
@@ -357,6 +671,255 @@ class TestAccuracyGlmNb(
         self._test_full(sparse=False)
         self._test_full(sparse=True)
 
+    def test_b_methods_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_b_methods_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        for method_b in ["brent_vectorized", "nr"]:
+            self._test_b_methods(sparse=False, method_b=method_b)
+            self._test_b_methods(sparse=True, method_b=method_b)
+
+    def test_assembly_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_assembly_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        fim_assembly = glm.pkg_constants.FIM_ASSEMBLY
+        try:
+            for assembly in ["einsum", "groupwise", "gemm"]:
+                glm.pkg_constants.FIM_ASSEMBLY = assembly
+                self._test_full_a_and_b(sparse=False)
+                self._test_full_a_and_b(sparse=True)
+        finally:
+            glm.pkg_constants.FIM_ASSEMBLY = fim_assembly
+
+    def test_active_set_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_active_set_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        repack_fraction = glm.pkg_constants.ACTIVE_SET_REPACK_FRACTION
+        try:
+            # Pack data as soon as a single feature converged:
+            glm.pkg_constants.ACTIVE_SET_REPACK_FRACTION = 1.
+            self._test_full_a_and_b(sparse=False)
+            self._test_full_a_and_b(sparse=True)
+        finally:
+            glm.pkg_constants.ACTIVE_SET_REPACK_FRACTION = repack_fraction
+
+    def test_streaming_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_streaming_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_streaming(sparse=False)
+        self._test_streaming(sparse=True)
+
+    def test_line_search_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_line_search_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        for max_halvings_a in [0, 10]:
+            self._test_line_search(sparse=False, max_halvings_a=max_halvings_a)
+            self._test_line_search(sparse=True, max_halvings_a=max_halvings_a)
+
+    def test_trust_region_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_trust_region_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_trust_region(sparse=False)
+        self._test_trust_region(sparse=True)
+
+    def test_acceleration_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_acceleration_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_acceleration(sparse=False)
+        self._test_acceleration(sparse=True)
+
+    def test_lazy_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_lazy_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        for scheduler in ["threads", "synchronous"]:
+            self._test_lazy(sparse=False, scheduler=scheduler)
+            self._test_lazy(sparse=True, scheduler=scheduler)
+
+    def test_compact_counts_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_compact_counts_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        for sparse in [False, True]:
+            self.basic_test(
+                batched=False,
+                train_loc=True,
+                train_scale=True,
+                sparse=sparse,
+                compact_counts=True
+            )
+
+    def test_compact_counts_init_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_compact_counts_init_nb()")
+        from batchglm.api.models.numpy.glm_nb import InputDataGLM
+        from batchglm.models.glm_nb.utils import init_par
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        # Counts above 255 whose squares overflow uint16:
+        x = np.random.randint(256, 2000, size=self.sim1.input_data.x.shape)
+
+        def init(data, compact_counts):
+            input_data = InputDataGLM(
+                data=data,
+                design_loc=self.sim1.input_data.design_loc,
+                design_scale=self.sim1.input_data.design_scale,
+                as_dask=False,
+                compact_counts=compact_counts,
+                cast_dtype=None
+            )
+            assert np.issubdtype(input_data.design_loc.dtype, np.floating)
+            assert np.issubdtype(input_data.design_scale.dtype, np.floating)
+            return init_par(input_data=input_data, init_a="standard", init_b="standard", init_model=None)
+
+        init_a, init_b, _, _ = init(data=x.astype(np.float64), compact_counts=False)
+        for sparse in [False, True]:
+            x_compact = x.astype(np.uint16)
+            init_a_compact, init_b_compact, _, _ = init(
+                data=scipy.sparse.csr_matrix(x_compact) if sparse else x_compact,
+                compact_counts=True
+            )
+            assert np.allclose(init_a_compact, init_a)
+            assert np.allclose(init_b_compact, init_b)
+
+    def test_disk_backed_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_disk_backed_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_memmap()
+
+    def test_anndata_backed_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_anndata_backed_nb()")
+        try:
+            import anndata  # noqa: F401
+            import h5py  # noqa: F401
+        except ImportError:
+            self.skipTest("backed AnnData requires anndata and h5py")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_anndata_backed(sparse=False)
+        self._test_anndata_backed(sparse=True)
+
+    def test_mixed_precision_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_mixed_precision_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        for sparse in [False, True]:
+            for polish_steps in [0, 2]:
+                self.basic_test(
+                    batched=False,
+                    train_loc=True,
+                    train_scale=True,
+                    sparse=sparse,
+                    compute_dtype="float32",
+                    polish_steps=polish_steps
+                )
+
+    def test_checkpoint_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_checkpoint_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_checkpoint(sparse=False)
+        self._test_checkpoint(sparse=True)
+
+    def test_incremental_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_incremental_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_incremental(sparse=False)
+        self._test_incremental(sparse=True)
+
+    def test_telemetry_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_telemetry_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_telemetry(sparse=False)
+        self._test_telemetry(sparse=True)
+
+    def test_nothing_trained_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_nothing_trained_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_nothing_trained(sparse=False)
+        self._test_nothing_trained(sparse=True)
+
+    def test_finalize_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_finalize_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        self._test_finalize(sparse=False)
+        self._test_finalize(sparse=True)
+
+    def test_sharded_nb(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_sharded_nb()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate()
+        for backend in ["threads", "processes"]:
+            self._test_sharded(sparse=False, backend=backend)
+            self._test_sharded(sparse=True, backend=backend)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,51 @@
+import logging
+import os
+import tempfile
+import unittest
+
+import batchglm.api as glm
+from batchglm.benchmark import STAGES, compare, grid, load, run, save
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestBenchmark(unittest.TestCase):
+    """
+    Test that the benchmark suite records all stages and detects regressions against a baseline.
+    """
+
+    def test_numpy(self):
+        logger.error("TestBenchmark.test_numpy()")
+
+        cases = grid(
+            n_obs=[200],
+            n_features=[5],
+            n_conditions=[2],
+            n_batches=[0],
+            backends=["numpy"],
+            training_strategies={"numpy": ["DEFAULT"]}
+        )
+        results = run(cases=cases, isolate=False)
+        for x in results:
+            assert "error" not in x.keys(), x["error"]
+            for s in STAGES:
+                assert x["seconds"][s] >= 0
+                assert x["peak_rss"][s] > 0
+            assert x["niter"] > 0
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "baseline.json")
+            save(results=results, path=path)
+            baseline = load(path)
+        assert len(compare(results=results, baseline=baseline)) == 0
+
+        for x in baseline:
+            x["niter"] = x["niter"] - 1
+        regressions = compare(results=results, baseline=baseline)
+        assert len(regressions) == len(results)
+        assert all([x["metric"] == "niter" for x in regressions])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import logging
+import numpy as np
+import unittest
+
+import batchglm.api as glm
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestCholeskySolve(unittest.TestCase):
+    """
+    Test batched Cholesky solves against dense solves and the fallback of ill-conditioned systems.
+    """
+
+    def test_solve(self):
+        logger.error("TestCholeskySolve.test_solve()")
+
+        np.random.seed(1)
+        x = np.random.normal(size=[10, 4, 4])
+        a = np.matmul(x, np.transpose(x, axes=[0, 2, 1])) + 4. * np.eye(4)
+        b = np.random.normal(size=[10, 4])
+        result = glm.utils.linalg.cholesky_solve(a=a, b=b)
+        assert result.n_cholesky_failed == 0
+        assert np.allclose(result.x, np.linalg.solve(a, b[..., None])[..., 0])
+        assert np.allclose(
+            glm.utils.linalg.cholesky_inverse(a=a).x,
+            np.linalg.inv(a)
+        )
+
+    def test_ill_conditioned(self):
+        logger.error("TestCholeskySolve.test_ill_conditioned()")
+
+        # Positive definite but with condition number far above one over the machine precision:
+        a = np.stack([np.eye(3), np.diag([1., 1., 1e-20])])
+        b = np.ones([2, 3])
+        result = glm.utils.linalg.cholesky_solve(a=a, b=b)
+        assert np.all(result.cholesky_failed == np.array([False, True]))
+        assert np.all(np.abs(result.x) <= 1. + 1e-8), "ill-conditioned system was not solved with least-squares"
+        inverse = glm.utils.linalg.cholesky_inverse(a=a)
+        assert np.all(inverse.x[1] == 0.), "inverse of ill-conditioned matrix was not zeroed"
+
+
+
+class TestStackedLstsq(unittest.TestCase):
+    """
+    Test SVD least-squares solves of stacked systems, including systems without any non-zero singular value.
+    """
+
+    def test_zero_system(self):
+        logger.error("TestStackedLstsq.test_zero_system()")
+
+        np.random.seed(1)
+        l = np.random.normal(size=[3, 4, 4])
+        l[1] = 0.
+        b = np.random.normal(size=[3, 4, 1])
+        # Singular values equal to the cutoff of an all-zero system are cut, not inverted:
+        with np.errstate(divide="raise", invalid="raise"):
+            x = glm.utils.linalg.stacked_lstsq(l, b)
+        assert np.all(np.isfinite(x))
+        assert np.all(x[1] == 0.), "all-zero system did not yield zero solution"
+        for i in [0, 2]:
+            assert np.allclose(x[i], np.linalg.lstsq(l[i], b[i], rcond=None)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
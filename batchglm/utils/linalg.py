@@ -20,7 +20,7 @@ def stacked_lstsq(L, b, rcond=1e-10):
     s_max = s.max(axis=-1, keepdims=True)
     s_min = rcond * s_max
 
-    inv_s = np.reciprocal(s, out=np.zeros_like(s), where=s >= s_min)
+    inv_s = np.reciprocal(s, out=np.zeros_like(s), where=s > s_min)
 
     x = np.einsum(
         '...MK,...MN->...KN',
@@ -33,6 +33,189 @@ def stacked_lstsq(L, b, rcond=1e-10):
     return np.conj(x, out=x)
 
 
+class BatchedSolveResult:
+    """
+    Solution of a batch of linear systems and the systems that could not be solved by Cholesky decomposition.
+    """
+
+    x: np.ndarray
+    cholesky_failed: np.ndarray
+    l: np.ndarray
+
+    def __init__(
+            self,
+            x: np.ndarray,
+            cholesky_failed: np.ndarray,
+            l: np.ndarray = None
+    ):
+        """
+
+        :param x: Solutions (batch x ...)
+        :param cholesky_failed: Boolean mask (batch) of systems for which the Cholesky decomposition failed.
+        :param l: Lower triangular Cholesky factors (batch x M x M), zero where the decomposition failed.
+        """
+        self.x = x
+        self.cholesky_failed = cholesky_failed
+        self.l = l
+
+    @property
+    def idx_cholesky_failed(self) -> np.ndarray:
+        return np.where(self.cholesky_failed)[0]
+
+    @property
+    def n_cholesky_failed(self) -> int:
+        return int(np.sum(self.cholesky_failed))
+
+
+def batched_cholesky(
+        a: np.ndarray,
+        max_cond: float = None
+):
+    r"""
+    Cholesky decomposition of a batch of symmetric positive definite matrices.
+
+    np.linalg.cholesky fails for the whole batch if a single matrix is not positive definite. The batch is split
+    recursively in this case so that only the failed matrices are identified, this costs a few additional
+    decompositions per failed matrix.
+
+    Matrices that are positive definite but ill-conditioned are also treated as failed: The squared ratio of the
+    largest to the smallest pivot on the diagonal of the factor is a lower bound of the condition number of the
+    matrix, decompositions with a ratio above max_cond are discarded.
+
+    :param a: tensor of shape (batch, M, M)
+    :param max_cond: Maximum condition number estimate of matrices that are decomposed,
+        one over the machine precision of a if None.
+    :return: Tuple of lower triangular factors of shape (batch, M, M), set to zero where the decomposition failed,
+        and boolean mask (batch) of matrices for which the decomposition failed.
+    """
+    if max_cond is None:
+        max_cond = 1. / np.finfo(a.dtype).eps
+    l = np.zeros_like(a)
+    failed = np.zeros([a.shape[0]], dtype=bool)
+
+    def decompose(idx):
+        if len(idx) == 0:
+            return
+        try:
+            l_idx = np.linalg.cholesky(a[idx])
+            pivots = np.abs(np.diagonal(l_idx, axis1=1, axis2=2))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cond = np.square(np.max(pivots, axis=1) / np.min(pivots, axis=1))
+            ok = np.logical_and(np.all(np.isfinite(l_idx), axis=(1, 2)), cond <= max_cond)
+            l[idx[ok]] = l_idx[ok]
+            failed[idx[np.logical_not(ok)]] = True
+        except np.linalg.LinAlgError:
+            if len(idx) == 1:
+                failed[idx] = True
+            else:
+                decompose(idx[:len(idx) // 2])
+                decompose(idx[len(idx) // 2:])
+
+    decompose(np.arange(0, a.shape[0]))
+    return l, failed
+
+
+def batched_solve_triangular(
+        l: np.ndarray,
+        b: np.ndarray,
+        lower: bool = True
+) -> np.ndarray:
+    r"""
+    Solve a batch of triangular systems `lx = b` by forward or back substitution.
+
+    The substitution runs over the M rows and is vectorized over the batch.
+
+    :param l: tensor of shape (batch, M, M), lower or upper triangular
+    :param b: tensor of shape (batch, M)
+    :param lower: Whether l is lower triangular.
+    :return: x of shape (batch, M)
+    """
+    x = np.zeros(b.shape, dtype=np.result_type(l.dtype, b.dtype))
+    m = l.shape[-1]
+    for i in (range(0, m) if lower else range(m - 1, -1, -1)):
+        if lower:
+            s = np.sum(l[:, i, :i] * x[:, :i], axis=-1)
+        else:
+            s = np.sum(l[:, i, i + 1:] * x[:, i + 1:], axis=-1)
+        x[:, i] = (b[:, i] - s) / l[:, i, i]
+    return x
+
+
+def cholesky_solve(
+        a: np.ndarray,
+        b: np.ndarray,
+        rcond: float = 1e-10,
+        max_cond: float = None
+) -> BatchedSolveResult:
+    r"""
+    Solve a batch of symmetric positive definite systems `ax = b` via Cholesky decomposition.
+
+    The Cholesky factors are solved by forward and back substitution. Systems for which the Cholesky decomposition
+    fails or which are ill-conditioned, see batched_cholesky(), are solved with a rank-revealing least-squares solver
+    (stacked_lstsq), which cuts off small singular values.
+
+    :param a: tensor of shape (batch, M, M)
+    :param b: tensor of shape (batch, M)
+    :param rcond: threshold for inverse of singular values in least-squares fallback
+    :param max_cond: Maximum condition number estimate of systems that are solved via Cholesky decomposition,
+        see batched_cholesky().
+    :return: BatchedSolveResult with solution x of shape (batch, M) and the Cholesky factors of a
+    """
+    x = np.zeros_like(b)
+    l, failed = batched_cholesky(a, max_cond=max_cond)
+    ok = np.logical_not(failed)
+    if np.any(ok):
+        y = batched_solve_triangular(l[ok], b[ok], lower=True)
+        x[ok] = batched_solve_triangular(np.transpose(l[ok], axes=[0, 2, 1]), y, lower=False)
+    if np.any(failed):
+        logger.debug("cholesky decomposition failed for %i systems, using least-squares" % np.sum(failed))
+        x[failed] = stacked_lstsq(a[failed], b[failed][..., None], rcond=rcond)[..., 0]
+    return BatchedSolveResult(x=x, cholesky_failed=failed, l=l)
+
+
+def cholesky_inverse(
+        a: np.ndarray,
+        diagonal: bool = False,
+        max_cond: float = None
+) -> BatchedSolveResult:
+    r"""
+    Invert a batch of symmetric positive definite matrices via Cholesky decomposition.
+
+    :param a: tensor of shape (batch, M, M)
+    :param diagonal: Only compute the diagonals of the inverses.
+    :param max_cond: Maximum condition number estimate of matrices that are inverted, see batched_cholesky().
+    :return: BatchedSolveResult with inverses x of shape (batch, M, M), or their diagonals of shape (batch, M),
+        which are zero where the decomposition failed or the matrix is ill-conditioned
+    """
+    l, failed = batched_cholesky(a, max_cond=max_cond)
+    return cholesky_inverse_from_factor(l=l, cholesky_failed=failed, diagonal=diagonal)
+
+
+def cholesky_inverse_from_factor(
+        l: np.ndarray,
+        cholesky_failed: np.ndarray,
+        diagonal: bool = False
+) -> BatchedSolveResult:
+    r"""
+    Invert a batch of symmetric positive definite matrices `a = l l^T` from their Cholesky factors.
+
+    :param l: Lower triangular factors of shape (batch, M, M), see batched_cholesky().
+    :param cholesky_failed: Boolean mask (batch) of matrices for which the decomposition failed.
+    :param diagonal: Only compute the diagonals of the inverses, `diag(a^{-1})_i = \sum_k (l^{-1})_{ki}^2`.
+    :return: BatchedSolveResult with inverses x of shape (batch, M, M), or their diagonals of shape (batch, M),
+        which are zero where the decomposition failed
+    """
+    x = np.zeros(l.shape[:2] if diagonal else l.shape, dtype=l.dtype)
+    ok = np.logical_not(cholesky_failed)
+    if np.any(ok):
+        l_inv = np.linalg.inv(l[ok])
+        if diagonal:
+            x[ok] = np.sum(np.square(l_inv), axis=1)
+        else:
+            x[ok] = np.matmul(np.transpose(l_inv, axes=[0, 2, 1]), l_inv)
+    return BatchedSolveResult(x=x, cholesky_failed=cholesky_failed, l=l)
+
+
 def groupwise_solve_lm(
         dmat,
         apply_fun: callable,